@@ -0,0 +1,41 @@
+from datetime import datetime
+
+from fastapi import Depends, APIRouter, HTTPException, Query, Request, status
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user
+from app.api.models.models import User
+from app.api.repositories.analytics_queries import occupancy_report
+from app.api.repositories.dataset_versions import training_sessions_dataset_version
+from app.api.schemas.item import OccupancyReport
+from app.api.utils.datetimes import naive_utc
+from app.api.services.tracing import TracedRoute
+
+from app.database import get_read_db
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/analytics/occupancy", response_model=OccupancyReport, tags=["analytics endpoints"])
+def read_occupancy(
+    request: Request,
+    start: datetime = Query(..., description="Sessions starting at or after this moment (UTC)"),
+    end: datetime = Query(..., description="Sessions starting before this moment (UTC)"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Occupancy (enrolled / max capacity) over a date range by coach, by training type and by hour of week.
+    Reports are cached per range until sessions, coaches, types or enrollments change.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+
+    return request.app.state.response_cache.response(
+        request,
+        f"occupancy:{start.isoformat()}:{end.isoformat()}",
+        training_sessions_dataset_version(db),
+        lambda: OccupancyReport(**occupancy_report(db, start, end)),
+    )
@@ -0,0 +1,151 @@
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+from fastapi import Depends, APIRouter, HTTPException, Request, status
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user, BATCH_USER_STATE, CURRENT_RESIDENT_STATE
+from app.api.models.models import User
+from app.api.schemas.item import BatchRequest, BatchRequestItem, BatchResponse, BatchResponseItem
+from app.api.services.tracing import TracedRoute
+from app.config import settings
+
+from app.database import get_read_db, SHARED_SESSION_STATE
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+class SubRequestTimeout(Exception):
+    def __init__(self, task: asyncio.Future):
+        super().__init__("Sub-request timed out")
+        self.task = task
+
+
+def _close_when_done(db: Session):
+    def callback(task: asyncio.Future) -> None:
+        if not task.cancelled():
+            task.exception()  # retrieved, the 500 was logged by the app already
+        db.close()
+
+    return callback
+
+
+def _error(status_code: int, detail: str) -> BatchResponseItem:
+    return BatchResponseItem(status=status_code, headers={"content-type": "application/json"}, body={"detail": detail})
+
+
+async def _dispatch(request: Request, prefix: str, item: BatchRequestItem, state: dict) -> BatchResponseItem:
+    """
+    Runs one sub-request through the whole ASGI app, middleware included, and collects its response.
+    """
+    url = urlsplit(item.path)
+    path = prefix + "/" + url.path.lstrip("/")
+    headers = {key.lower(): value for key, value in item.headers.items()}
+    # Only passes the OAuth2 scheme check, the token itself is not decoded again
+    headers["authorization"] = request.headers.get("authorization", "")
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": request.scope.get("root_path", ""),
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()],
+        "state": state,
+    }
+
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Streaming endpoints (the seat feed) stop as soon as they look for a disconnect
+        return {"type": "http.disconnect"}
+
+    result = {"status": 500, "headers": {}, "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+            result["headers"] = {key.decode("latin-1"): value.decode("latin-1") for key, value in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            result["body"] += message.get("body", b"")
+
+    app_task = asyncio.ensure_future(request.app(scope, receive, send))
+    done, _ = await asyncio.wait({app_task}, timeout=settings.BATCH_ITEM_TIMEOUT_SECONDS)
+    if not done:
+        # Cancelling would not stop a sync endpoint's worker thread, which keeps using the shared session
+        raise SubRequestTimeout(app_task)
+    if app_task.exception() is not None:
+        # ServerErrorMiddleware has already rendered the 500, it only re-raises for the server's logs
+        return _error(status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal Server Error")
+
+    response_headers = result["headers"]
+    response_headers.pop("content-length", None)
+    body = result["body"]
+    if not body:
+        body = None
+    elif response_headers.get("content-type", "").startswith("application/json"):
+        body = json.loads(body)
+    else:
+        body = body.decode("utf-8", errors="replace")
+    return BatchResponseItem(status=result["status"], headers=response_headers, body=body)
+
+
+@router.post("/batch", response_model=BatchResponse, tags=["batch endpoints"])
+async def batch(batch_request: BatchRequest, request: Request, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    """
+    Runs several GET requests in one round trip. Paths are relative to the API root, e.g. "/coaches/1".
+    The caller is authenticated once and every sub-request shares one database session;
+    each result carries its own status, so one failing item does not fail the batch.
+    """
+    if len(batch_request.requests) > settings.BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.BATCH_MAX_REQUESTS} sub-requests per batch",
+        )
+
+    prefix = request.url.path.removesuffix("/batch")
+    # The sub-requests' session is the batch's own, on the database the dependency picked: one left running
+    # by a timeout keeps it and closes it when it ends, while the dependency's session is torn down as usual
+    shared_db = type(db)(bind=db.get_bind(), info=dict(db.info), autoflush=db.autoflush)
+    base_state = {
+        **request.scope.get("state", {}),
+        BATCH_USER_STATE: current_user,
+        SHARED_SESSION_STATE: shared_db,
+        # Same caller and session for every sub-request, so they share the resident lookups
+        CURRENT_RESIDENT_STATE: {},
+    }
+    responses = []
+    straggler = None
+    try:
+        # Sequential on purpose: the shared session must not be used from two threads at once
+        for item in batch_request.requests:
+            if straggler is not None:
+                responses.append(_error(status.HTTP_504_GATEWAY_TIMEOUT, "Skipped after a sub-request timed out"))
+            elif item.method.upper() != "GET":
+                responses.append(_error(status.HTTP_405_METHOD_NOT_ALLOWED, "Only GET sub-requests are supported"))
+            elif urlsplit(item.path).path.rstrip("/").endswith("/batch"):
+                responses.append(_error(status.HTTP_400_BAD_REQUEST, "Batches cannot be nested"))
+            else:
+                try:
+                    # A copy each, or what one sub-request sets on request.state (its club, traces) leaks to the next
+                    responses.append(await _dispatch(request, prefix, item, {**base_state}))
+                except SubRequestTimeout as timeout:
+                    straggler = timeout.task
+                    responses.append(_error(status.HTTP_504_GATEWAY_TIMEOUT, "Sub-request timed out"))
+    finally:
+        if straggler is None:
+            shared_db.close()
+        else:
+            straggler.add_done_callback(_close_when_done(shared_db))
+    return BatchResponse(responses=responses)
@@ -0,0 +1,25 @@
+from fastapi import Depends, APIRouter, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user
+from app.api.models.models import User
+from app.api.repositories.dashboard_queries import fetch_resident_dashboard
+from app.api.schemas.item import ResidentDashboard
+from app.api.services.tracing import TracedRoute
+
+from app.database import get_read_db
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/residents/me/dashboard", response_model=ResidentDashboard, tags=["resident panel"])
+def read_resident_dashboard(db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    """
+    Profile, upcoming enrolled sessions and achievements of the current user in one response.
+    Replaces /users/me, /training_sessions/enrolled and /achievements/(not_)received on the home screen.
+    """
+    dashboard = fetch_resident_dashboard(db, current_user.id)
+    if dashboard is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
+    return {"user": current_user, **dashboard}
@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import List
+
+from fastapi import Depends, APIRouter, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user
+from app.api.models.models import User, TrainingSessionArchive, ResidentToTrainingArchive
+from app.api.repositories.archive_queries import archived_sessions_select
+from app.api.repositories.lookups import resident_id_by_user_id
+from app.api.schemas.item import ArchivedTrainingSessionInfo
+from app.api.utils.datetimes import naive_utc
+from app.api.services.tracing import TracedRoute
+
+from app.database import get_read_db
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/history/training_sessions", response_model=List[ArchivedTrainingSessionInfo], tags=["history endpoints"])
+def read_archived_training_sessions(
+    start: datetime | None = Query(None),
+    end: datetime | None = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Archived (past) training sessions, newest first. Current sessions are under /training_sessions.
+    """
+    statement = archived_sessions_select()
+    if start is not None:
+        statement = statement.where(TrainingSessionArchive.start_time >= naive_utc(start))
+    if end is not None:
+        statement = statement.where(TrainingSessionArchive.start_time < naive_utc(end))
+    statement = statement.order_by(TrainingSessionArchive.start_time.desc()).limit(limit).offset(offset)
+    return db.execute(statement).mappings().all()
+
+
+@router.get("/history/training_sessions/enrolled", response_model=List[ArchivedTrainingSessionInfo], tags=["history endpoints", "resident panel"])
+def read_archived_enrolled_training_sessions(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Archived training sessions the current user was enrolled in, newest first.
+    """
+    resident_id = resident_id_by_user_id(db, current_user.id)
+    if resident_id is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
+
+    statement = (
+        archived_sessions_select()
+        .join(ResidentToTrainingArchive, ResidentToTrainingArchive.training_session_id == TrainingSessionArchive.id)
+        .where(ResidentToTrainingArchive.resident_id == resident_id)
+        .order_by(TrainingSessionArchive.start_time.desc())
+        .limit(limit)
+        .offset(offset)
+    )
+    return db.execute(statement).mappings().all()
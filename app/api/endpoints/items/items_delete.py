@@ -1,25 +1,29 @@
 from datetime import datetime, timedelta
 from typing import Annotated
 
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, select, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, Session, relationship, backref
+from fastapi import Depends, HTTPException, status, APIRouter, Request
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
 
 from app.api.endpoints.users import get_current_active_user
+from app.api.services.seat_feed import publish_seat_count
 from app.api.models.models import User, News, Resident, Coach, TrainingType, TrainingSession, ResidentToTraining, \
     Achievement, ResidentToAchievement
+from app.api.services.tracing import TracedRoute
 
-from app.database import get_db
+from app.database import club_row_exists, get_db
 
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 @router.delete("/resident_to_training/{resident_id}/{training_session_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["resident panel", "training sessions endpoints"])
-def remove_resident_from_training(resident_id: int, training_session_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def remove_resident_from_training(request: Request, resident_id: int, training_session_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
     """
     Removes a resident from a training session.
     """
+    if not club_row_exists(db, Resident, resident_id) or not club_row_exists(db, TrainingSession, training_session_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident is not enrolled in this training session")
     db_resident_to_training = db.execute(
         select(ResidentToTraining).where(
             ResidentToTraining.resident_id == resident_id,
@@ -32,6 +36,7 @@ def remove_resident_from_training(resident_id: int, training_session_id: int, db
 
     db.delete(db_resident_to_training)
     db.commit()
+    publish_seat_count(request.app.state.seat_feed, db, training_session_id)
     return
 
 
@@ -40,14 +45,10 @@ def delete_training_session(training_session_id: int, db: Session = Depends(get_
     """
     Deletes a training session.
     """
-    training_session = db.execute(
-        select(TrainingSession).where(TrainingSession.id == training_session_id)
-    ).scalars().first()
-
-    if training_session is None:
+    result = db.execute(delete(TrainingSession).where(TrainingSession.id == training_session_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training session not found")
 
-    db.delete(training_session)
     db.commit()
     return
 
@@ -57,14 +58,10 @@ def remove_training_type(type_id: int, db: Session = Depends(get_db), current_us
     """
     Removes a training type.
     """
-    training_type = db.execute(
-        select(TrainingType).where(TrainingType.id == type_id)
-    ).scalars().first()
-
-    if training_type is None:
+    result = db.execute(delete(TrainingType).where(TrainingType.id == type_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Such training type is not exist")
 
-    db.delete(training_type)
     db.commit()
     return
 
@@ -74,14 +71,10 @@ def remove_achievement(achievement_id: int, db: Session = Depends(get_db), curre
     """
     Removes an achievement.
     """
-    achievement = db.execute(
-        select(Achievement).where(Achievement.id == achievement_id)
-    ).scalars().first()
-
-    if achievement is None:
+    result = db.execute(delete(Achievement).where(Achievement.id == achievement_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Such achievement is not exist")
 
-    db.delete(achievement)
     db.commit()
     return
 
@@ -91,14 +84,11 @@ def remove_coach(coach_id: int, db: Session = Depends(get_db), current_user: Use
     """
     Removes a coach.
     """
-    coach = db.execute(
-        select(Coach).where(Coach.id == coach_id)
-    ).scalars().first()
-
-    if coach is None:
+    # Sessions and their enrollments go with the ON DELETE CASCADE foreign keys, nothing is loaded into the session
+    result = db.execute(delete(Coach).where(Coach.id == coach_id))
+    if result.rowcount == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Such coach is not exist")
 
-    db.delete(coach)
     db.commit()
     return
 
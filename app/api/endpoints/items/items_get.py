@@ -1,54 +1,80 @@
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 from typing import Annotated, List
 
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, select, ForeignKey, text, func
-from sqlalchemy.orm import sessionmaker, declarative_base, Session, relationship, backref
+from fastapi import Depends, HTTPException, status, APIRouter, Query, Request, Response
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
 
-from app.api.endpoints.users import get_current_active_user
+from app.api.endpoints.users import get_current_active_user, current_resident
 from app.api.repositories.get_training_session_data import fetch_training_session_data
-from app.api.repositories.tournament_queries import TOURNAMENT_STANDINGS_SQL
+from app.api.repositories.dataset_versions import news_dataset_version, training_sessions_dataset_version
+from app.api.repositories.free_slots import MAX_RANGE_DAYS, coach_free_slots, existing_coach_ids
+from app.api.repositories.fieldsets import NEWS_FIELDS, COACH_FIELDS, TRAINING_TYPE_FIELDS, ACHIEVEMENT_FIELDS
+from app.api.repositories.entity_versions import news_validators, coach_validators, training_session_validators, \
+    training_type_validators, achievement_validators, entity_etag
 from app.api.models.models import User, News, Resident, Coach, TrainingType, TrainingSession, ResidentToTraining, \
     Achievement, ResidentToAchievement
 from app.api.schemas.item import NewsInfo, CoachInfo, TrainingSessionInfo, TrainingSessionInfoWithResidents, \
-    TrainingTypeInfo, AchievementInfo, TrainingTypeStatistics
+    TrainingTypeInfo, AchievementInfo, TrainingTypeStatistics, FreeSlots
 from app.api.schemas.user import ResidentInfo
 
-from app.database import get_db
+from app.api.utils.conditional import is_not_modified, not_modified_response, validator_headers
+from app.api.utils.datetimes import naive_utc
+from app.api.utils.fieldsets import sparse_response
+from app.api.services.tracing import TracedRoute
 
-router = APIRouter()
+from app.database import get_read_db
+
+router = APIRouter(route_class=TracedRoute)
 
 
 @router.get("/news/all", response_model=List[NewsInfo], tags=["news endpoints"])
-def get_all_news(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def get_all_news(request: Request, fields: list[str] | None = Depends(NEWS_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
     """
     Retrieves information for all news.
     """
-    news = db.execute(select(News).order_by(News.post_time)).scalars().all()
-    news_data = []
-    for new in news:
-        news_data.append(NewsInfo(
-            id=new.id,
-            username=new.user.username,
-            post_title=new.post_title,
-            post_info=new.post_info,
-            post_image=new.post_image,
-            post_time=new.post_time,
-        ))
-
-    return news_data
+    if fields:
+        return sparse_response(db.execute(NEWS_FIELDS.select(fields).order_by(News.post_time)).mappings().all())
+
+    def build():
+        news = db.execute(select(News).order_by(News.post_time)).scalars().all()
+        news_data = []
+        for new in news:
+            news_data.append(NewsInfo(
+                id=new.id,
+                username=new.user.username,
+                post_title=new.post_title,
+                post_info=new.post_info,
+                post_image=new.post_image,
+                post_time=new.post_time,
+            ))
+        return news_data
+
+    return request.app.state.response_cache.response(request, "news", news_dataset_version(db), build)
 
 
 @router.get("/news/{new_id}", response_model=NewsInfo, tags=["news endpoints"])
-def get_new_by_id(new_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def get_new_by_id(new_id: int, request: Request, response: Response, fields: list[str] | None = Depends(NEWS_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
     """
     Retrieves information for current new.
     """
+    if fields:
+        row = db.execute(NEWS_FIELDS.select(fields).where(News.id == new_id)).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="New not found")
+        return sparse_response(row)
+
+    if request.headers.get("if-none-match"):
+        validators = news_validators(db, new_id)
+        if validators is not None and is_not_modified(request, validators[0]):
+            return not_modified_response(*validators)
+
     new = db.execute(select(News).where(News.id == new_id)).scalars().first()
 
     if new is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="New not found")
 
+    response.headers.update(validator_headers(entity_etag(new), new.updated_at))
     return NewsInfo(
         id=new.id,
         username=new.user.username,
@@ -60,52 +86,80 @@ def get_new_by_id(new_id: int, db: Session = Depends(get_db), current_user: User
 
 
 @router.get("/coaches/all", response_model=List[CoachInfo], tags=["coaches endpoints"])
-def get_all_coaches(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def get_all_coaches(fields: list[str] | None = Depends(COACH_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
     """
     Retrieves information for all coaches.
     """
+    if fields:
+        return sparse_response(db.execute(COACH_FIELDS.select(fields).order_by(Coach.surname, Coach.name)).mappings().all())
     coaches = db.execute(select(Coach).order_by(Coach.surname, Coach.name)).scalars().all()
     return coaches
 
 
+@router.get("/coaches/free_slots", response_model=FreeSlots, tags=["coaches endpoints"])
+def read_coach_free_slots(
+    start: datetime = Query(..., description="Beginning of the range (UTC)"),
+    end: datetime = Query(..., description="End of the range (UTC)"),
+    coach_id: List[int] = Query([], description="Coaches to look at, all of them if none"),
+    day_start: time = Query(time(9), description="Working hours start, every day"),
+    day_end: time = Query(time(21), description="Working hours end, every day"),
+    min_minutes: int = Query(0, ge=0, description="Shortest interval worth returning"),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Intervals within working hours when each coach has no training session, and those when all of them are free.
+    """
+    start, end = naive_utc(start), naive_utc(end)
+    if end <= start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end must be after start")
+    if end - start > timedelta(days=MAX_RANGE_DAYS):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"The range is limited to {MAX_RANGE_DAYS} days")
+    if day_end <= day_start:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="day_end must be after day_start")
+
+    coach_ids = existing_coach_ids(db, coach_id)
+    if len(coach_ids) < len(set(coach_id)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coach not found")
+    return coach_free_slots(db, coach_ids, start, end, day_start, day_end, min_minutes)
+
+
 @router.get("/coaches/{coach_id}", response_model=CoachInfo, tags=["coaches endpoints"])
-def read_coach(coach_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_coach(coach_id: int, request: Request, response: Response, fields: list[str] | None = Depends(COACH_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    if fields:
+        row = db.execute(COACH_FIELDS.select(fields).where(Coach.id == coach_id)).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coach not found")
+        return sparse_response(row)
+
+    if request.headers.get("if-none-match"):
+        validators = coach_validators(db, coach_id)
+        if validators is not None and is_not_modified(request, validators[0]):
+            return not_modified_response(*validators)
+
     coach = db.execute(select(Coach).where(Coach.id == coach_id)).scalars().first()
     if coach is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coach not found")
+    response.headers.update(validator_headers(entity_etag(coach), coach.updated_at))
     return coach
 
 
 @router.get("/training_sessions/all", response_model=List[TrainingSessionInfo], tags=["training sessions endpoints"])
-def read_training_sessions(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    training_sessions_data = []
-    training_sessions = db.execute(select(TrainingSession).order_by(TrainingSession.start_time)).scalars().all()
-    for session in training_sessions:
-        training_sessions_data.append(
-            TrainingSessionInfo(
-                id=session.id,
-                training_type=session.training_type.training_name,
-                coach_surname=session.coach.surname,
-                coach_name=session.coach.name,
-                start_time=session.start_time,
-                duration=session.duration,
-                remaining_places=session.remaining_places,
-                max_capacity=session.max_capacity
-            )
-        )
+def read_training_sessions(request: Request, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    def build():
+        training_sessions = db.execute(select(TrainingSession).order_by(TrainingSession.start_time)).scalars().all()
+        return fetch_training_session_data(training_sessions)
 
-    return training_sessions_data
+    return request.app.state.response_cache.response(
+        request, "training_sessions", training_sessions_dataset_version(db), build
+    )
 
 
 @router.get("/training_sessions/enrolled", response_model=List[TrainingSessionInfo], tags=["resident panel"])
-def read_enrolled_training_sessions(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_enrolled_training_sessions(resident: Resident = Depends(current_resident("enrolled_sessions"))):
     """
     Returns a list of training sessions the current user is enrolled in.
     """
-    resident = db.execute(select(Resident).where(Resident.user_id == current_user.id)).scalars().first()
-    if not resident:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
-
     enrolled_sessions = sorted([
         ResidentToTraining.training_session
         for ResidentToTraining in resident.trainings
@@ -117,14 +171,10 @@ def read_enrolled_training_sessions(db: Session = Depends(get_db), current_user:
 
 
 @router.get("/training_sessions/not_enrolled", response_model=List[TrainingSessionInfo], tags=["resident panel"])
-def read_not_enrolled_training_sessions(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_not_enrolled_training_sessions(db: Session = Depends(get_read_db), resident: Resident = Depends(current_resident("trainings"))):
     """
     Returns a list of training sessions the current user is NOT enrolled in.
     """
-    resident = db.execute(select(Resident).where(Resident.user_id == current_user.id)).scalars().first()
-    if not resident:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
-
     # Get IDs of enrolled training sessions
     enrolled_session_ids = {
         training.training_session_id for training in resident.trainings
@@ -139,14 +189,10 @@ def read_not_enrolled_training_sessions(db: Session = Depends(get_db), current_u
 
 
 @router.get("/training_sessions/not_enrolled/{category_id}/{coach_id}", response_model=List[TrainingSessionInfo], tags=["resident panel"])
-def read_not_enrolled_training_sessions_by_filter(category_id: int, coach_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_not_enrolled_training_sessions_by_filter(category_id: int, coach_id: int, db: Session = Depends(get_read_db), resident: Resident = Depends(current_resident("trainings"))):
     """
     Returns a list of training sessions the current user is NOT enrolled in BY filter.
     """
-    resident = db.execute(select(Resident).where(Resident.user_id == current_user.id)).scalars().first()
-    if not resident:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
-
     # Get IDs of enrolled training sessions
     enrolled_session_ids = {
         training.training_session_id for training in resident.trainings
@@ -173,12 +219,19 @@ def read_not_enrolled_training_sessions_by_filter(category_id: int, coach_id: in
 
 
 @router.get("/training_sessions/{training_session_id}", response_model=TrainingSessionInfo, tags=["training sessions endpoints"])
-def read_training_session(training_session_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_training_session(training_session_id: int, request: Request, response: Response, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    # The ETag spans several tables, so it is always computed by its own query
+    validators = training_session_validators(db, training_session_id)
+    if validators is not None and is_not_modified(request, validators[0]):
+        return not_modified_response(*validators)
+
     training_session = db.execute(select(TrainingSession).where(TrainingSession.id == training_session_id)).scalars().first()
 
-    if training_session is None:
+    if training_session is None or validators is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training session not found")
 
+    response.headers.update(validator_headers(*validators))
+
     return TrainingSessionInfo(
         id=training_session.id,
         training_type=training_session.training_type.training_name,
@@ -192,7 +245,7 @@ def read_training_session(training_session_id: int, db: Session = Depends(get_db
 
 
 @router.get("/training_sessions/residents/{category_id}/{coach_id}/{resident_id}", response_model=List[TrainingSessionInfoWithResidents], tags=["training sessions endpoints"])
-def read_training_sessions_with_residents(category_id: int, coach_id: int, resident_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_training_sessions_with_residents(category_id: int, coach_id: int, resident_id: int, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
     """
     Retrieves all training sessions with a list of residents enrolled in each session.
     """
@@ -270,19 +323,23 @@ def read_training_sessions_with_residents(category_id: int, coach_id: int, resid
 
 
 @router.get("/training_types/all", response_model=List[TrainingTypeInfo], tags=["resident panel", "training types endpoints"])
-def read_training_types(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_training_types(fields: list[str] | None = Depends(TRAINING_TYPE_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    if fields:
+        return sparse_response(db.execute(TRAINING_TYPE_FIELDS.select(fields).order_by(TrainingType.training_name)).mappings().all())
     training_types = db.execute(select(TrainingType).order_by(TrainingType.training_name)).scalars().all()
     return training_types
 
 
 @router.get("/achievements/all", response_model=List[AchievementInfo], tags=["resident panel", "achievements endpoints"])
-def read_achievements(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_achievements(fields: list[str] | None = Depends(ACHIEVEMENT_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    if fields:
+        return sparse_response(db.execute(ACHIEVEMENT_FIELDS.select(fields).order_by(Achievement.achievement_name)).mappings().all())
     achievements = db.execute(select(Achievement).order_by(Achievement.achievement_name)).scalars().all()
     return achievements
 
 
 @router.get("/training_types/statistics", response_model=List[TrainingTypeStatistics], tags=["resident panel", "training types endpoints"])
-def read_training_types_statistics(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_training_types_statistics(db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
     db_training_types_statistics = db.execute(select(
             TrainingType.training_name.label("training_name"),
             func.count().label("recorded_residents")
@@ -295,24 +352,32 @@ def read_training_types_statistics(db: Session = Depends(get_db), current_user:
 
 
 @router.get("/training_types/{type_id}", response_model=TrainingTypeInfo, tags=["training types endpoints"])
-def read_training_type(type_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_training_type(type_id: int, request: Request, response: Response, fields: list[str] | None = Depends(TRAINING_TYPE_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    if fields:
+        row = db.execute(TRAINING_TYPE_FIELDS.select(fields).where(TrainingType.id == type_id)).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training type not found")
+        return sparse_response(row)
+
+    if request.headers.get("if-none-match"):
+        validators = training_type_validators(db, type_id)
+        if validators is not None and is_not_modified(request, validators[0]):
+            return not_modified_response(*validators)
+
     training_type = db.execute(select(TrainingType).where(TrainingType.id == type_id)).scalars().first()
 
     if training_type is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training type not found")
 
+    response.headers.update(validator_headers(entity_etag(training_type), training_type.updated_at))
     return training_type
 
 
 @router.get("/achievements/received", response_model=List[AchievementInfo], tags=["achievements endpoints"])
-def read_received_achievements(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_received_achievements(resident: Resident = Depends(current_resident("achievements"))):
     """
     Returns a list of achievements the current user is received.
     """
-    resident = db.execute(select(Resident).where(Resident.user_id == current_user.id)).scalars().first()
-    if not resident:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
-
     received_achievements = sorted([
         ResidentToAchievement.achievement
         for ResidentToAchievement in resident.achievements
@@ -324,14 +389,10 @@ def read_received_achievements(db: Session = Depends(get_db), current_user: User
 
 
 @router.get("/achievements/not_received", response_model=List[AchievementInfo], tags=["achievements endpoints"])
-def read_not_received_achievements(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_not_received_achievements(db: Session = Depends(get_read_db), resident: Resident = Depends(current_resident("achievements"))):
     """
     Returns a list of achievements the current user is NOT received.
     """
-    resident = db.execute(select(Resident).where(Resident.user_id == current_user.id)).scalars().first()
-    if not resident:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
-
     received_achievements_ids = {
         achievement.achievement_id for achievement in resident.achievements
     }
@@ -344,10 +405,22 @@ def read_not_received_achievements(db: Session = Depends(get_db), current_user:
 
 
 @router.get("/achievements/{achievement_id}", response_model=AchievementInfo, tags=["achievements endpoints"])
-def read_achievement(achievement_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_achievement(achievement_id: int, request: Request, response: Response, fields: list[str] | None = Depends(ACHIEVEMENT_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    if fields:
+        row = db.execute(ACHIEVEMENT_FIELDS.select(fields).where(Achievement.id == achievement_id)).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Achievement not found")
+        return sparse_response(row)
+
+    if request.headers.get("if-none-match"):
+        validators = achievement_validators(db, achievement_id)
+        if validators is not None and is_not_modified(request, validators[0]):
+            return not_modified_response(*validators)
+
     achievement = db.execute(select(Achievement).where(Achievement.id == achievement_id)).scalars().first()
 
     if achievement is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Achievement not found")
 
+    response.headers.update(validator_headers(entity_etag(achievement), achievement.updated_at))
     return achievement
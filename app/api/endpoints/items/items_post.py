@@ -1,25 +1,31 @@
 from datetime import datetime, timedelta
 from typing import Annotated, List
 
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, select, ForeignKey, delete
-from sqlalchemy.orm import sessionmaker, declarative_base, Session, relationship, backref
+from fastapi import Depends, HTTPException, status, APIRouter, Request
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
 
 from app.api.endpoints.users import get_current_active_user
+from app.api.services.idempotency import IdempotentRoute, idempotency
+from app.api.services.seat_feed import publish_seat_count
+from app.api.services.seat_holds import EnrollmentConflict, enroll
 from app.api.models.models import User, News, Resident, Coach, TrainingType, TrainingSession, ResidentToTraining, \
     Achievement, ResidentToAchievement
 from app.api.schemas.item import NewsInfo, CoachInfo, TrainingSessionInfo, TrainingSessionInfoWithResidents, \
     TrainingTypeInfo, AchievementInfo, TrainingTypeStatistics, NewsCreate, CoachCreate, TrainingTypeCreate, \
     AchievementCreate, TrainingSessionCreate, ResidentToTrainingCreate
 
-from app.database import get_db
+from app.database import club_row_exists, get_db
 
 
-router = APIRouter()
+# Every write here accepts an Idempotency-Key header, see app/api/services/idempotency.py
+router = APIRouter(route_class=IdempotentRoute, dependencies=[idempotency(get_current_active_user)])
 
 
 @router.post("/news/", response_model=None, status_code=status.HTTP_201_CREATED, tags=["news endpoints"])
 def create_post(news: NewsCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    if not club_row_exists(db, User, news.user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     db_news = News(**news.dict())
     db.add(db_news)
     db.commit()
@@ -56,6 +62,10 @@ def create_achievement(achievement: AchievementCreate, db: Session = Depends(get
 
 @router.post("/training_sessions/", response_model=None, status_code=status.HTTP_201_CREATED, tags=["training sessions endpoints"])
 def create_training_session(training_session: TrainingSessionCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    if not club_row_exists(db, Coach, training_session.coach_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coach not found")
+    if not club_row_exists(db, TrainingType, training_session.training_type_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Such training type is not exist")
     db_training_session = TrainingSession(**training_session.dict())
     db.add(db_training_session)
     db.commit()
@@ -65,8 +75,15 @@ def create_training_session(training_session: TrainingSessionCreate, db: Session
 
 # POST Endpoint for Resident to Training (Protected)
 @router.post("/resident_to_training/", status_code=status.HTTP_201_CREATED, tags=["resident panel"])
-def add_resident_to_training(resident_to_training: ResidentToTrainingCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    db_resident_to_training = ResidentToTraining(**resident_to_training.dict())
-    db.add(db_resident_to_training)
+def add_resident_to_training(request: Request, resident_to_training: ResidentToTrainingCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+    if not club_row_exists(db, Resident, resident_to_training.resident_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found")
+    try:
+        enrolled = enroll(db, resident_to_training.training_session_id, resident_to_training.resident_id)
+    except EnrollmentConflict as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    if not enrolled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training session not found")
     db.commit()
+    publish_seat_count(request.app.state.seat_feed, db, resident_to_training.training_session_id)
     return {"message": "Resident added to training successfully"}
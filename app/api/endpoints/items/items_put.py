@@ -1,11 +1,14 @@
 from datetime import datetime, timedelta
 from typing import Annotated, List
 
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, select, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, Session, relationship, backref
+from fastapi import Depends, HTTPException, status, APIRouter, Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 
 from app.api.endpoints.users import get_current_active_user
+from app.api.repositories.entity_versions import entity_etag, training_session_validators
+from app.api.repositories.lookups import resident_by_id
+from app.api.services.seat_feed import publish_seat_count
 from app.api.models.models import User, News, Resident, Coach, TrainingType, TrainingSession, ResidentToTraining, \
     Achievement, ResidentToAchievement
 from app.api.schemas.item import NewsInfo, CoachInfo, TrainingSessionInfo, TrainingSessionInfoWithResidents, \
@@ -13,10 +16,13 @@ from app.api.schemas.item import NewsInfo, CoachInfo, TrainingSessionInfo, Train
     TrainingTypeUpdate, AchievementUpdate, CoachUpdate, NewsUpdate
 from app.api.schemas.user import ResidentInfo, ResidentUpdate
 
-from app.database import get_db
+from app.api.utils.conditional import check_if_match, validator_headers
+from app.api.services.tracing import TracedRoute
 
+from app.database import club_row_exists, get_db
 
-router = APIRouter()
+
+router = APIRouter(route_class=TracedRoute)
 
 
 @router.put("/residents/{resident_id}", response_model=ResidentInfo, tags=["resident panel"])
@@ -24,7 +30,7 @@ def update_resident(resident_id: int, resident_update: ResidentUpdate, db: Sessi
     """
     Updates a resident's information.
     """
-    db_resident = db.execute(select(Resident).where(Resident.id == resident_id)).scalars().first()
+    db_resident = resident_by_id(db, resident_id)
     if db_resident is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found")
 
@@ -47,6 +53,8 @@ def update_resident(resident_id: int, resident_update: ResidentUpdate, db: Sessi
 
 @router.put("/training_sessions/{session_id}", response_model=TrainingSessionShortInfo, tags=["training sessions endpoints"])
 def update_training_session(
+    request: Request,
+    response: Response,
     session_id: int,
     session_update: TrainingSessionUpdate,
     db: Session = Depends(get_db),
@@ -56,8 +64,14 @@ def update_training_session(
     Updates a training session's information.
     """
     db_session = db.execute(select(TrainingSession).where(TrainingSession.id == session_id)).scalars().first()
-    if db_session is None:
+    validators = training_session_validators(db, session_id)
+    if db_session is None or validators is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training Session not found")
+    check_if_match(request, validators[0])
+    if session_update.coach_id is not None and not club_row_exists(db, Coach, session_update.coach_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coach not found")
+    if session_update.training_type_id is not None and not club_row_exists(db, TrainingType, session_update.training_type_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Such training type is not exist")
 
     # Update fields if they are provided in the request
     if session_update.training_type_id is not None:
@@ -73,11 +87,16 @@ def update_training_session(
 
     db.commit()
     db.refresh(db_session)
+    if session_update.max_capacity is not None:
+        publish_seat_count(request.app.state.seat_feed, db, session_id)
+    response.headers.update(validator_headers(*training_session_validators(db, session_id)))
     return db_session
 
 
 @router.put("/training_types/{type_id}", response_model=TrainingTypeInfo, tags=["training types endpoints"])
 def update_training_type(
+    request: Request,
+    response: Response,
     type_id: int,
     type_update: TrainingTypeUpdate,
     db: Session = Depends(get_db),
@@ -89,6 +108,7 @@ def update_training_type(
     db_type = db.execute(select(TrainingType).where(TrainingType.id == type_id)).scalars().first()
     if db_type is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training Type not found")
+    check_if_match(request, entity_etag(db_type))
 
     # Update fields if they are provided in the request
     if type_update.training_name is not None:
@@ -98,11 +118,14 @@ def update_training_type(
 
     db.commit()
     db.refresh(db_type)
+    response.headers.update(validator_headers(entity_etag(db_type), db_type.updated_at))
     return db_type
 
 
 @router.put("/achievements/{achievement_id}", response_model=AchievementInfo, tags=["achievements endpoints"])
 def update_achievement(
+    request: Request,
+    response: Response,
     achievement_id: int,
     achievement_update: AchievementUpdate,
     db: Session = Depends(get_db),
@@ -114,6 +137,7 @@ def update_achievement(
     db_achievement = db.execute(select(Achievement).where(Achievement.id == achievement_id)).scalars().first()
     if db_achievement is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Achievement not found")
+    check_if_match(request, entity_etag(db_achievement))
 
     # Update fields if they are provided in the request
     if achievement_update.achievement_name is not None:
@@ -125,11 +149,14 @@ def update_achievement(
 
     db.commit()
     db.refresh(db_achievement)
+    response.headers.update(validator_headers(entity_etag(db_achievement), db_achievement.updated_at))
     return db_achievement
 
 
 @router.put("/coaches/{coach_id}", response_model=CoachInfo, tags=["coaches endpoints"])
 def update_coach(
+    request: Request,
+    response: Response,
     coach_id: int,
     coach_update: CoachUpdate,
     db: Session = Depends(get_db),
@@ -141,6 +168,7 @@ def update_coach(
     db_coach = db.execute(select(Coach).where(Coach.id == coach_id)).scalars().first()
     if db_coach is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Coach not found")
+    check_if_match(request, entity_etag(db_coach))
 
     # Update fields if they are provided in the request
     if coach_update.surname is not None:
@@ -156,11 +184,14 @@ def update_coach(
 
     db.commit()
     db.refresh(db_coach)
+    response.headers.update(validator_headers(entity_etag(db_coach), db_coach.updated_at))
     return db_coach
 
 
 @router.put("/news/{news_id}", response_model=NewsInfo, tags=["news endpoints"])
 def update_news(
+    request: Request,
+    response: Response,
     news_id: int,
     news_update: NewsUpdate,
     db: Session = Depends(get_db),
@@ -172,6 +203,7 @@ def update_news(
     db_news = db.execute(select(News).where(News.id == news_id)).scalars().first()
     if db_news is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="News post not found")
+    check_if_match(request, entity_etag(db_news))
 
     # Update fields if they are provided in the request
     if news_update.post_title is not None:
@@ -185,6 +217,7 @@ def update_news(
 
     db.commit()
     db.refresh(db_news)
+    response.headers.update(validator_headers(entity_etag(db_news), db_news.updated_at))
 
     return NewsInfo(
         id=db_news.id,
@@ -0,0 +1,28 @@
+from fastapi import Depends, APIRouter, Query
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user
+from app.api.models.models import User
+from app.api.repositories.search_queries import search_news_and_coaches
+from app.api.schemas.item import SearchResults
+from app.api.services.tracing import TracedRoute
+
+from app.database import get_read_db
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/search", response_model=SearchResults, tags=["search endpoints"])
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Full-text search over news (title, text) and coaches (speciality, qualification, extra info).
+    Results are ranked by relevance, best match first.
+    """
+    return search_news_and_coaches(db, q, limit, offset)
@@ -0,0 +1,77 @@
+import json
+from typing import List
+
+from fastapi import Depends, HTTPException, status, APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user
+from app.api.models.models import User
+from app.api.services.seat_feed import fetch_seat_counts
+from app.api.services.tracing import TracedRoute
+from app.config import settings
+
+from app.database import get_read_db, session_club, shared_session
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+def format_event(seats: dict) -> str:
+    return f"event: seats\ndata: {json.dumps(seats)}\n\n"
+
+
+def _snapshot(request: Request, db: Session, session_ids) -> list[dict]:
+    try:
+        return fetch_seat_counts(db, session_ids)
+    finally:
+        # The dependency's teardown only runs once the stream ends, which may be hours away: give the
+        # connection back to the pool now. A batch's shared session is left to the batch.
+        if shared_session(request) is None:
+            db.close()
+
+
+@router.get("/training_sessions/seats/stream", tags=["training sessions endpoints"])
+async def stream_seat_counts(
+    request: Request,
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Server-sent events with the remaining places of the given training sessions.
+    The current counts are sent first, then every change; a client that falls behind
+    only gets the latest count per session.
+    """
+    session_ids = set(ids)
+    if len(session_ids) > settings.SEAT_FEED_MAX_SESSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.SEAT_FEED_MAX_SESSIONS} training sessions per feed",
+        )
+
+    feed = request.app.state.seat_feed
+    # Subscribe before reading the counts so no change between the two is lost
+    subscriber = feed.subscribe(session_ids, session_club(db))
+    try:
+        # The query would block the event loop, and with it every other stream of the worker
+        snapshot = await run_in_threadpool(_snapshot, request, db, session_ids)
+    except Exception:
+        feed.unsubscribe(subscriber)
+        raise
+
+    async def events():
+        try:
+            for seats in snapshot:
+                yield format_event(seats)
+            while not await request.is_disconnected():
+                batch = await subscriber.next_batch(timeout=settings.SEAT_FEED_KEEPALIVE_SECONDS)
+                if not batch:
+                    yield ": keep-alive\n\n"
+                for seats in batch.values():
+                    yield format_event(seats)
+        finally:
+            feed.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,68 @@
+from fastapi import Depends, HTTPException, status, APIRouter, Request
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+
+from app.api.endpoints.users import get_current_active_user, get_current_resident
+from app.api.models.models import User, Resident, SeatHold
+from app.api.schemas.item import SeatHoldInfo
+from app.api.services.idempotency import IdempotentRoute, idempotency
+from app.api.services.seat_feed import publish_seat_count
+from app.api.services.seat_holds import EnrollmentConflict, place_hold, confirm_hold
+from app.config import settings
+
+from app.database import get_db, session_club
+
+
+router = APIRouter(route_class=IdempotentRoute, dependencies=[idempotency(get_current_active_user)])
+
+
+def own_hold(db: Session, hold_id: int, resident: Resident) -> SeatHold:
+    hold = db.execute(select(SeatHold).where(SeatHold.id == hold_id, SeatHold.resident_id == resident.id)).scalars().first()
+    if hold is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Seat hold not found")
+    return hold
+
+
+@router.post("/training_sessions/{session_id}/holds", response_model=SeatHoldInfo, status_code=status.HTTP_201_CREATED, tags=["resident panel"])
+def hold_seat(request: Request, session_id: int, db: Session = Depends(get_db), resident: Resident = Depends(get_current_resident)):
+    """
+    Keeps a place of the session for the current resident for SEAT_HOLD_TTL_SECONDS while they
+    confirm the booking. Holding again renews the hold.
+    """
+    try:
+        hold = place_hold(db, session_id, resident.id, settings.SEAT_HOLD_TTL_SECONDS)
+    except EnrollmentConflict as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    if hold is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Training session not found")
+    db.commit()
+    request.app.state.hold_timer.schedule(hold, session_club(db))
+    publish_seat_count(request.app.state.seat_feed, db, session_id)
+    return hold
+
+
+@router.post("/seat_holds/{hold_id}/confirm", status_code=status.HTTP_201_CREATED, tags=["resident panel"])
+def confirm_seat_hold(hold_id: int, db: Session = Depends(get_db), resident: Resident = Depends(get_current_resident)):
+    """
+    Enrolls the current resident on the held place; the hold and the enrollment change in one transaction.
+    """
+    hold = own_hold(db, hold_id, resident)
+    try:
+        confirmed = confirm_hold(db, hold)
+    except EnrollmentConflict as exc:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+    if not confirmed:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Seat hold expired")
+    db.commit()
+    # The place moved from the hold to the enrollment, the count is unchanged
+    return {"message": "Resident added to training successfully"}
+
+
+@router.delete("/seat_holds/{hold_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["resident panel"])
+def release_seat_hold(request: Request, hold_id: int, db: Session = Depends(get_db), resident: Resident = Depends(get_current_resident)):
+    hold = own_hold(db, hold_id, resident)
+    session_id = hold.training_session_id
+    db.execute(delete(SeatHold).where(SeatHold.id == hold.id).execution_options(synchronize_session=False))
+    db.commit()
+    publish_seat_count(request.app.state.seat_feed, db, session_id)
+    return
@@ -0,0 +1,24 @@
+from typing import Dict, List
+
+from fastapi import Depends, APIRouter, Query, Request
+
+from app.api.endpoints.users import get_current_admin
+from app.api.models.models import User
+from app.api.schemas.item import TraceInfo
+from app.api.services.tracing import TracedRoute
+
+
+router = APIRouter(route_class=TracedRoute)
+
+
+@router.get("/admin/traces/slowest", response_model=Dict[str, List[TraceInfo]], tags=["admin endpoints"])
+def read_slowest_traces(
+    request: Request,
+    route: str | None = Query(None, description="Route template, e.g. /api/v1/training_sessions/{training_session_id}"),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    The slowest sampled requests still in this worker's trace buffer, by route.
+    """
+    return request.app.state.tracer.slowest(route, limit)
@@ -1,34 +1,62 @@
 from datetime import datetime, timedelta
 from typing import Annotated, List
 
-from fastapi import FastAPI, Depends, HTTPException, status, APIRouter
+from fastapi import Depends, HTTPException, status, APIRouter, Query, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, select, ForeignKey
-from sqlalchemy.orm import sessionmaker, declarative_base, Session, relationship, backref
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
 
-from app.api.schemas.user import UserResponse, UserCreate, ResidentInfo, ResidentUpdate, Token, ResidentCreate
-from app.api.models.models import User, Resident
-from app.config import settings, engine, SessionLocal, oauth2_scheme
-from app.database import get_db
+from app.api.schemas.user import UserResponse, UserCreate, ResidentInfo, ResidentUpdate, Token, ResidentCreate, \
+    RefreshTokenRequest, CurrentUser
+from app.api.models.models import User, Resident, RefreshToken
+from app.api.repositories.fieldsets import RESIDENT_FIELDS
+from app.api.repositories.lookups import user_by_username, resident_by_id, resident_with_user_statement
+from app.api.repositories.search_queries import search_residents_postgres
+from app.api.services.idempotency import IdempotentRoute, idempotency
+from app.api.services.tracing import span
+from app.api.utils.fieldsets import sparse_response
+from app.config import settings
+from app.database import CLUB_STATE, get_db, get_read_db, session_club
 
 import bcrypt
+import hashlib
 import jwt
+import math
+import secrets
 
-router = APIRouter()
+router = APIRouter(route_class=IdempotentRoute)
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Set in the ASGI scope state by /batch, whose sub-requests reuse the caller it already authenticated
+BATCH_USER_STATE = "batch_current_user"
+# Residents already loaded for this request (and for the rest of a /batch), by user id and loads
+CURRENT_RESIDENT_STATE = "current_residents"
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme), db: Session = Depends(get_read_db)):
+    """
+    Resolves the caller from the access token claims alone; the database is only touched
+    when the revocation snapshot is due for a refresh.
+    """
+    batch_user = request.scope.get("state", {}).get(BATCH_USER_STATE)
+    if batch_user is not None:
+        return batch_user
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        with span("auth.jwt_decode"):
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        user_id: int = payload.get("uid")
+        if username is None or user_id is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
     except jwt.PyJWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    user = db.execute(select(User).where(User.username == username)).scalars().first()
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    return user
+    # From here on every session of this request works on the principal's club, see ClubSession
+    club = payload.get("club") or settings.DEFAULT_CLUB
+    request.scope.setdefault("state", {})[CLUB_STATE] = club
+    with span("auth.revocation_check"):
+        revoked = request.app.state.revocation_list.is_revoked(user_id, db, club)
+    if revoked:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+    return CurrentUser(id=user_id, username=username, is_active=payload.get("act", True), club=club)
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
@@ -37,6 +65,46 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 
+def is_admin(username: str, club: str | None) -> bool:
+    """
+    ADMIN_USERNAMES entries are "club:username", a bare username is the default club's: usernames are
+    only unique within a club's database, so a name alone could be registered again in another club.
+    """
+    club = club or settings.DEFAULT_CLUB
+    admins = {entry if ":" in entry else f"{settings.DEFAULT_CLUB}:{entry}" for entry in settings.ADMIN_USERNAMES}
+    return f"{club}:{username}" in admins
+
+
+async def get_current_admin(current_user: User = Depends(get_current_active_user)):
+    if not is_admin(current_user.username, current_user.club):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
+
+def current_resident(*loads: str):
+    """
+    Builds a dependency returning the caller's resident, loaded with its user in one joined query
+    together with the named collections (see RESIDENT_LOADS). Responds 404 if the caller has no resident.
+    """
+    loads = tuple(sorted(loads))
+    statement = resident_with_user_statement(loads)
+
+    def get_resident(request: Request, db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)) -> Resident:
+        memo = request.scope.setdefault("state", {}).setdefault(CURRENT_RESIDENT_STATE, {})
+        key = (current_user.id, loads)
+        if key not in memo:
+            with span("auth.current_resident"):
+                memo[key] = db.execute(statement, {"user_id": current_user.id, "club": session_club(db)}).unique().scalars().first()
+        if memo[key] is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found for this user")
+        return memo[key]
+
+    return get_resident
+
+
+get_current_resident = current_resident()
+
+
 # Hashing Function
 def hash_password(password: str) -> str:
     salt = bcrypt.gensalt()
@@ -56,9 +124,31 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
+def create_user_access_token(user: User) -> str:
+    return create_access_token(
+        data={"sub": user.username, "uid": user.id, "act": bool(user.is_active), "club": user.club},
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+
+def hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+
+def create_refresh_token(db: Session, user: User) -> str:
+    refresh_token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id=user.id,
+        token_hash=hash_refresh_token(refresh_token),
+        expires_at=datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    db.commit()
+    return refresh_token
+
+
 # Authentication Function
 def authenticate_user(db: Session, username: str, password: str):
-    user = db.execute(select(User).where(User.username == username)).scalars().first()
+    user = user_by_username(db, username)
     if not user:
         return None
     if bcrypt.checkpw(password.encode("utf-8"), user.hashed_password.encode("utf-8")):
@@ -68,17 +158,16 @@ def authenticate_user(db: Session, username: str, password: str):
 
 # API Endpoints
 # Auth Endpoints
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED, tags=["account managing"])
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED, tags=["account managing"], dependencies=[idempotency()])
 def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.execute(select(User).where(User.username == user.username)).scalars().first()
+    db_user = user_by_username(db, user.username)
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists")
 
     hashed_password = hash_password(user.password)
     new_user = User(username=user.username, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.flush()
 
     db_resident = Resident(
         user_id=new_user.id,
@@ -90,13 +179,23 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
     )
     db.add(db_resident)
     db.commit()
-    db.refresh(db_resident)
 
     return new_user
 
 
 @router.post("/token", response_model=Token, tags=["account managing"])
-def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+def login_for_access_token(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
+    # Rejected attempts never reach the database or bcrypt
+    login_throttle = request.app.state.login_throttle
+    if settings.LOGIN_THROTTLE_ENABLED:
+        retry_after = login_throttle.check(form_data.username, request.client.host if request.client else None)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
     user = authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
@@ -104,9 +203,73 @@ def login_for_access_token(form_data: Annotated[OAuth2PasswordRequestForm, Depen
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
-    return {"access_token": access_token, "token_type": "bearer"}
+    if settings.LOGIN_THROTTLE_ENABLED:
+        login_throttle.succeeded(form_data.username)
+    return {
+        "access_token": create_user_access_token(user),
+        "token_type": "bearer",
+        "refresh_token": create_refresh_token(db, user),
+    }
+
+
+def revoke_all_refresh_tokens(db: Session, user_id: int) -> None:
+    """
+    A used-up token coming back means it leaked, so every session of the user is cut off.
+    """
+    db.execute(update(RefreshToken).where(RefreshToken.user_id == user_id).values(revoked=True))
+    db.commit()
+
+
+@router.post("/token/refresh", response_model=Token, tags=["account managing"])
+def refresh_access_token(token_request: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """
+    Exchanges a refresh token for a new access/refresh pair. The presented refresh token is used up.
+    """
+    db_token = db.execute(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token_request.refresh_token))
+    ).scalars().first()
+    if db_token is None or db_token.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    if db_token.revoked:
+        revoke_all_refresh_tokens(db, db_token.user_id)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+    user = db_token.user
+    if user is None:
+        # The token belongs to a user of another club sharing this database
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Inactive user")
+
+    # Using the token up is conditional, so of two concurrent refreshes with it only one gets through
+    claimed = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == db_token.id, RefreshToken.revoked.is_(False))
+        .values(revoked=True)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if claimed != 1:
+        revoke_all_refresh_tokens(db, db_token.user_id)
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    return {
+        "access_token": create_user_access_token(user),
+        "token_type": "bearer",
+        "refresh_token": create_refresh_token(db, user),
+    }
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT, tags=["account managing"])
+def logout(token_request: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """
+    Revokes a refresh token. The access token stays valid until it expires.
+    """
+    db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == hash_refresh_token(token_request.refresh_token))
+        .values(revoked=True)
+    )
+    db.commit()
+    return
 
 
 @router.get("/users/me", response_model=UserResponse, tags=["resident panel"])
@@ -124,17 +287,42 @@ def create_resident(resident: ResidentCreate, db: Session = Depends(get_db), cur
 
 
 @router.get("/residents/all", response_model=List[ResidentInfo], tags=["resident panel"])
-def read_resident(db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+def read_resident(fields: list[str] | None = Depends(RESIDENT_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
     """
         Retrieves information for all residents.
     """
+    if fields:
+        return sparse_response(db.execute(RESIDENT_FIELDS.select(fields).order_by(Resident.surname, Resident.name)).mappings().all())
     residents = db.execute(select(Resident).order_by(Resident.surname, Resident.name)).scalars().all()
     return residents
 
 
+@router.get("/residents/search", response_model=List[ResidentInfo], tags=["resident panel"])
+def search_residents(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Finds residents by surname, name, email or phone, prefixes and misspellings included.
+    Surname prefix matches come first, then the closest matches.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return search_residents_postgres(db, q, limit)
+    return request.app.state.resident_index.search(db, q, limit)
+
+
 @router.get("/residents/{resident_id}", response_model=ResidentInfo, tags=["resident panel"])
-def read_resident(resident_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    resident = db.execute(select(Resident).where(Resident.id == resident_id)).scalars().first()
+def read_resident(resident_id: int, fields: list[str] | None = Depends(RESIDENT_FIELDS.query), db: Session = Depends(get_read_db), current_user: User = Depends(get_current_active_user)):
+    if fields:
+        row = db.execute(RESIDENT_FIELDS.select(fields).where(Resident.id == resident_id)).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found")
+        return sparse_response(row)
+
+    resident = resident_by_id(db, resident_id)
     if resident is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Resident not found")
     return resident
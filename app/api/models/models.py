@@ -1,11 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, Boolean, DateTime, Date, ForeignKey
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, Boolean, DateTime, LargeBinary, ForeignKey, DDL, Index, \
+    bindparam, event, func, select
+from sqlalchemy.orm import relationship, column_property
 from datetime import datetime
 
-from app.database import Base
+from app.database import Base, ClubScoped
+from app.api.repositories.search_queries import SEARCH_DDL, SEARCH_DROP_DDL, RESIDENT_SEARCH_DDL, \
+    RESIDENT_SEARCH_DROP_DDL
 
 
-class User(Base):
+class User(ClubScoped, Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -13,11 +16,63 @@ class User(Base):
     hashed_password = Column(String)
     is_active = Column(Boolean, default=True)
 
-    resident = relationship("Resident", back_populates="user", uselist=False, cascade="all, delete-orphan")
-    news = relationship("News", back_populates="user", cascade="all, delete-orphan")
+    resident = relationship("Resident", back_populates="user", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    news = relationship("News", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 
-class News(Base):
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    token_hash = Column(String, unique=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime)
+    revoked = Column(Boolean, default=False)
+
+    user = relationship("User", back_populates="refresh_tokens")
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of a write sent with an Idempotency-Key header, replayed when the client retries.
+    A row without status_code belongs to a request that is still running.
+    """
+    __tablename__ = "idempotency_keys"
+
+    key_hash = Column(String(64), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(SmallInteger)
+    content_type = Column(String)
+    response_body = Column(LargeBinary)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class Job(Base):
+    """
+    Deferred work for the worker pool in app/api/services/jobs.py.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    key = Column(String, unique=True)
+    payload = Column(Text, nullable=False, default="{}")
+    status = Column(String(16), nullable=False, default="queued")
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False)
+    run_at = Column(DateTime, nullable=False)
+    locked_until = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, index=True)
+
+    __table_args__ = (Index("ix_jobs_status_run_at", "status", "run_at"),)
+
+
+class News(ClubScoped, Base):
     __tablename__ = "news"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -26,11 +81,16 @@ class News(Base):
     post_info = Column(Text)
     post_image = Column(Text)
     post_time = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_news_version", "id", "version", "updated_at"),)
+    __mapper_args__ = {"version_id_col": version}
 
     user = relationship("User", back_populates="news")
 
 
-class Resident(Base):
+class Resident(ClubScoped, Base):
     __tablename__ = "residents"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -42,11 +102,11 @@ class Resident(Base):
     phone = Column(String)
 
     user = relationship("User", back_populates="resident")
-    trainings = relationship("ResidentToTraining", back_populates="resident", cascade="all, delete-orphan")
-    achievements = relationship("ResidentToAchievement", back_populates="resident", cascade="all, delete-orphan")
+    trainings = relationship("ResidentToTraining", back_populates="resident", cascade="all, delete-orphan", passive_deletes=True)
+    achievements = relationship("ResidentToAchievement", back_populates="resident", cascade="all, delete-orphan", passive_deletes=True)
 
 
-class Coach(Base):
+class Coach(ClubScoped, Base):
     __tablename__ = "coaches"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -55,36 +115,56 @@ class Coach(Base):
     speciality = Column(Text)
     qualification = Column(Text)
     extra_info = Column(Text)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (Index("ix_coaches_version", "id", "version", "updated_at"),)
+    __mapper_args__ = {"version_id_col": version}
 
-    training_sessions = relationship("TrainingSession", back_populates="coach", cascade="all, delete-orphan")
+    training_sessions = relationship("TrainingSession", back_populates="coach", cascade="all, delete-orphan", passive_deletes=True)
 
 
-class TrainingType(Base):
+class TrainingType(ClubScoped, Base):
     __tablename__ = "training_types"
     id = Column(Integer, primary_key=True, index=True)
     training_name = Column(String)
     description = Column(Text)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    training_sessions = relationship("TrainingSession", back_populates="training_type", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_training_types_version", "id", "version", "updated_at"),)
+    __mapper_args__ = {"version_id_col": version}
 
+    training_sessions = relationship("TrainingSession", back_populates="training_type", cascade="all, delete-orphan", passive_deletes=True)
 
-class TrainingSession(Base):
+
+class TrainingSession(ClubScoped, Base):
     __tablename__ = "training_sessions"
 
     id = Column(Integer, primary_key=True, index=True)
     training_type_id = Column(Integer, ForeignKey("training_types.id", ondelete="CASCADE"), index=True)
     coach_id = Column(Integer, ForeignKey("coaches.id", ondelete="CASCADE"), index=True)
-    start_time = Column(DateTime)
+    start_time = Column(DateTime, index=True)
     duration = Column(Integer)
     max_capacity = Column(Integer)
-
-    residents = relationship("ResidentToTraining", back_populates="training_session", cascade="all, delete-orphan")
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_training_sessions_version", "id", "version", "updated_at"),
+        # A coach's sessions in time order, for the free slot finder; club leads as every query filters on it
+        Index("ix_training_sessions_coach_start", "club", "coach_id", "start_time"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    residents = relationship("ResidentToTraining", back_populates="training_session", cascade="all, delete-orphan", passive_deletes=True)
+    holds = relationship("SeatHold", back_populates="training_session", cascade="all, delete-orphan", passive_deletes=True)
     training_type = relationship("TrainingType", back_populates="training_sessions")
     coach = relationship("Coach", back_populates="training_sessions")
 
     @property
     def remaining_places(self):
-        return self.max_capacity - len(self.residents)
+        return self.max_capacity - len(self.residents) - self.held_places
 
 
 class ResidentToTraining(Base):
@@ -94,19 +174,84 @@ class ResidentToTraining(Base):
     resident_id = Column(Integer, ForeignKey("residents.id", ondelete="CASCADE"), index=True)
     training_session_id = Column(Integer, ForeignKey("training_sessions.id", ondelete="CASCADE"), index=True)
 
+    __table_args__ = (Index("ix_residents_to_trainings_resident_session", "resident_id", "training_session_id", unique=True),)
+
     resident = relationship("Resident", back_populates="trainings")
     training_session = relationship("TrainingSession", back_populates="residents")
 
 
-class Achievement(Base):
+class SeatHold(Base):
+    """
+    A place kept for a resident while they confirm the booking. It counts against the session's
+    remaining places until it is confirmed, released or deleted on expiry by app/api/services/seat_holds.py.
+    """
+    __tablename__ = "seat_holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    training_session_id = Column(Integer, ForeignKey("training_sessions.id", ondelete="CASCADE"), nullable=False)
+    resident_id = Column(Integer, ForeignKey("residents.id", ondelete="CASCADE"), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (Index("ix_seat_holds_session_resident", "training_session_id", "resident_id", unique=True),)
+
+    training_session = relationship("TrainingSession", back_populates="holds")
+    resident = relationship("Resident")
+
+
+# Loaded with the session itself, so remaining_places costs no query per session; a lapsed hold the
+# expiry timer has not deleted yet no longer counts
+TrainingSession.held_places = column_property(
+    select(func.count(SeatHold.id))
+    .where(SeatHold.training_session_id == TrainingSession.id, SeatHold.expires_at > bindparam("held_now", callable_=datetime.utcnow))
+    .correlate_except(SeatHold).scalar_subquery()
+)
+
+
+class TrainingSessionArchive(ClubScoped, Base):
+    """
+    Sessions moved out of training_sessions by app/api/services/archive.py, ids kept.
+    """
+    __tablename__ = "training_sessions_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    training_type_id = Column(Integer, ForeignKey("training_types.id", ondelete="CASCADE"), index=True)
+    coach_id = Column(Integer, ForeignKey("coaches.id", ondelete="CASCADE"), index=True)
+    start_time = Column(DateTime, index=True)
+    duration = Column(Integer)
+    max_capacity = Column(Integer)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    residents = relationship("ResidentToTrainingArchive", back_populates="training_session", cascade="all, delete-orphan", passive_deletes=True)
+    training_type = relationship("TrainingType")
+    coach = relationship("Coach")
+
+
+class ResidentToTrainingArchive(Base):
+    __tablename__ = "residents_to_trainings_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    resident_id = Column(Integer, ForeignKey("residents.id", ondelete="CASCADE"), index=True)
+    training_session_id = Column(Integer, ForeignKey("training_sessions_archive.id", ondelete="CASCADE"), index=True)
+
+    resident = relationship("Resident")
+    training_session = relationship("TrainingSessionArchive", back_populates="residents")
+
+
+class Achievement(ClubScoped, Base):
     __tablename__ = "achievements"
 
     id = Column(Integer, primary_key=True, index=True)
     achievement_name = Column(String)
     description = Column(Text)
     criteria = Column(Text)
+    version = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    residents = relationship("ResidentToAchievement", back_populates="achievement", cascade="all, delete-orphan")
+    __table_args__ = (Index("ix_achievements_version", "id", "version", "updated_at"),)
+    __mapper_args__ = {"version_id_col": version}
+
+    residents = relationship("ResidentToAchievement", back_populates="achievement", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ResidentToAchievement(Base):
@@ -118,3 +263,13 @@ class ResidentToAchievement(Base):
 
     resident = relationship("Resident", back_populates="achievements")
     achievement = relationship("Achievement", back_populates="residents")
+
+
+# Full-text search structures live outside the ORM models, keep them in step with create_all/drop_all
+for dialect_name, statements in [*SEARCH_DDL.items(), *RESIDENT_SEARCH_DDL.items()]:
+    for statement in statements:
+        event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect=dialect_name))
+
+for dialect_name, statements in [*RESIDENT_SEARCH_DROP_DDL.items(), *SEARCH_DROP_DDL.items()]:
+    for statement in statements:
+        event.listen(Base.metadata, "before_drop", DDL(statement).execute_if(dialect=dialect_name))
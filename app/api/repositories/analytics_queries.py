@@ -0,0 +1,114 @@
+from datetime import datetime
+
+from sqlalchemy import select, func, cast, extract, literal, null, union_all, Float, Integer, String
+from sqlalchemy.orm import Session
+
+from app.api.models.models import Coach, TrainingType, TrainingSession, ResidentToTraining, TrainingSessionArchive, \
+    ResidentToTrainingArchive
+
+
+def _hour_of_week(dialect: str, start_time):
+    """
+    Day of week (0 = Monday) and hour of the session start, in the stored (UTC) time.
+    """
+    if dialect == "postgresql":
+        return (
+            cast(extract("isodow", start_time), Integer) - 1,
+            cast(extract("hour", start_time), Integer),
+        )
+    return (
+        (cast(func.strftime("%w", start_time), Integer) + 6) % 7,
+        cast(func.strftime("%H", start_time), Integer),
+    )
+
+
+def _per_session(dialect: str, session_model, enrollment_model, start: datetime, end: datetime):
+    in_range = (session_model.start_time >= start, session_model.start_time < end)
+    enrolled = (
+        select(enrollment_model.training_session_id, func.count().label("enrolled"))
+        .join(session_model, session_model.id == enrollment_model.training_session_id)
+        .where(*in_range)
+        .group_by(enrollment_model.training_session_id)
+        .subquery()
+    )
+    day_of_week, hour = _hour_of_week(dialect, session_model.start_time)
+    return (
+        select(
+            session_model.coach_id,
+            session_model.training_type_id,
+            day_of_week.label("day_of_week"),
+            hour.label("hour"),
+            session_model.max_capacity,
+            func.coalesce(enrolled.c.enrolled, 0).label("enrolled"),
+        )
+        .outerjoin(enrolled, enrolled.c.training_session_id == session_model.id)
+        .where(*in_range)
+    )
+
+
+def _stats(sessions, enrolled, capacity) -> dict:
+    return {
+        "sessions": sessions,
+        "enrolled": enrolled,
+        "capacity": capacity,
+        "occupancy": round(enrolled / capacity, 4) if capacity else 0.0,
+    }
+
+
+def occupancy_report(db: Session, start: datetime, end: datetime) -> dict:
+    """
+    Fill rates (enrolled / max_capacity) of the sessions starting in [start, end).
+
+    One statement: a per-session CTE (capacity, enrollment count, hour of week) over current and
+    archived sessions is rolled up by coach, by training type, by hour of week and overall with
+    UNION ALL'ed GROUP BYs, and rank() over each rollup orders it by occupancy.
+    Only the ~130 aggregate rows come back to Python.
+    """
+    dialect = db.get_bind().dialect.name
+    per_session = union_all(
+        _per_session(dialect, TrainingSession, ResidentToTraining, start, end),
+        _per_session(dialect, TrainingSessionArchive, ResidentToTrainingArchive, start, end),
+    ).cte("per_session")
+
+    def rollup(dimension: str, key1, key2, label1, label2):
+        return select(
+            literal(dimension).label("dimension"),
+            cast(key1, Integer).label("key1"),
+            cast(key2, Integer).label("key2"),
+            cast(label1, String).label("label1"),
+            cast(label2, String).label("label2"),
+            func.count().label("sessions"),
+            func.sum(per_session.c.enrolled).label("enrolled"),
+            func.sum(per_session.c.max_capacity).label("capacity"),
+        ).select_from(per_session)
+
+    rollups = union_all(
+        rollup("coach", per_session.c.coach_id, null(), Coach.surname, Coach.name)
+        .join(Coach, Coach.id == per_session.c.coach_id)
+        .group_by(per_session.c.coach_id, Coach.surname, Coach.name),
+        rollup("type", per_session.c.training_type_id, null(), TrainingType.training_name, null())
+        .join(TrainingType, TrainingType.id == per_session.c.training_type_id)
+        .group_by(per_session.c.training_type_id, TrainingType.training_name),
+        rollup("slot", per_session.c.day_of_week, per_session.c.hour, null(), null())
+        .group_by(per_session.c.day_of_week, per_session.c.hour),
+        rollup("all", null(), null(), null(), null()),
+    ).subquery()
+    occupancy = cast(rollups.c.enrolled, Float) / func.nullif(rollups.c.capacity, 0)
+    rows = db.execute(
+        select(rollups, func.rank().over(partition_by=rollups.c.dimension, order_by=occupancy.desc()).label("rank"))
+        .order_by(rollups.c.dimension, "rank", rollups.c.key1, rollups.c.key2)
+    ).mappings().all()
+
+    report = {"start": start, "end": end, "overall": _stats(0, 0, 0), "by_coach": [], "by_training_type": [], "heatmap": []}
+    for row in rows:
+        stats = _stats(row["sessions"], row["enrolled"] or 0, row["capacity"] or 0)
+        if row["dimension"] == "coach":
+            report["by_coach"].append({"coach_id": row["key1"], "coach_surname": row["label1"], "coach_name": row["label2"], **stats})
+        elif row["dimension"] == "type":
+            report["by_training_type"].append({"training_type_id": row["key1"], "training_type": row["label1"], **stats})
+        elif row["dimension"] == "slot":
+            report["heatmap"].append({"day_of_week": row["key1"], "hour": row["key2"], **stats})
+        else:
+            report["overall"] = stats
+    report["heatmap"].sort(key=lambda item: (item["day_of_week"], item["hour"]))
+    return report
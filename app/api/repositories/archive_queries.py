@@ -0,0 +1,30 @@
+from sqlalchemy import select, func
+
+from app.api.models.models import Coach, TrainingType, TrainingSessionArchive, ResidentToTrainingArchive
+
+
+def archived_sessions_select():
+    """
+    Archived sessions shaped like ArchivedTrainingSessionInfo, with their enrollment counts.
+    """
+    enrolled = (
+        select(func.count())
+        .select_from(ResidentToTrainingArchive)
+        .where(ResidentToTrainingArchive.training_session_id == TrainingSessionArchive.id)
+        .correlate(TrainingSessionArchive)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            TrainingSessionArchive.id,
+            TrainingType.training_name.label("training_type"),
+            Coach.surname.label("coach_surname"),
+            Coach.name.label("coach_name"),
+            TrainingSessionArchive.start_time,
+            TrainingSessionArchive.duration,
+            enrolled.label("enrolled"),
+            TrainingSessionArchive.max_capacity,
+        )
+        .join(TrainingType, TrainingType.id == TrainingSessionArchive.training_type_id)
+        .join(Coach, Coach.id == TrainingSessionArchive.coach_id)
+    )
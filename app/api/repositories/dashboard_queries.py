@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, aliased
+
+from app.api.models.models import Resident, Coach, TrainingType, TrainingSession, ResidentToTraining, \
+    Achievement, ResidentToAchievement
+
+
+def fetch_resident_dashboard(db: Session, user_id: int, now: datetime | None = None) -> dict | None:
+    """
+    Everything the resident home screen shows, in three queries whatever the number of enrollments:
+    the resident row with the achievement totals, the upcoming enrolled sessions with their seat counts,
+    and the received achievements. Returns None when the user has no resident profile.
+    """
+    now = now or datetime.utcnow()
+
+    received_count = (
+        select(func.count())
+        .select_from(ResidentToAchievement)
+        .where(ResidentToAchievement.resident_id == Resident.id)
+        .scalar_subquery()
+    )
+    total_count = select(func.count()).select_from(Achievement).scalar_subquery()
+    row = db.execute(
+        select(Resident, received_count.label("received"), total_count.label("total"))
+        .where(Resident.user_id == user_id)
+    ).first()
+    if row is None:
+        return None
+    resident, received, total = row
+
+    # Counted per returned session on the training_session_id index, not grouped over every enrollment;
+    # aliased so it does not correlate with the resident's own enrollment joined below
+    others = aliased(ResidentToTraining)
+    enrolled = (
+        select(func.count(others.id))
+        .where(others.training_session_id == TrainingSession.id)
+        .correlate_except(others)
+        .scalar_subquery()
+    )
+    sessions = db.execute(
+        select(
+            TrainingSession.id,
+            TrainingType.training_name.label("training_type"),
+            Coach.surname.label("coach_surname"),
+            Coach.name.label("coach_name"),
+            TrainingSession.start_time,
+            TrainingSession.duration,
+            (TrainingSession.max_capacity - enrolled - TrainingSession.held_places).label("remaining_places"),
+            TrainingSession.max_capacity,
+        )
+        .join(ResidentToTraining, ResidentToTraining.training_session_id == TrainingSession.id)
+        .join(TrainingType, TrainingType.id == TrainingSession.training_type_id)
+        .join(Coach, Coach.id == TrainingSession.coach_id)
+        .where(ResidentToTraining.resident_id == resident.id, TrainingSession.start_time >= now)
+        .order_by(TrainingSession.start_time)
+    ).mappings().all()
+
+    achievements = db.execute(
+        select(Achievement)
+        .join(ResidentToAchievement, ResidentToAchievement.achievement_id == Achievement.id)
+        .where(ResidentToAchievement.resident_id == resident.id)
+        .order_by(Achievement.achievement_name)
+    ).scalars().all()
+
+    return {
+        "resident": resident,
+        "upcoming_sessions": sessions,
+        "received_achievements": achievements,
+        "achievement_counts": {"received": received, "not_received": total - received, "total": total},
+    }
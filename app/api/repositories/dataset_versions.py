@@ -0,0 +1,101 @@
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.api.models.models import User, News, Resident, Coach, TrainingType, TrainingSession, ResidentToTraining, \
+    SeatHold
+from app.config import settings
+from app.database import ClubScoped, ClubSession, session_club
+
+ALL_CLUBS = "*"
+# Tables each cached dataset is rendered from; sessions also show type and coach names and the
+# number of remaining places, which enrollments and seat holds take
+DATASET_TABLES = {
+    "news": (News,),
+    "training_sessions": (TrainingSession, TrainingType, Coach, ResidentToTraining, SeatHold),
+}
+# No club column, but every row belongs to the club of the session writing it
+CLUB_CHILD_TABLES = (ResidentToTraining, SeatHold)
+# Deleting these cascades in the database to rows of every dataset, unseen by the ORM
+CASCADING_TABLES = (User, Resident)
+# Datasets changed in the session's transaction, as (club, dataset) pairs, counted once it commits
+PENDING_CHANGES = "dataset_changes"
+
+_datasets_by_table = {}
+for _dataset, _models in DATASET_TABLES.items():
+    for _model in _models:
+        _datasets_by_table.setdefault(_model.__tablename__, set()).add(_dataset)
+_club_child_tables = {model.__tablename__ for model in CLUB_CHILD_TABLES}
+_cascading_tables = {model.__tablename__ for model in CASCADING_TABLES}
+
+# Commits of this process per (club, dataset); writes of other workers are picked up by the max age
+_versions = Counter()
+_versions_lock = threading.Lock()
+
+
+def _add_changes(session: Session, table, instance=None, deleted: bool = False) -> None:
+    datasets = set(_datasets_by_table.get(table.name, ()))
+    if deleted and table.name in _cascading_tables:
+        datasets.update(DATASET_TABLES)
+    if not datasets:
+        return
+    club = getattr(session, "club", None)
+    if isinstance(instance, ClubScoped):
+        club = instance.club
+    elif club is None or not ("club" in table.c or table.name in _club_child_tables):
+        # Written by shard-wide work
+        club = ALL_CLUBS
+    session.info.setdefault(PENDING_CHANGES, set()).update((club, dataset) for dataset in datasets)
+
+
+@event.listens_for(ClubSession, "after_flush")
+def _collect_flushed_changes(session, flush_context):
+    for instance in (*session.new, *session.dirty):
+        _add_changes(session, type(instance).__table__, instance)
+    for instance in session.deleted:
+        _add_changes(session, type(instance).__table__, instance, deleted=True)
+
+
+@event.listens_for(ClubSession, "do_orm_execute")
+def _collect_statement_changes(execute_state: ORMExecuteState):
+    # insert/update/delete statements bypass the flush: seat holds, archiving, sweeps
+    if execute_state.is_insert or execute_state.is_update or execute_state.is_delete:
+        _add_changes(execute_state.session, execute_state.statement.table, deleted=execute_state.is_delete)
+
+
+@event.listens_for(ClubSession, "after_commit")
+def _bump_dataset_versions(session):
+    changes = session.info.pop(PENDING_CHANGES, None)
+    if changes:
+        with _versions_lock:
+            _versions.update(changes)
+
+
+@event.listens_for(ClubSession, "after_transaction_end")
+def _drop_dataset_changes(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(PENDING_CHANGES, None)
+
+
+def dataset_version(db: Session, dataset: str) -> str:
+    """
+    Changes with every write to the dataset's tables committed by this process, of the session's club
+    or of all clubs, and every DATASET_VERSION_MAX_AGE_SECONDS, which bounds how long a write made by
+    another worker goes unseen. Costs no query.
+    """
+    club = session_club(db)
+    with _versions_lock:
+        club_version, shared_version = _versions[club, dataset], _versions[ALL_CLUBS, dataset]
+    age = int(time.time() // settings.DATASET_VERSION_MAX_AGE_SECONDS)
+    return f"{club_version}-{shared_version}-{age}"
+
+
+def news_dataset_version(db: Session) -> str:
+    return dataset_version(db, "news")
+
+
+def training_sessions_dataset_version(db: Session) -> str:
+    return dataset_version(db, "training_sessions")
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.api.models.models import News, Coach, TrainingType, TrainingSession, ResidentToTraining, Achievement
+from app.api.utils.conditional import make_etag
+
+# Version lookups read only (id, version, updated_at), which the per-table ix_*_version indexes cover
+
+
+def entity_etag(entity) -> str:
+    return make_etag(type(entity).__tablename__, entity.id, entity.version)
+
+
+def entity_validators(db: Session, model, entity_id: int) -> tuple[str, datetime] | None:
+    row = db.execute(select(model.version, model.updated_at).where(model.id == entity_id)).first()
+    if row is None:
+        return None
+    return make_etag(model.__tablename__, entity_id, row.version), row.updated_at
+
+
+def training_session_validators(db: Session, training_session_id: int) -> tuple[str, datetime] | None:
+    """
+    A session is rendered with its type and coach names and its remaining places,
+    so all of those take part in its ETag. Outer joins: a session whose coach or type is not
+    visible (another club's row on a shared database) still has validators.
+    """
+    enrolled = (
+        select(func.count(ResidentToTraining.id))
+        .where(ResidentToTraining.training_session_id == TrainingSession.id)
+        .scalar_subquery()
+    )
+    row = db.execute(
+        select(TrainingSession.version, TrainingSession.updated_at, TrainingType.version, Coach.version, enrolled,
+               TrainingSession.held_places)
+        .outerjoin(TrainingType, TrainingType.id == TrainingSession.training_type_id)
+        .outerjoin(Coach, Coach.id == TrainingSession.coach_id)
+        .where(TrainingSession.id == training_session_id)
+    ).first()
+    if row is None:
+        return None
+    session_version, updated_at, type_version, coach_version, enrolled_count, held_count = row
+    etag = make_etag(TrainingSession.__tablename__, training_session_id, session_version, type_version, coach_version,
+                     enrolled_count, held_count)
+    return etag, updated_at
+
+
+def news_validators(db: Session, news_id: int):
+    return entity_validators(db, News, news_id)
+
+
+def coach_validators(db: Session, coach_id: int):
+    return entity_validators(db, Coach, coach_id)
+
+
+def training_type_validators(db: Session, type_id: int):
+    return entity_validators(db, TrainingType, type_id)
+
+
+def achievement_validators(db: Session, achievement_id: int):
+    return entity_validators(db, Achievement, achievement_id)
@@ -0,0 +1,58 @@
+from app.api.models.models import User, News, Resident, Coach, TrainingType, Achievement
+from app.api.utils.fieldsets import Fieldset
+
+NEWS_FIELDS = Fieldset(
+    News,
+    {
+        "id": News.id,
+        "username": User.username,
+        "post_title": News.post_title,
+        "post_info": News.post_info,
+        "post_image": News.post_image,
+        "post_time": News.post_time,
+    },
+    joins={User: News.user_id == User.id},
+)
+
+COACH_FIELDS = Fieldset(
+    Coach,
+    {
+        "id": Coach.id,
+        "surname": Coach.surname,
+        "name": Coach.name,
+        "speciality": Coach.speciality,
+        "qualification": Coach.qualification,
+        "extra_info": Coach.extra_info,
+    },
+)
+
+TRAINING_TYPE_FIELDS = Fieldset(
+    TrainingType,
+    {
+        "id": TrainingType.id,
+        "training_name": TrainingType.training_name,
+        "description": TrainingType.description,
+    },
+)
+
+ACHIEVEMENT_FIELDS = Fieldset(
+    Achievement,
+    {
+        "id": Achievement.id,
+        "achievement_name": Achievement.achievement_name,
+        "description": Achievement.description,
+        "criteria": Achievement.criteria,
+    },
+)
+
+RESIDENT_FIELDS = Fieldset(
+    Resident,
+    {
+        "id": Resident.id,
+        "surname": Resident.surname,
+        "name": Resident.name,
+        "birthdate": Resident.birthdate,
+        "email": Resident.email,
+        "phone": Resident.phone,
+    },
+)
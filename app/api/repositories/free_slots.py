@@ -0,0 +1,127 @@
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.models.models import Coach, TrainingSession
+from app.database import session_club
+
+# Sessions starting this long before the range may still run into it
+MAX_SESSION_MINUTES = 24 * 60
+MAX_RANGE_DAYS = 62
+
+
+def working_windows(start: datetime, end: datetime, day_start: time, day_end: time) -> list[tuple[datetime, datetime]]:
+    """
+    The working hours of every day of [start, end), clipped to the range.
+    """
+    windows = []
+    day = start.date()
+    while day <= end.date():
+        window_start = max(start, datetime.combine(day, day_start))
+        window_end = min(end, datetime.combine(day, day_end))
+        if window_start < window_end:
+            windows.append((window_start, window_end))
+        day += timedelta(days=1)
+    return windows
+
+
+def free_intervals(windows, busy, min_length: timedelta = timedelta(0)) -> list[tuple[datetime, datetime]]:
+    """
+    `windows` minus `busy` in one pass over both, each sorted by start. Busy intervals may overlap.
+    """
+    free = []
+
+    def add(free_start: datetime, free_end: datetime) -> None:
+        if free_end > free_start and free_end - free_start >= min_length:
+            free.append((free_start, free_end))
+
+    first = 0
+    for window_start, window_end in windows:
+        cursor = window_start
+        while first < len(busy) and busy[first][1] <= cursor:
+            first += 1
+        # Busy intervals reaching into the next window are looked at again there
+        position = first
+        while position < len(busy) and busy[position][0] < window_end:
+            add(cursor, busy[position][0])
+            cursor = max(cursor, busy[position][1])
+            position += 1
+        add(cursor, window_end)
+    return free
+
+
+def busy_intervals(db: Session, coach_ids: list[int], start: datetime, end: datetime) -> dict[int, list[tuple[datetime, datetime]]]:
+    """
+    Sessions of the coaches overlapping [start, end), per coach and by start time, as the
+    (club, coach_id, start_time) index returns them.
+    """
+    # Core rows on the session's connection skip the ORM's per-row work, which is most of the time for
+    # a month of every coach; ClubSession's club criteria don't apply there, so filter by hand
+    rows = db.connection().execute(
+        select(TrainingSession.coach_id, TrainingSession.start_time, TrainingSession.duration)
+        .where(
+            TrainingSession.club == session_club(db),
+            TrainingSession.coach_id.in_(coach_ids),
+            TrainingSession.start_time >= start - timedelta(minutes=MAX_SESSION_MINUTES),
+            TrainingSession.start_time < end,
+        )
+        .order_by(TrainingSession.coach_id, TrainingSession.start_time)
+    ).all()
+    busy = {coach_id: [] for coach_id in coach_ids}
+    for coach_id, sessions in groupby(rows, key=itemgetter(0)):
+        busy[coach_id] = [
+            (start_time, start_time + timedelta(minutes=duration or 0)) for _, start_time, duration in sessions
+        ]
+    return busy
+
+
+def common_intervals(first, second, min_length: timedelta = timedelta(0)) -> list[tuple[datetime, datetime]]:
+    """
+    Intersection of two sorted lists of disjoint intervals, in one pass over both.
+    """
+    common = []
+    i = j = 0
+    while i < len(first) and j < len(second):
+        common_start = max(first[i][0], second[j][0])
+        common_end = min(first[i][1], second[j][1])
+        if common_end > common_start and common_end - common_start >= min_length:
+            common.append((common_start, common_end))
+        if first[i][1] < second[j][1]:
+            i += 1
+        else:
+            j += 1
+    return common
+
+
+def existing_coach_ids(db: Session, coach_ids: list[int] | None) -> list[int]:
+    query = select(Coach.id).order_by(Coach.id)
+    if coach_ids:
+        query = query.where(Coach.id.in_(coach_ids))
+    return list(db.execute(query).scalars())
+
+
+def coach_free_slots(db: Session, coach_ids: list[int], start: datetime, end: datetime, day_start: time, day_end: time,
+                     min_minutes: int) -> dict:
+    """
+    Free intervals within working hours per coach, and those when all the coaches are free.
+    """
+    windows = working_windows(start, end, day_start, day_end)
+    min_length = timedelta(minutes=min_minutes)
+    busy = busy_intervals(db, coach_ids, start, end)
+    free = {coach_id: free_intervals(windows, busy[coach_id], min_length) for coach_id in coach_ids}
+    # A common interval lies within a free interval of every coach, so those filtered by length lose none
+    common = windows if coach_ids else []
+    for coach_id in coach_ids:
+        if not common:
+            break
+        common = common_intervals(common, free[coach_id], min_length)
+    return {
+        "coaches": [
+            {"coach_id": coach_id, "free": [{"start": s, "end": e} for s, e in free[coach_id]]}
+            for coach_id in coach_ids
+        ],
+        "common": [{"start": s, "end": e} for s, e in common],
+    }
@@ -0,0 +1,72 @@
+from sqlalchemy import select, bindparam
+from sqlalchemy.orm import Session, contains_eager, joinedload, selectinload
+
+from app.api.models.models import User, Resident, ResidentToTraining, TrainingSession, ResidentToAchievement
+from app.database import CLUB_FILTERED, session_club
+
+# Hot per-request lookups, built once at import. A statement object memoizes its cache key, so every
+# call goes straight to the engine's compiled cache with only the parameter values changing.
+# Cheaper than lambda_stmt here, whose closure analysis costs about as much as rebuilding the select,
+# see benchmarks/bench_lookups.py. They carry the club criterion as a parameter and are marked
+# CLUB_FILTERED, as ClubSession's own criteria would copy them on every execution; a session
+# without a club looks them up in the default club.
+
+
+def _prebuilt(statement, model):
+    return statement.where(model.club == bindparam("club")).execution_options(**{CLUB_FILTERED: True})
+
+
+USER_BY_USERNAME = _prebuilt(select(User).where(User.username == bindparam("username")), User)
+RESIDENT_BY_ID = _prebuilt(select(Resident).where(Resident.id == bindparam("resident_id")), Resident)
+RESIDENT_BY_USER_ID = _prebuilt(select(Resident).where(Resident.user_id == bindparam("user_id")), Resident)
+RESIDENT_ID_BY_USER_ID = _prebuilt(select(Resident.id).where(Resident.user_id == bindparam("user_id")), Resident)
+
+
+def user_by_username(db: Session, username: str) -> User | None:
+    return db.execute(USER_BY_USERNAME, {"username": username, "club": session_club(db)}).scalars().first()
+
+
+def resident_by_id(db: Session, resident_id: int) -> Resident | None:
+    return db.execute(RESIDENT_BY_ID, {"resident_id": resident_id, "club": session_club(db)}).scalars().first()
+
+
+def resident_by_user_id(db: Session, user_id: int) -> Resident | None:
+    return db.execute(RESIDENT_BY_USER_ID, {"user_id": user_id, "club": session_club(db)}).scalars().first()
+
+
+def resident_id_by_user_id(db: Session, user_id: int) -> int | None:
+    return db.execute(RESIDENT_ID_BY_USER_ID, {"user_id": user_id, "club": session_club(db)}).scalar()
+
+
+# Collections get_current_resident can load together with the resident, by the name handlers ask for
+RESIDENT_LOADS = {
+    "trainings": selectinload(Resident.trainings),
+    "enrolled_sessions": selectinload(Resident.trainings).joinedload(ResidentToTraining.training_session).options(
+        joinedload(TrainingSession.training_type),
+        joinedload(TrainingSession.coach),
+        selectinload(TrainingSession.residents),
+    ),
+    "achievements": selectinload(Resident.achievements).joinedload(ResidentToAchievement.achievement),
+}
+_resident_with_user: dict[tuple[str, ...], object] = {}
+
+
+def resident_with_user_statement(loads: tuple[str, ...]):
+    """
+    Resident and its user in one joined query, plus the requested RESIDENT_LOADS, executed with
+    `user_id` and `club`. One statement per combination of loads, built on first use.
+    """
+    statement = _resident_with_user.get(loads)
+    if statement is None:
+        unknown = set(loads) - RESIDENT_LOADS.keys()
+        if unknown:
+            raise ValueError(f"Unknown resident loads: {', '.join(sorted(unknown))}")
+        statement = _prebuilt(
+            select(Resident)
+            .join(Resident.user)
+            .options(contains_eager(Resident.user), *(RESIDENT_LOADS[name] for name in loads))
+            .where(Resident.user_id == bindparam("user_id")),
+            Resident,
+        )
+        _resident_with_user[loads] = statement
+    return statement
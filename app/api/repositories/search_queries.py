@@ -0,0 +1,249 @@
+import re
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import session_club
+
+# Postgres keeps a generated tsvector column with a GIN index on each searchable table,
+# SQLite keeps an external-content FTS5 table in sync with triggers.
+TS_CONFIG = "russian"
+
+SEARCH_DDL = {
+    "postgresql": [
+        f"""
+        ALTER TABLE news ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(post_title, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(post_info, '')), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_news_search_vector ON news USING GIN (search_vector)",
+        f"""
+        ALTER TABLE coaches ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(speciality, '')), 'A') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(qualification, '')), 'B') ||
+            setweight(to_tsvector('{TS_CONFIG}', coalesce(extra_info, '')), 'C')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_coaches_search_vector ON coaches USING GIN (search_vector)",
+    ],
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+            post_title, post_info, content='news', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS news_fts_ai AFTER INSERT ON news BEGIN
+            INSERT INTO news_fts(rowid, post_title, post_info) VALUES (new.id, new.post_title, new.post_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS news_fts_ad AFTER DELETE ON news BEGIN
+            INSERT INTO news_fts(news_fts, rowid, post_title, post_info) VALUES ('delete', old.id, old.post_title, old.post_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS news_fts_au AFTER UPDATE ON news BEGIN
+            INSERT INTO news_fts(news_fts, rowid, post_title, post_info) VALUES ('delete', old.id, old.post_title, old.post_info);
+            INSERT INTO news_fts(rowid, post_title, post_info) VALUES (new.id, new.post_title, new.post_info);
+        END
+        """,
+        "INSERT INTO news_fts(news_fts) VALUES ('rebuild')",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS coaches_fts USING fts5(
+            speciality, qualification, extra_info, content='coaches', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS coaches_fts_ai AFTER INSERT ON coaches BEGIN
+            INSERT INTO coaches_fts(rowid, speciality, qualification, extra_info)
+            VALUES (new.id, new.speciality, new.qualification, new.extra_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS coaches_fts_ad AFTER DELETE ON coaches BEGIN
+            INSERT INTO coaches_fts(coaches_fts, rowid, speciality, qualification, extra_info)
+            VALUES ('delete', old.id, old.speciality, old.qualification, old.extra_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS coaches_fts_au AFTER UPDATE ON coaches BEGIN
+            INSERT INTO coaches_fts(coaches_fts, rowid, speciality, qualification, extra_info)
+            VALUES ('delete', old.id, old.speciality, old.qualification, old.extra_info);
+            INSERT INTO coaches_fts(rowid, speciality, qualification, extra_info)
+            VALUES (new.id, new.speciality, new.qualification, new.extra_info);
+        END
+        """,
+        "INSERT INTO coaches_fts(coaches_fts) VALUES ('rebuild')",
+    ],
+}
+
+SEARCH_DROP_DDL = {
+    "postgresql": [
+        "DROP INDEX IF EXISTS ix_news_search_vector",
+        "ALTER TABLE news DROP COLUMN IF EXISTS search_vector",
+        "DROP INDEX IF EXISTS ix_coaches_search_vector",
+        "ALTER TABLE coaches DROP COLUMN IF EXISTS search_vector",
+    ],
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS news_fts_ai",
+        "DROP TRIGGER IF EXISTS news_fts_ad",
+        "DROP TRIGGER IF EXISTS news_fts_au",
+        "DROP TABLE IF EXISTS news_fts",
+        "DROP TRIGGER IF EXISTS coaches_fts_ai",
+        "DROP TRIGGER IF EXISTS coaches_fts_ad",
+        "DROP TRIGGER IF EXISTS coaches_fts_au",
+        "DROP TABLE IF EXISTS coaches_fts",
+    ],
+}
+
+POSTGRES_SEARCH_SQL = f"""
+    WITH query AS (
+        SELECT to_tsquery('{TS_CONFIG}', :match) AS tsq
+    ),
+    hits AS (
+        SELECT 'news' AS kind, n.id, n.post_title AS title,
+               concat_ws(' ', n.post_title, n.post_info) AS body,
+               ts_rank(n.search_vector, query.tsq) AS score
+        FROM news AS n, query
+        WHERE n.search_vector @@ query.tsq AND n.club = :club
+
+        UNION ALL
+
+        SELECT 'coach' AS kind, c.id, concat_ws(' ', c.surname, c.name) AS title,
+               concat_ws(' ', c.speciality, c.qualification, c.extra_info) AS body,
+               ts_rank(c.search_vector, query.tsq) AS score
+        FROM coaches AS c, query
+        WHERE c.search_vector @@ query.tsq AND c.club = :club
+    ),
+    page AS (
+        SELECT kind, id, title, body, score, count(*) OVER () AS total
+        FROM hits
+        ORDER BY score DESC, kind, id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.kind, page.id, page.title,
+           ts_headline('{TS_CONFIG}', page.body, query.tsq, 'MaxWords=20, MinWords=5') AS snippet,
+           page.score, page.total
+    FROM page, query
+    ORDER BY page.score DESC, page.kind, page.id
+"""
+
+SQLITE_SEARCH_SQL = """
+    WITH hits AS (
+        SELECT 'news' AS kind, n.id AS id, n.post_title AS title,
+               snippet(news_fts, -1, '', '', '…', 16) AS snippet,
+               -bm25(news_fts, 10.0, 1.0) AS score
+        FROM news_fts
+        JOIN news AS n ON n.id = news_fts.rowid
+        WHERE news_fts MATCH :match AND n.club = :club
+
+        UNION ALL
+
+        SELECT 'coach' AS kind, c.id AS id, c.surname || ' ' || c.name AS title,
+               snippet(coaches_fts, -1, '', '', '…', 16) AS snippet,
+               -bm25(coaches_fts, 10.0, 5.0, 1.0) AS score
+        FROM coaches_fts
+        JOIN coaches AS c ON c.id = coaches_fts.rowid
+        WHERE coaches_fts MATCH :match AND c.club = :club
+    )
+    SELECT kind, id, title, snippet, score, count(*) OVER () AS total
+    FROM hits
+    ORDER BY score DESC, kind, id
+    LIMIT :limit OFFSET :offset
+"""
+
+
+def build_match_query(q: str, dialect: str) -> str | None:
+    """
+    Turns free user input into a prefix AND-query, so no search syntax from the client reaches the engine.
+    """
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        return None
+    if dialect == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def search_news_and_coaches(db: Session, q: str, limit: int, offset: int):
+    dialect = db.get_bind().dialect.name
+    match = build_match_query(q, dialect)
+    if match is None:
+        return {"total": 0, "results": []}
+
+    sql = POSTGRES_SEARCH_SQL if dialect == "postgresql" else SQLITE_SEARCH_SQL
+    # Text SQL gets no club criteria from ClubSession, filter by hand
+    params = {"match": match, "club": session_club(db), "limit": limit, "offset": offset}
+    rows = db.execute(text(sql), params).mappings().all()
+
+    return {
+        "total": rows[0]["total"] if rows else 0,
+        "results": [
+            {
+                "kind": row["kind"],
+                "id": row["id"],
+                "title": row["title"] or "",
+                "snippet": row["snippet"] or "",
+                "score": row["score"],
+            }
+            for row in rows
+        ],
+    }
+
+
+# Resident lookup by name, email or phone. Postgres matches one lowercased document per resident through
+# a trigram GIN index on the same expression, plus a pattern btree for short surname prefixes.
+# Other databases use the in-memory index of app/api/services/resident_index.py.
+# Both keep only the digits of a phone, so "+7 (900) 123-45-67" and "79001234567" find the same resident.
+RESIDENT_SEARCH_DOCUMENT = (
+    "lower(coalesce(surname, '') || ' ' || coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || "
+    "regexp_replace(coalesce(phone, ''), '\\D', '', 'g'))"
+)
+
+RESIDENT_SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        f"CREATE INDEX IF NOT EXISTS ix_residents_search_trgm ON residents USING GIN (({RESIDENT_SEARCH_DOCUMENT}) gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_residents_surname_prefix ON residents (lower(surname) text_pattern_ops)",
+    ],
+}
+
+RESIDENT_SEARCH_DROP_DDL = {
+    "postgresql": [
+        "DROP INDEX IF EXISTS ix_residents_surname_prefix",
+        "DROP INDEX IF EXISTS ix_residents_search_trgm",
+    ],
+}
+
+# `<%` is word similarity above pg_trgm.word_similarity_threshold, so typos and partial words match;
+# surname prefix hits rank first, then the closest documents
+POSTGRES_RESIDENT_SEARCH_SQL = f"""
+    SELECT id, surname, name, birthdate, email, phone
+    FROM residents
+    WHERE club = :club AND (:q <% ({RESIDENT_SEARCH_DOCUMENT}) OR lower(surname) LIKE :prefix ESCAPE '\\')
+    ORDER BY lower(surname) LIKE :prefix ESCAPE '\\' DESC,
+             word_similarity(:q, {RESIDENT_SEARCH_DOCUMENT}) DESC,
+             surname, name, id
+    LIMIT :limit
+"""
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def phone_query_digits(q: str) -> str | None:
+    """
+    The digits of a query typed as a phone number, which is looked up as one run of digits however it was typed.
+    """
+    if re.fullmatch(r"[\d\s+\-()]+", q) and re.search(r"\d", q):
+        return re.sub(r"\D", "", q)
+    return None
+
+
+def search_residents_postgres(db: Session, q: str, limit: int) -> list[dict]:
+    q = phone_query_digits(q) or " ".join(q.lower().split())
+    params = {"q": q, "prefix": escape_like(q) + "%", "club": session_club(db), "limit": limit}
+    return [dict(row) for row in db.execute(text(POSTGRES_RESIDENT_SEARCH_SQL), params).mappings().all()]
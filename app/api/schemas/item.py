@@ -1,9 +1,9 @@
 from datetime import datetime, timedelta
 from decimal import Decimal
-from typing import Annotated, List, Dict
+from typing import Annotated, Any, List, Dict
 from pydantic import BaseModel, Field, validator, field_validator
 
-from app.api.schemas.user import ResidentInfo
+from app.api.schemas.user import ResidentInfo, UserResponse
 
 
 class NewsCreate(BaseModel):
@@ -156,3 +156,135 @@ class TrainingSessionInfoWithResidents(BaseModel):
     remaining_places: int
     max_capacity: int
     residents: List[ResidentInfo]
+
+
+class SearchResult(BaseModel):
+    kind: str
+    id: int
+    title: str
+    snippet: str
+    score: float
+
+
+class SearchResults(BaseModel):
+    total: int
+    results: List[SearchResult]
+
+
+class AchievementCounts(BaseModel):
+    received: int
+    not_received: int
+    total: int
+
+
+class ResidentDashboard(BaseModel):
+    user: UserResponse
+    resident: ResidentInfo
+    upcoming_sessions: List[TrainingSessionInfo]
+    received_achievements: List[AchievementInfo]
+    achievement_counts: AchievementCounts
+
+
+class BatchRequestItem(BaseModel):
+    method: str = "GET"
+    path: str
+    headers: Dict[str, str] = {}
+
+
+class BatchRequest(BaseModel):
+    requests: List[BatchRequestItem]
+
+
+class BatchResponseItem(BaseModel):
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
+
+
+class BatchResponse(BaseModel):
+    responses: List[BatchResponseItem]
+
+
+class OccupancyStats(BaseModel):
+    sessions: int
+    enrolled: int
+    capacity: int
+    occupancy: float
+
+
+class CoachOccupancy(OccupancyStats):
+    coach_id: int
+    coach_surname: str
+    coach_name: str
+
+
+class TrainingTypeOccupancy(OccupancyStats):
+    training_type_id: int
+    training_type: str
+
+
+class HourOfWeekOccupancy(OccupancyStats):
+    day_of_week: int
+    hour: int
+
+
+class OccupancyReport(BaseModel):
+    start: datetime
+    end: datetime
+    overall: OccupancyStats
+    by_coach: List[CoachOccupancy]
+    by_training_type: List[TrainingTypeOccupancy]
+    heatmap: List[HourOfWeekOccupancy]
+
+
+class ArchivedTrainingSessionInfo(BaseModel):
+    id: int
+    training_type: str
+    coach_surname: str
+    coach_name: str
+    start_time: datetime
+    duration: int
+    enrolled: int
+    max_capacity: int
+
+
+class TraceSpan(BaseModel):
+    span_id: int
+    parent_id: int | None
+    name: str
+    start_ms: float
+    duration_ms: float
+    attributes: Dict[str, Any]
+
+
+class TraceInfo(BaseModel):
+    trace_id: str
+    method: str
+    path: str
+    route: str
+    status_code: int | None
+    started_at: float
+    duration_ms: float
+    spans: List[TraceSpan]
+
+
+class SeatHoldInfo(BaseModel):
+    id: int
+    training_session_id: int
+    resident_id: int
+    expires_at: datetime
+
+
+class FreeInterval(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class CoachFreeSlots(BaseModel):
+    coach_id: int
+    free: List[FreeInterval]
+
+
+class FreeSlots(BaseModel):
+    coaches: List[CoachFreeSlots]
+    common: List[FreeInterval]
@@ -26,6 +26,18 @@ class UserCreate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+
+class CurrentUser(BaseModel):
+    id: int
+    username: str
+    is_active: bool
+    club: str | None = None
 
 
 class UserResponse(BaseModel):
@@ -0,0 +1,114 @@
+import asyncio
+import re
+from collections import deque
+
+from app.config import Settings
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+API_PREFIX = "/api/v1"
+
+# Route classes by path below API_PREFIX; checked in order, unsafe methods not listed here count as "writes"
+AUTH_PATHS = re.compile(r"^/(token|token/refresh|register|logout)/?$")
+HEAVY_READ_PATHS = re.compile(
+    r"^/(training_sessions/(all|not_enrolled)|residents/(all|search)|coaches/free_slots|training_types/statistics"
+    r"|analytics/|history/|search|batch/?$)"
+)
+# POSTed, but its sub-requests are all GETs: classified by path before the method
+READ_ONLY_POSTS = re.compile(r"^/batch/?$")
+# Long-lived streams would hold a slot for their whole life
+UNLIMITED_PATHS = re.compile(r"^/training_sessions/seats/stream")
+
+
+class AdmissionGate:
+    """
+    At most `max_concurrent` requests of one route class at a time, up to `max_queue` more waiting
+    for at most `queue_timeout` seconds; anything beyond is refused at once.
+    Lives on the worker's event loop, so plain counters need no lock.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            self._leave(waiter)
+            raise
+        if waiter.done():
+            return True
+        self._leave(waiter)
+        return False
+
+    def _leave(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the wait ended, pass it on
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        """
+        Hands the slot straight to the oldest waiter, so a newcomer cannot overtake the queue.
+        """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.active -= 1
+
+
+class AdmissionController:
+    def __init__(self, gates: dict[str, AdmissionGate], retry_after: int):
+        self.gates = gates
+        self.retry_after = retry_after
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AdmissionController":
+        timeout = settings.ADMISSION_QUEUE_TIMEOUT_SECONDS
+        return cls(
+            gates={
+                "auth": AdmissionGate("auth", settings.ADMISSION_AUTH_CONCURRENCY, settings.ADMISSION_AUTH_QUEUE, timeout),
+                "writes": AdmissionGate("writes", settings.ADMISSION_WRITE_CONCURRENCY, settings.ADMISSION_WRITE_QUEUE, timeout),
+                "heavy_reads": AdmissionGate("heavy_reads", settings.ADMISSION_HEAVY_READ_CONCURRENCY, settings.ADMISSION_HEAVY_READ_QUEUE, timeout),
+                "reads": AdmissionGate("reads", settings.ADMISSION_READ_CONCURRENCY, settings.ADMISSION_READ_QUEUE, timeout),
+            },
+            retry_after=settings.ADMISSION_RETRY_AFTER_SECONDS,
+        )
+
+    def route_class(self, method: str, path: str) -> str | None:
+        if not path.startswith(API_PREFIX + "/"):
+            return None
+        path = path[len(API_PREFIX):]
+        if UNLIMITED_PATHS.match(path):
+            return None
+        if AUTH_PATHS.match(path):
+            return "auth"
+        if method not in SAFE_METHODS and not READ_ONLY_POSTS.match(path):
+            return "writes"
+        if HEAVY_READ_PATHS.match(path):
+            return "heavy_reads"
+        return "reads"
+
+    def gate_for(self, method: str, path: str) -> AdmissionGate | None:
+        route_class = self.route_class(method, path)
+        return None if route_class is None else self.gates[route_class]
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import select, insert, delete, literal
+from sqlalchemy.orm import Session
+
+from app.api.models.models import TrainingSession, ResidentToTraining, TrainingSessionArchive, ResidentToTrainingArchive
+
+
+def archive_training_sessions(db: Session, before: datetime, batch_size: int = 1000,
+                              on_batch: Callable[[Session], None] | None = None) -> tuple[int, int]:
+    """
+    Moves sessions that started before `before`, with their enrollments, into the archive tables.
+
+    Works in batches of `batch_size` sessions, each its own transaction: copy the sessions, copy their
+    enrollments, then delete the sessions and let ON DELETE CASCADE drop the enrollments.
+    `on_batch(db)` runs in each batch's transaction, before it commits.
+    Returns the number of sessions and enrollments moved.
+    """
+    archived_at = datetime.utcnow()
+    moved_sessions = moved_enrollments = 0
+    while True:
+        ids = db.execute(
+            select(TrainingSession.id)
+            .where(TrainingSession.start_time < before)
+            .order_by(TrainingSession.start_time)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return moved_sessions, moved_enrollments
+
+        db.execute(insert(TrainingSessionArchive).from_select(
+            ["id", "club", "training_type_id", "coach_id", "start_time", "duration", "max_capacity", "archived_at"],
+            select(
+                TrainingSession.id, TrainingSession.club, TrainingSession.training_type_id, TrainingSession.coach_id,
+                TrainingSession.start_time, TrainingSession.duration, TrainingSession.max_capacity,
+                literal(archived_at),
+            ).where(TrainingSession.id.in_(ids)),
+        ))
+        enrollments = db.execute(insert(ResidentToTrainingArchive).from_select(
+            ["id", "resident_id", "training_session_id"],
+            select(ResidentToTraining.id, ResidentToTraining.resident_id, ResidentToTraining.training_session_id)
+            .where(ResidentToTraining.training_session_id.in_(ids)),
+        ))
+        db.execute(delete(TrainingSession).where(TrainingSession.id.in_(ids)))
+        if on_batch is not None:
+            on_batch(db)
+        db.commit()
+
+        moved_sessions += len(ids)
+        moved_enrollments += enrollments.rowcount
+
+
+def archive_horizon(days: int, now: datetime | None = None) -> datetime:
+    return (now or datetime.utcnow()) - timedelta(days=days)
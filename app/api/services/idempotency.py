@@ -0,0 +1,165 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import Callable
+
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exception_handlers import http_exception_handler
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.api.models.models import IdempotencyKey
+from app.api.services.tracing import TracedRoute
+from app.config import settings
+from app.database import get_db
+
+
+class IdempotentReplay(Exception):
+    """
+    Raised by the idempotency dependency when the key already has a stored response; the app's
+    exception handler turns it back into that response without running the endpoint.
+    """
+
+    def __init__(self, record: IdempotencyKey):
+        self.status_code = record.status_code
+        self.content_type = record.content_type
+        self.body = record.response_body
+
+
+def replay_response(request: Request, exc: IdempotentReplay) -> Response:
+    return Response(
+        content=exc.body,
+        status_code=exc.status_code,
+        media_type=exc.content_type,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _sha256(value: bytes) -> str:
+    return hashlib.sha256(value).hexdigest()
+
+
+def purge_expired_keys(db: Session) -> None:
+    """
+    Run periodically by the maintenance.purge job, see app/api/services/maintenance.py.
+    """
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow()))
+
+
+def _begin(request: Request, db: Session, key: str, body: bytes, user_id: int | None) -> None:
+    now = datetime.utcnow()
+
+    request_hash = _sha256(body)
+    # Without a user, as on /register, a key belongs to the client address and the body it came with,
+    # so nobody can replay or block another client's request by guessing its key
+    scope = user_id if user_id is not None else f"client:{request.client.host if request.client else None}:{request_hash}"
+    key_hash = _sha256(f"{scope}:{request.method}:{request.url.path}:{key}".encode())
+    record = db.get(IdempotencyKey, key_hash)
+    if record is not None:
+        abandoned = record.status_code is None and record.created_at < now - timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+        if record.expires_at <= now or abandoned:
+            db.delete(record)
+            db.commit()
+        elif record.request_hash != request_hash:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Idempotency-Key was already used with a different request")
+        elif record.status_code is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is still in progress")
+        else:
+            raise IdempotentReplay(record)
+
+    # Claim the key before running the endpoint, so concurrent retries cannot both do the work
+    db.add(IdempotencyKey(
+        key_hash=key_hash,
+        request_hash=request_hash,
+        created_at=now,
+        expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="A request with this Idempotency-Key is still in progress")
+    request.state.idempotency = (key_hash, db)
+
+
+def _complete(key_hash: str, db: Session, response: Response) -> None:
+    record = db.get(IdempotencyKey, key_hash)
+    if record is not None:
+        record.status_code = response.status_code
+        record.content_type = response.headers.get("content-type")
+        record.response_body = response.body
+        db.commit()
+
+
+def _refuse(key_hash: str, db: Session, response: Response) -> None:
+    # Whatever the endpoint left uncommitted before raising is not part of the outcome
+    db.rollback()
+    _complete(key_hash, db, response)
+
+
+def _abandon(key_hash: str, db: Session) -> None:
+    db.rollback()
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.key_hash == key_hash))
+    db.commit()
+
+
+def idempotency(user_dependency: Callable | None = None):
+    """
+    Route dependency honouring an optional Idempotency-Key header. Keys are scoped to the method,
+    the path and the authenticated user when `user_dependency` is given, otherwise the client address
+    and the request body.
+    Only takes effect on routes built with IdempotentRoute, which stores the response.
+    """
+    async def begin(request: Request, key: str | None, db: Session, user_id: int | None) -> None:
+        if key is not None:
+            body = await request.body()
+            await run_in_threadpool(_begin, request, db, key, body, user_id)
+
+    if user_dependency is None:
+        async def dependency(request: Request, idempotency_key: str | None = Header(None, max_length=255), db: Session = Depends(get_db)):
+            await begin(request, idempotency_key, db, None)
+    else:
+        async def dependency(request: Request, idempotency_key: str | None = Header(None, max_length=255), db: Session = Depends(get_db), current_user=Depends(user_dependency)):
+            await begin(request, idempotency_key, db, current_user.id)
+
+    return Depends(dependency)
+
+
+class IdempotentRoute(TracedRoute):
+    """
+    Stores the response of a request that claimed an Idempotency-Key. Runs before the request's
+    dependencies are torn down, so it reuses the endpoint's session. Client errors are stored whether
+    the endpoint returns or raises them; server errors and other exceptions release the key, letting
+    the client retry for real. So do invalid request bodies, which fail the same way on retry anyway.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def idempotent_handler(request: Request) -> Response:
+            try:
+                response = await handler(request)
+            except HTTPException as exc:
+                claim = getattr(request.state, "idempotency", None)
+                if claim is not None:
+                    if exc.status_code < 500:
+                        await run_in_threadpool(_refuse, *claim, await http_exception_handler(request, exc))
+                    else:
+                        await run_in_threadpool(_abandon, *claim)
+                raise
+            except Exception:
+                claim = getattr(request.state, "idempotency", None)
+                if claim is not None:
+                    await run_in_threadpool(_abandon, *claim)
+                raise
+
+            claim = getattr(request.state, "idempotency", None)
+            if claim is not None:
+                if response.status_code < 500:
+                    await run_in_threadpool(_complete, *claim, response)
+                else:
+                    await run_in_threadpool(_abandon, *claim)
+            return response
+
+        return idempotent_handler
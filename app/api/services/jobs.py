@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+import random
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import select, update, insert, and_, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.models.models import Job
+from app.config import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# Session info key holding the (job id, attempt, lease seconds) of the job the session runs
+JOB_LEASE = "job_lease"
+
+JOB_HANDLERS: dict[str, Callable[[Session, dict], None]] = {}
+
+
+def job(name: str):
+    """
+    Registers `func(db, payload)` as the handler of jobs called `name`. The handler's changes are
+    committed together with the job's completion; raising makes the job retry with backoff.
+    """
+    def register(func):
+        JOB_HANDLERS[name] = func
+        return func
+    return register
+
+
+def enqueue(db: Session, name: str, payload: dict | None = None, key: str | None = None,
+            delay_seconds: float = 0, max_attempts: int | None = None) -> None:
+    """
+    Adds a job in the caller's transaction, so it only exists if the caller commits.
+    A job with an already used `key` is silently skipped.
+    """
+    now = datetime.utcnow()
+    values = {
+        "name": name,
+        "key": key,
+        "payload": json.dumps(payload or {}),
+        "status": QUEUED,
+        "attempts": 0,
+        "max_attempts": max_attempts or settings.JOB_MAX_ATTEMPTS,
+        "run_at": now + timedelta(seconds=delay_seconds),
+        "created_at": now,
+    }
+    dialect = db.get_bind().dialect.name
+    if key is not None and dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        db.execute(dialect_insert(Job).values(**values).on_conflict_do_nothing(index_elements=["key"]))
+    else:
+        db.execute(insert(Job).values(**values))
+
+
+def _due(now: datetime):
+    # Running jobs whose lease ran out belong to a worker that died, they are picked up again
+    return or_(
+        and_(Job.status == QUEUED, Job.run_at <= now),
+        and_(Job.status == RUNNING, Job.locked_until < now),
+    )
+
+
+def claim_job(db: Session, lease_seconds: float) -> int | None:
+    """
+    Leases the next due job and returns its id. SKIP LOCKED keeps Postgres workers off each other's
+    candidates; the conditional UPDATE is what makes the claim safe everywhere.
+    """
+    now = datetime.utcnow()
+    job_id = db.execute(
+        select(Job.id).where(_due(now)).order_by(Job.run_at).limit(1).with_for_update(skip_locked=True)
+    ).scalar()
+    if job_id is None:
+        db.rollback()
+        return None
+    claimed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, _due(now))
+        .values(status=RUNNING, attempts=Job.attempts + 1, locked_until=now + timedelta(seconds=lease_seconds))
+    ).rowcount
+    db.commit()
+    return job_id if claimed else None
+
+
+class LeaseLost(Exception):
+    """
+    The job's lease ran out and another worker claimed it again.
+    """
+
+
+def renew_lease(db: Session) -> None:
+    """
+    Extends the lease of the job `db` runs, in the caller's transaction; for handlers that commit as
+    they go and may outlive one lease. Does nothing outside a job.
+    """
+    lease = db.info.get(JOB_LEASE)
+    if lease is None:
+        return
+    job_id, attempts, lease_seconds = lease
+    renewed = db.execute(
+        update(Job)
+        .where(Job.id == job_id, Job.status == RUNNING, Job.attempts == attempts)
+        .values(locked_until=datetime.utcnow() + timedelta(seconds=lease_seconds))
+    ).rowcount
+    if not renewed:
+        raise LeaseLost(f"Job {job_id} was claimed by another worker")
+
+
+def backoff_seconds(attempts: int) -> float:
+    delay = min(settings.JOB_BACKOFF_MAX_SECONDS, settings.JOB_BACKOFF_SECONDS * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def run_job(session_factory: sessionmaker, job_id: int, lease_seconds: float | None = None,
+            session_info: dict | None = None) -> None:
+    with session_factory() as db:
+        db.info.update(session_info or {})
+        claimed = db.get(Job, job_id)
+        name, payload = claimed.name, json.loads(claimed.payload)
+        db.info[JOB_LEASE] = (job_id, claimed.attempts, lease_seconds or settings.JOB_LEASE_SECONDS)
+        try:
+            handler = JOB_HANDLERS.get(name)
+            if handler is None:
+                raise LookupError(f"No handler registered for job {name!r}")
+            handler(db, payload)
+            db.execute(update(Job).where(Job.id == job_id).values(
+                status=DONE, locked_until=None, last_error=None, finished_at=datetime.utcnow(),
+            ))
+            db.commit()
+        except LeaseLost:
+            # The job is another worker's now, its row is not ours to update
+            db.rollback()
+            logger.warning("Job %s (%s) lost its lease", job_id, name)
+        except Exception as exc:
+            db.rollback()
+            logger.warning("Job %s (%s) failed", job_id, name, exc_info=True)
+            failed = db.get(Job, job_id)
+            now = datetime.utcnow()
+            if failed.attempts >= failed.max_attempts:
+                failed.status, failed.finished_at = FAILED, now
+            else:
+                failed.status, failed.run_at = QUEUED, now + timedelta(seconds=backoff_seconds(failed.attempts))
+            failed.locked_until = None
+            failed.last_error = f"{type(exc).__name__}: {exc}"
+            db.commit()
+
+
+def run_pending(session_factory: sessionmaker, lease_seconds: float | None = None, session_info: dict | None = None) -> int:
+    """
+    Runs due jobs in the calling thread until none is left. Returns how many were run.
+    """
+    count = 0
+    while True:
+        with session_factory() as db:
+            job_id = claim_job(db, lease_seconds or settings.JOB_LEASE_SECONDS)
+        if job_id is None:
+            return count
+        run_job(session_factory, job_id, lease_seconds, session_info)
+        count += 1
+
+
+class JobWorkerPool:
+    """
+    Worker tasks polling the jobs table, started and stopped by the application lifespan.
+    Database work happens in threads, the tasks only wait. Periodic jobs are enqueued with a key per
+    period, so every process may schedule them and each period still runs once. `session_info` is
+    added to the info of every job's session, for handlers that need the process's services.
+    """
+
+    def __init__(self, session_factory: sessionmaker, workers: int, poll_seconds: float, lease_seconds: float,
+                 schedule: dict[str, float] | None = None, session_info: dict | None = None):
+        self.session_factory = session_factory
+        self.session_info = session_info or {}
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.schedule = schedule or {}
+        self._stopping = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(cls, session_factory: sessionmaker, app_settings: Settings,
+                      session_info: dict | None = None) -> "JobWorkerPool":
+        schedule = {
+            "maintenance.purge": app_settings.IDEMPOTENCY_PURGE_INTERVAL_SECONDS,
+            "seat_holds.sweep": app_settings.SEAT_HOLD_SWEEP_SECONDS,
+        }
+        if app_settings.ARCHIVE_EVERY_HOURS:
+            schedule["archive.training_sessions"] = app_settings.ARCHIVE_EVERY_HOURS * 3600
+        return cls(
+            session_factory,
+            workers=app_settings.JOB_WORKERS,
+            poll_seconds=app_settings.JOB_POLL_SECONDS,
+            lease_seconds=app_settings.JOB_LEASE_SECONDS,
+            schedule=schedule,
+            session_info=session_info,
+        )
+
+    def start(self) -> None:
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        if self.schedule:
+            self._tasks.append(asyncio.create_task(self._enqueue_periodic()))
+
+    async def stop(self) -> None:
+        """
+        Lets running jobs finish; a job cut off by a hard kill is retried once its lease expires.
+        """
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _sleep(self, seconds: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _claim(self) -> int | None:
+        with self.session_factory() as db:
+            return claim_job(db, self.lease_seconds)
+
+    async def _work(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job_id = await asyncio.to_thread(self._claim)
+            except Exception:
+                logger.warning("Could not claim a job", exc_info=True)
+                job_id = None
+            if job_id is None:
+                await self._sleep(self.poll_seconds)
+            else:
+                await asyncio.to_thread(run_job, self.session_factory, job_id, self.lease_seconds, self.session_info)
+
+    def _enqueue_due_periods(self) -> None:
+        now = datetime.utcnow().timestamp()
+        with self.session_factory() as db:
+            for name, every_seconds in self.schedule.items():
+                enqueue(db, name, key=f"{name}:{int(now // every_seconds)}")
+            db.commit()
+
+    async def _enqueue_periodic(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.to_thread(self._enqueue_due_periods)
+            except Exception:
+                logger.warning("Could not enqueue periodic jobs", exc_info=True)
+            await self._sleep(min(self.schedule.values()))
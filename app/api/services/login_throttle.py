@@ -0,0 +1,136 @@
+import importlib
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from app.config import Settings
+
+
+class BucketStore(ABC):
+    """
+    Storage for token buckets. Subclass it to share buckets between workers (Redis, memcached, ...)
+    and point LOGIN_THROTTLE_BACKEND at the class as "package.module:ClassName".
+    """
+
+    @abstractmethod
+    def consume(self, key: str, capacity: float, refill_per_second: float) -> float:
+        """
+        Takes one token from the bucket. Returns 0 when the token was taken,
+        otherwise the number of seconds until the next token is available.
+        """
+
+    @abstractmethod
+    def reset(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class InMemoryBucketStore(BucketStore):
+    """
+    Per-process buckets split over independently locked shards.
+    A bucket is a (tokens, updated_at, full_at) tuple; once it would be refilled to capacity it is
+    indistinguishable from a missing one, so such entries are dropped lazily whenever a shard doubles in size.
+    """
+
+    def __init__(self, shards: int = 16, min_sweep_size: int = 1024, clock=time.monotonic):
+        self._clock = clock
+        self.min_sweep_size = min_sweep_size
+        self._shards = [{} for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._sweep_at = [self.min_sweep_size] * shards
+
+    def _shard_index(self, key: str) -> int:
+        return hash(key) % len(self._shards)
+
+    def consume(self, key: str, capacity: float, refill_per_second: float) -> float:
+        now = self._clock()
+        index = self._shard_index(key)
+        shard = self._shards[index]
+        with self._locks[index]:
+            state = shard.get(key)
+            if state is None or state[2] <= now:
+                tokens = capacity
+            else:
+                tokens = min(capacity, state[0] + (now - state[1]) * refill_per_second)
+
+            if tokens < 1:
+                shard[key] = (tokens, now, now + (capacity - tokens) / refill_per_second)
+                return (1 - tokens) / refill_per_second
+
+            tokens -= 1
+            shard[key] = (tokens, now, now + (capacity - tokens) / refill_per_second)
+            if len(shard) >= self._sweep_at[index]:
+                self._sweep(index, now)
+        return 0.0
+
+    def _sweep(self, index: int, now: float) -> None:
+        shard = self._shards[index]
+        for key in [key for key, state in shard.items() if state[2] <= now]:
+            del shard[key]
+        self._sweep_at[index] = max(self.min_sweep_size, 2 * len(shard))
+
+    def reset(self, key: str) -> None:
+        index = self._shard_index(key)
+        with self._locks[index]:
+            self._shards[index].pop(key, None)
+
+    def clear(self) -> None:
+        for index, shard in enumerate(self._shards):
+            with self._locks[index]:
+                shard.clear()
+                self._sweep_at[index] = self.min_sweep_size
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+def load_bucket_store(path: str | None, shards: int) -> BucketStore:
+    if not path:
+        return InMemoryBucketStore(shards=shards)
+    module_name, _, class_name = path.partition(":")
+    store_class = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(store_class, type) and issubclass(store_class, BucketStore)):
+        raise TypeError(f"LOGIN_THROTTLE_BACKEND {path} is not a BucketStore")
+    # A subclass missing one of the methods fails here, at startup, rather than on the first login
+    return store_class()
+
+
+class LoginThrottle:
+    """
+    Token-bucket throttling of login attempts per username and per client IP.
+    """
+
+    def __init__(self, store: BucketStore, username_burst: int, username_per_minute: float, ip_burst: int, ip_per_minute: float):
+        self.store = store
+        self.username_burst = username_burst
+        self.username_rate = username_per_minute / 60
+        self.ip_burst = ip_burst
+        self.ip_rate = ip_per_minute / 60
+
+    def check(self, username: str, ip: str | None) -> float:
+        """
+        Returns 0 when the attempt may proceed, otherwise the Retry-After delay in seconds.
+        """
+        retry_after = self.store.consume(f"user:{username.lower()}", self.username_burst, self.username_rate)
+        if retry_after or ip is None:
+            return retry_after
+        return self.store.consume(f"ip:{ip}", self.ip_burst, self.ip_rate)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "LoginThrottle":
+        return cls(
+            store=load_bucket_store(settings.LOGIN_THROTTLE_BACKEND, settings.LOGIN_THROTTLE_SHARDS),
+            username_burst=settings.LOGIN_USERNAME_BURST,
+            username_per_minute=settings.LOGIN_USERNAME_PER_MINUTE,
+            ip_burst=settings.LOGIN_IP_BURST,
+            ip_per_minute=settings.LOGIN_IP_PER_MINUTE,
+        )
+
+    def succeeded(self, username: str) -> None:
+        """
+        A correct password gives the username its whole budget back.
+        """
+        self.store.reset(f"user:{username.lower()}")
@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from app.api.models.models import Job
+from app.api.services.archive import archive_training_sessions, archive_horizon
+from app.api.services.idempotency import purge_expired_keys
+from app.api.services.jobs import job, renew_lease, DONE, FAILED
+from app.api.services.seat_feed import SEAT_FEED_INFO
+from app.api.services.seat_holds import expire_holds, publish_after_commit
+from app.config import settings
+
+
+@job("maintenance.purge")
+def purge(db: Session, payload: dict) -> None:
+    """
+    Drops expired idempotency keys and finished jobs past their retention.
+    """
+    purge_expired_keys(db)
+    retention = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+    db.execute(delete(Job).where(Job.status.in_((DONE, FAILED)), Job.finished_at < retention))
+
+
+@job("archive.training_sessions")
+def archive(db: Session, payload: dict) -> None:
+    """
+    A first run over years of sessions can outlast one lease, so every batch renews it.
+    """
+    archive_training_sessions(db, archive_horizon(payload.get("days", settings.ARCHIVE_AFTER_DAYS)),
+                              settings.ARCHIVE_BATCH_SIZE, on_batch=renew_lease)
+
+
+@job("seat_holds.sweep")
+def sweep_seat_holds(db: Session, payload: dict) -> None:
+    """
+    Drops expired seat holds the in-process timers missed, e.g. across a restart, and publishes the
+    freed places once the job commits.
+    """
+    session_ids = expire_holds(db)
+    feed = db.info.get(SEAT_FEED_INFO)
+    if session_ids and feed is not None:
+        publish_after_commit(feed, db, session_ids)
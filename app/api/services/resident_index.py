@@ -0,0 +1,357 @@
+import difflib
+import itertools
+import logging
+import re
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Callable
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.api.models.models import Resident
+from app.api.repositories.search_queries import phone_query_digits
+from app.config import Settings
+from app.database import session_club
+
+logger = logging.getLogger(__name__)
+
+# Exact token, token prefix and close-spelling matches, per query term. A surname starting with the
+# first term outranks any of them, as in the Postgres query
+EXACT, PREFIX, FUZZY = 3.0, 2.0, 1.0
+# Residents looked at per lookup, which bounds the work for very common prefixes such as a single letter
+MAX_CANDIDATES = 2000
+# Tokens on each side of a misspelt term compared with it
+FUZZY_WINDOW = 500
+
+
+def resident_tokens(surname, name, email, phone) -> tuple[str, ...]:
+    words = re.findall(r"\w+", f"{surname or ''} {name or ''}".lower())
+    tokens = set(words)
+    # Whole names too, so "ivanov an" is one prefix rather than two common terms to intersect
+    if surname and name:
+        surname_words, name_words = " ".join(re.findall(r"\w+", surname.lower())), " ".join(re.findall(r"\w+", name.lower()))
+        tokens.update((f"{surname_words} {name_words}", f"{name_words} {surname_words}"))
+    if email:
+        tokens.add(email.lower())
+    if phone:
+        digits = re.sub(r"\D", "", phone)
+        if digits:
+            tokens.add(digits)
+    return tuple(tokens)
+
+
+def query_terms(q: str) -> list[str]:
+    digits = phone_query_digits(q)
+    if digits:
+        return [digits]
+    terms = []
+    for chunk in q.lower().split():
+        terms.extend([chunk] if "@" in chunk else re.findall(r"\w+", chunk))
+    return terms
+
+
+class TermMatcher:
+    """
+    The tokens one query term matches, with their weights: every token it is a prefix of or,
+    failing that, the closest spellings.
+    """
+
+    def __init__(self, index: "PrefixIndex", term: str):
+        self.term = term
+        self.fuzzy: dict[str, float] = {}
+        self.positions = list(itertools.islice(index.prefixed(term), MAX_CANDIDATES))
+        if not self.positions and len(term) >= 3 and not term.isdigit():
+            self.fuzzy = index.close_spellings(term)
+            self.positions = [bisect_left(index.tokens, token) for token in self.fuzzy]
+        self.count = 0
+        for position in self.positions:
+            self.count += len(index.postings[position])
+            if self.count >= MAX_CANDIDATES:
+                break
+
+    def token_weight(self, token: str) -> float:
+        if self.fuzzy:
+            return self.fuzzy.get(token, 0.0)
+        if token == self.term:
+            return EXACT
+        return PREFIX if token.startswith(self.term) else 0.0
+
+    def weight(self, tokens: tuple[str, ...]) -> float:
+        return max(map(self.token_weight, tokens), default=0.0)
+
+
+class PrefixIndex:
+    """
+    Sorted unique tokens (surname and name words, full names, email, phone digits) with, for each, the ids of the
+    residents carrying it, plus residents sorted by surname. A lookup walks the residents matching the
+    rarest query term and keeps those matching the other terms too.
+    """
+
+    def __init__(self, rows):
+        """
+        `rows` are (id, surname, name, email, phone) tuples, in the order equal scores are returned in.
+        """
+        postings: dict[str, array] = {}
+        # id -> (rank, lowercased surname, tokens)
+        self.residents: dict[int, tuple[int, str, tuple[str, ...]]] = {}
+        for resident_id, surname, name, email, phone in rows:
+            tokens = resident_tokens(surname, name, email, phone)
+            for token in tokens:
+                postings.setdefault(token, array("I")).append(resident_id)
+            self.residents[resident_id] = (len(self.residents), (surname or "").lower(), tokens)
+        self.tokens = sorted(postings)
+        self.postings = [postings[token] for token in self.tokens]
+        by_surname = sorted(self.residents.items(), key=lambda item: (item[1][1], item[1][0]))
+        self.surnames = [surname for _, (_, surname, _) in by_surname]
+        self.surname_ids = array("I", [resident_id for resident_id, _ in by_surname])
+        self._next_rank = len(self.residents)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def add(self, resident_id: int, surname, name, email, phone) -> None:
+        """
+        Indexes a new or changed resident, ranked after the residents already indexed.
+        """
+        self.remove(resident_id)
+        tokens = resident_tokens(surname, name, email, phone)
+        for token in tokens:
+            position = bisect_left(self.tokens, token)
+            if position == len(self.tokens) or self.tokens[position] != token:
+                self.tokens.insert(position, token)
+                self.postings.insert(position, array("I"))
+            self.postings[position].append(resident_id)
+        surname = (surname or "").lower()
+        position = bisect_right(self.surnames, surname)
+        self.surnames.insert(position, surname)
+        self.surname_ids.insert(position, resident_id)
+        self.residents[resident_id] = (self._next_rank, surname, tokens)
+        self._next_rank += 1
+
+    def remove(self, resident_id: int) -> None:
+        entry = self.residents.pop(resident_id, None)
+        if entry is None:
+            return
+        _, surname, tokens = entry
+        # Emptied tokens stay behind, they match nobody
+        for token in tokens:
+            self.postings[bisect_left(self.tokens, token)].remove(resident_id)
+        position = bisect_left(self.surnames, surname)
+        while self.surname_ids[position] != resident_id:
+            position += 1
+        del self.surnames[position]
+        del self.surname_ids[position]
+
+    def prefixed(self, prefix: str):
+        """
+        Positions of the tokens starting with `prefix`, the token equal to it first.
+        """
+        position = bisect_left(self.tokens, prefix)
+        while position < len(self.tokens) and self.tokens[position].startswith(prefix):
+            yield position
+            position += 1
+
+    def close_spellings(self, term: str) -> dict[str, float]:
+        """
+        Tokens near `term` in sort order that share its first two letters and are spelt alike,
+        weighted by similarity.
+        """
+        position = bisect_left(self.tokens, term)
+        nearby = [
+            token for token in self.tokens[max(position - FUZZY_WINDOW, 0):position + FUZZY_WINDOW]
+            if token[:2] == term[:2] and abs(len(token) - len(term)) <= 2
+        ]
+        return {
+            token: FUZZY * difflib.SequenceMatcher(None, term, token).ratio()
+            for token in difflib.get_close_matches(term, nearby, n=10, cutoff=0.75)
+        }
+
+    def search(self, q: str, limit: int) -> list[int]:
+        """
+        Ids of the residents matching every term of `q`: surnames starting with the first term, then by
+        score, then in surname order.
+        """
+        terms = query_terms(q)
+        if not terms:
+            return []
+        matchers = [TermMatcher(self, term) for term in terms]
+        if not all(matcher.positions for matcher in matchers):
+            return []
+        phrase = TermMatcher(self, " ".join(terms)) if len(terms) > 1 else None
+        if phrase is not None and (not phrase.positions or phrase.fuzzy):
+            phrase = None
+        found: dict[int, tuple] = {}
+
+        def consider(resident_id: int, driver: TermMatcher | None = None, driver_weight: float = 0.0) -> None:
+            rank, surname, tokens = self.residents[resident_id]
+            total = driver_weight if driver in matchers else 0.0
+            for matcher in matchers:
+                if matcher is not driver:
+                    weight = matcher.weight(tokens)
+                    if not weight:
+                        return
+                    total += weight
+            found[resident_id] = (not surname.startswith(terms[0]), -total, rank)
+
+        if phrase is None:
+            # Surname prefix matches come first, gather enough of them in surname order
+            position = bisect_left(self.surnames, terms[0])
+            stop = min(position + MAX_CANDIDATES, len(self.surnames))
+            while position < stop and self.surnames[position].startswith(terms[0]) and len(found) < limit:
+                consider(self.surname_ids[position])
+                position += 1
+
+        # Then everyone matching the whole query as a name, or else the rarest term, exact tokens first
+        driver = phrase or min(matchers, key=lambda matcher: matcher.count)
+        in_order = phrase is not None or len(matchers) == 1
+        seen = 0
+        for position in driver.positions:
+            weight = driver.token_weight(self.tokens[position])
+            for resident_id in self.postings[position]:
+                if resident_id not in found:
+                    consider(resident_id, driver, weight)
+                seen += 1
+                # With one term or a whole name the walk is already in score order
+                if seen >= MAX_CANDIDATES or (in_order and len(found) >= 2 * limit):
+                    break
+            else:
+                continue
+            break
+        return sorted(found, key=found.get)[:limit]
+
+
+class ResidentSearchIndex:
+    """
+    Per-club PrefixIndex for databases without pg_trgm, built on the first lookup. Resident writes
+    committed by this process are applied to it in place; writes made by other workers show up once
+    the index is rebuilt, `refresh_seconds` after the last build. Rebuilds run in a background thread
+    with a session from `session_factory(club)` while lookups keep using the current index; the writes
+    committed meanwhile are replayed on the new index before it replaces the old one.
+    """
+
+    def __init__(self, refresh_seconds: float, session_factory: Callable[[str], Session] | None = None,
+                 clock=time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self.session_factory = session_factory
+        self._clock = clock
+        self._indexes: dict[str, tuple[PrefixIndex, float]] = {}
+        # Clubs whose index is being built, with the changes committed since the build started
+        self._building: dict[str, list[tuple]] = {}
+        self._first_builds: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        _live_indexes.add(self)
+
+    @classmethod
+    def from_settings(cls, settings: Settings, session_factory: Callable[[str], Session] | None = None) -> "ResidentSearchIndex":
+        return cls(refresh_seconds=settings.RESIDENT_INDEX_REFRESH_SECONDS, session_factory=session_factory)
+
+    def index_for(self, db: Session) -> PrefixIndex:
+        club = session_club(db)
+        with self._lock:
+            entry = self._indexes.get(club)
+            stale = entry is not None and self._clock() - entry[1] >= self.refresh_seconds and club not in self._building
+            if stale:
+                self._building[club] = []
+            first_build = self._first_builds.setdefault(club, threading.Lock())
+        if entry is None:
+            # Nothing to serve yet: the club's first lookups wait for one build, other clubs' do not
+            with first_build:
+                entry = self._indexes.get(club)
+                return entry[0] if entry is not None else self._build(db, club)
+        if stale:
+            if self.session_factory is None:
+                self._build(db, club)
+            else:
+                threading.Thread(target=self._refresh, args=(club,), name=f"resident-index-{club}", daemon=True).start()
+        return entry[0]
+
+    def _build(self, db: Session, club: str) -> PrefixIndex:
+        # Changes are logged from before the rows are read, replaying one the rows already carry is harmless
+        with self._lock:
+            self._building.setdefault(club, [])
+        try:
+            index = PrefixIndex(db.execute(
+                select(Resident.id, Resident.surname, Resident.name, Resident.email, Resident.phone)
+                .order_by(Resident.surname, Resident.name, Resident.id)
+            ))
+        except BaseException:
+            with self._lock:
+                self._building.pop(club, None)
+            raise
+        with self._lock:
+            for resident_id, fields in self._building.pop(club, []):
+                if fields is None:
+                    index.remove(resident_id)
+                else:
+                    index.add(resident_id, *fields)
+            self._indexes[club] = (index, self._clock())
+        return index
+
+    def _refresh(self, club: str) -> None:
+        try:
+            with self.session_factory(club) as db:
+                self._build(db, club)
+        except Exception:
+            # The current index stays in use, the next lookup tries again
+            logger.warning("Could not rebuild the resident index of club %s", club, exc_info=True)
+
+    def search(self, db: Session, q: str, limit: int) -> list[Resident]:
+        index = self.index_for(db)
+        # Lookups take a few milliseconds, serializing them with the in-place updates is cheaper than copying
+        with self._lock:
+            ids = index.search(q, limit)
+        if not ids:
+            return []
+        residents = {resident.id: resident for resident in db.execute(select(Resident).where(Resident.id.in_(ids))).scalars()}
+        # A resident deleted by another worker since the build is simply left out
+        return [residents[resident_id] for resident_id in ids if resident_id in residents]
+
+    def apply(self, changes: list[tuple]) -> None:
+        with self._lock:
+            for club, resident_id, fields in changes:
+                if club in self._building:
+                    self._building[club].append((resident_id, fields))
+                entry = self._indexes.get(club)
+                if entry is None:
+                    continue
+                if fields is None:
+                    entry[0].remove(resident_id)
+                else:
+                    entry[0].add(resident_id, *fields)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+_live_indexes: "weakref.WeakSet[ResidentSearchIndex]" = weakref.WeakSet()
+# Resident changes flushed by a session, applied to the indexes once its transaction commits
+PENDING_CHANGES = "resident_index_changes"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_resident_changes(session, flush_context):
+    changes = [
+        (resident.club, resident.id, (resident.surname, resident.name, resident.email, resident.phone))
+        for resident in (*session.new, *session.dirty) if isinstance(resident, Resident)
+    ]
+    changes += [(resident.club, resident.id, None) for resident in session.deleted if isinstance(resident, Resident)]
+    if changes:
+        session.info.setdefault(PENDING_CHANGES, []).extend(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_resident_changes(session):
+    changes = session.info.pop(PENDING_CHANGES, None)
+    if changes:
+        for index in list(_live_indexes):
+            index.apply(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_resident_changes(session):
+    session.info.pop(PENDING_CHANGES, None)
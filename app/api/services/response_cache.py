@@ -0,0 +1,141 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import Settings
+from app.database import request_club
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is always available
+    zstandard = None
+
+
+def render_json(content) -> bytes:
+    """
+    Same bytes JSONResponse would produce for the content.
+    """
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class CompressedResponseCache:
+    """
+    LRU cache of rendered list payloads keyed by (dataset, dataset version, encoding).
+    The identity body is kept next to its compressed variants, so a new encoding for an already
+    rendered version costs one compression pass and no query. Storing a new version of a dataset
+    drops the older ones straight away instead of waiting for them to age out.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, min_size: int, gzip_level: int = 6, zstd_level: int = 3):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.size = 0
+        self._entries: OrderedDict[tuple, bytes] = OrderedDict()
+        self._versions: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "CompressedResponseCache":
+        return cls(
+            max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+            max_entry_bytes=settings.RESPONSE_CACHE_MAX_ENTRY_BYTES,
+            min_size=settings.RESPONSE_COMPRESSION_MIN_SIZE,
+            gzip_level=settings.RESPONSE_GZIP_LEVEL,
+            zstd_level=settings.RESPONSE_ZSTD_LEVEL,
+        )
+
+    @property
+    def encodings(self) -> tuple[str, ...]:
+        return ("zstd", "gzip") if zstandard is not None else ("gzip",)
+
+    def negotiate(self, accept_encoding: str | None) -> str:
+        """
+        Picks the first encoding we support that the client accepts with a non-zero q-value.
+        """
+        accepted = {}
+        for item in (accept_encoding or "").split(","):
+            coding, _, params = item.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try:
+                    q = float(params.strip()[2:])
+                except ValueError:
+                    q = 0.0
+            accepted[coding.strip().lower()] = q
+        for encoding in self.encodings:
+            if accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return "identity"
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def get(self, key: tuple) -> bytes | None:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_entry_bytes or len(body) > self.max_bytes:
+            return
+        dataset, version, _ = key
+        with self._lock:
+            if self._versions.get(dataset) != version:
+                self._versions[dataset] = version
+                for stale in [k for k in self._entries if k[0] == dataset and k[1] != version]:
+                    self.size -= len(self._entries.pop(stale))
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._entries[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                (evicted_dataset, _, _), evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                if not any(k[0] == evicted_dataset for k in self._entries):
+                    self._versions.pop(evicted_dataset, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def response(self, request: Request, dataset: str, version: str, build: Callable[[], object]) -> Response:
+        """
+        Serves the payload of `dataset` at `version`, calling `build` only when no rendered copy is cached.
+        Datasets are kept per club.
+        """
+        dataset = f"{request_club(request)}:{dataset}"
+        encoding = self.negotiate(request.headers.get("accept-encoding"))
+        body = self.get((dataset, version, encoding))
+        if body is None:
+            raw = self.get((dataset, version, "identity"))
+            if raw is None:
+                raw = render_json(build())
+                self.put((dataset, version, "identity"), raw)
+            if encoding == "identity" or len(raw) < self.min_size:
+                encoding, body = "identity", raw
+            else:
+                body = self.compress(raw, encoding)
+                self.put((dataset, version, encoding), body)
+
+        headers = {"Vary": "Accept-Encoding"}
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
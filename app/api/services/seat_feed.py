@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+from app.api.models.models import TrainingSession, ResidentToTraining
+from app.database import session_club
+
+# Session info key of the process's SeatFeed, set on the sessions of background jobs
+SEAT_FEED_INFO = "seat_feed"
+
+
+class SeatSubscriber:
+    """
+    One feed client. Pending updates are kept per training session and a newer count replaces one
+    the client has not read yet, so a slow consumer holds at most one update per subscribed session.
+    """
+
+    def __init__(self, session_ids, club: str | None = None):
+        self.session_ids = frozenset(session_ids)
+        self.club = club
+        self._pending = {}
+        self._ready = asyncio.Event()
+
+    def offer(self, session_id: int, update: dict) -> None:
+        self._pending[session_id] = update
+        self._ready.set()
+
+    async def next_batch(self, timeout: float) -> dict:
+        """
+        Waits up to `timeout` seconds and returns the latest update per session, or {} on timeout.
+        """
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return {}
+        self._ready.clear()
+        batch, self._pending = self._pending, {}
+        return batch
+
+
+class SeatFeed:
+    """
+    In-process pub/sub of remaining places per training session, keyed by club as well since clubs
+    on different databases reuse session ids.
+    Handlers publish from worker threads; delivery always happens on the event loop thread.
+    """
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def subscribe(self, session_ids, club: str | None = None) -> SeatSubscriber:
+        self._loop = asyncio.get_running_loop()
+        subscriber = SeatSubscriber(session_ids, club)
+        with self._lock:
+            for session_id in subscriber.session_ids:
+                self._subscribers[club, session_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: SeatSubscriber) -> None:
+        with self._lock:
+            for session_id in subscriber.session_ids:
+                key = (subscriber.club, session_id)
+                subscribers = self._subscribers.get(key)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._subscribers[key]
+
+    def has_subscribers(self, session_id: int, club: str | None = None) -> bool:
+        return (club, session_id) in self._subscribers
+
+    def publish(self, session_id: int, remaining_places: int, max_capacity: int, club: str | None = None) -> None:
+        if self._loop is None or not self.has_subscribers(session_id, club):
+            return
+        update = {
+            "training_session_id": session_id,
+            "remaining_places": remaining_places,
+            "max_capacity": max_capacity,
+        }
+        self._loop.call_soon_threadsafe(self._deliver, (club, session_id), update)
+
+    def _deliver(self, key: tuple, update: dict) -> None:
+        session_id = key[1]
+        with self._lock:
+            subscribers = list(self._subscribers.get(key, ()))
+        for subscriber in subscribers:
+            subscriber.offer(session_id, update)
+
+
+def fetch_seat_counts(db: Session, session_ids) -> list[dict]:
+    rows = db.execute(
+        select(TrainingSession.id, TrainingSession.max_capacity, func.count(ResidentToTraining.id), TrainingSession.held_places)
+        .outerjoin(ResidentToTraining, ResidentToTraining.training_session_id == TrainingSession.id)
+        .where(TrainingSession.id.in_(session_ids))
+        .group_by(TrainingSession.id, TrainingSession.max_capacity)
+    ).all()
+    return [
+        {"training_session_id": session_id, "remaining_places": max_capacity - enrolled - held, "max_capacity": max_capacity}
+        for session_id, max_capacity, enrolled, held in rows
+    ]
+
+
+def publish_seat_count(feed: SeatFeed, db: Session, session_id: int) -> None:
+    """
+    Re-counts a session's places and publishes them; costs nothing when nobody is watching the session.
+    """
+    club = session_club(db)
+    if not feed.has_subscribers(session_id, club):
+        return
+    for seats in fetch_seat_counts(db, [session_id]):
+        feed.publish(seats["training_session_id"], seats["remaining_places"], seats["max_capacity"], club)
@@ -0,0 +1,237 @@
+import asyncio
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Callable
+
+from sqlalchemy import select, delete, insert, event, func, literal
+from sqlalchemy.orm import Session
+
+from app.api.models.models import TrainingSession, ResidentToTraining, SeatHold
+from app.api.services.seat_feed import SeatFeed, fetch_seat_counts, publish_seat_count
+
+logger = logging.getLogger(__name__)
+
+
+class EnrollmentConflict(Exception):
+    """
+    The resident cannot take a place of the session; the message is meant for the client.
+    """
+
+
+def lock_training_session(db: Session, training_session_id: int) -> bool:
+    """
+    Queues up the caller's transaction behind every other hold or enrollment on the session, so
+    counting its places and taking one cannot interleave; SQLite serializes writers anyway.
+    Returns False when the session does not exist.
+    """
+    locked = db.execute(select(TrainingSession.id).where(TrainingSession.id == training_session_id).with_for_update())
+    return locked.first() is not None
+
+
+def taken_places(training_session_id: int, now: datetime):
+    enrolled = select(func.count(ResidentToTraining.id)).where(ResidentToTraining.training_session_id == training_session_id)
+    held = select(func.count(SeatHold.id)).where(SeatHold.training_session_id == training_session_id, SeatHold.expires_at > now)
+    return enrolled.scalar_subquery() + held.scalar_subquery()
+
+
+def _check_not_enrolled(db: Session, training_session_id: int, resident_id: int) -> None:
+    enrolled = db.execute(select(ResidentToTraining.id).where(
+        ResidentToTraining.resident_id == resident_id, ResidentToTraining.training_session_id == training_session_id
+    )).first()
+    if enrolled is not None:
+        raise EnrollmentConflict("Resident already enrolled in this training session")
+
+
+def _take_place(db: Session, training_session_id: int, resident_id: int, now: datetime) -> None:
+    # Counting and inserting in one statement leaves no gap for another writer to take the last place
+    result = db.execute(
+        insert(ResidentToTraining).from_select(
+            ["resident_id", "training_session_id"],
+            select(literal(resident_id), literal(training_session_id))
+            .where(TrainingSession.id == training_session_id)
+            .where(TrainingSession.max_capacity > taken_places(training_session_id, now)),
+        )
+    )
+    if result.rowcount != 1:
+        raise EnrollmentConflict("No places left")
+
+
+def place_hold(db: Session, training_session_id: int, resident_id: int, ttl_seconds: float) -> SeatHold | None:
+    """
+    Keeps a place of the session for the resident, replacing the resident's previous hold on it.
+    Returns None when the session does not exist and raises EnrollmentConflict when it is full or
+    the resident is already enrolled. The caller commits.
+    """
+    now = datetime.utcnow()
+    if not lock_training_session(db, training_session_id):
+        return None
+    _check_not_enrolled(db, training_session_id, resident_id)
+    db.execute(delete(SeatHold).where(
+        SeatHold.training_session_id == training_session_id,
+        (SeatHold.expires_at <= now) | (SeatHold.resident_id == resident_id),
+    ).execution_options(synchronize_session=False))
+    result = db.execute(
+        insert(SeatHold).from_select(
+            ["training_session_id", "resident_id", "expires_at", "created_at"],
+            select(literal(training_session_id), literal(resident_id), literal(now + timedelta(seconds=ttl_seconds)), literal(now))
+            .where(TrainingSession.id == training_session_id)
+            .where(TrainingSession.max_capacity > taken_places(training_session_id, now)),
+        )
+    )
+    if result.rowcount != 1:
+        raise EnrollmentConflict("No places left")
+    return db.execute(
+        select(SeatHold).where(SeatHold.training_session_id == training_session_id, SeatHold.resident_id == resident_id)
+    ).scalars().one()
+
+
+def enroll(db: Session, training_session_id: int, resident_id: int) -> bool:
+    """
+    Enrolls the resident without a hold. Live holds of other residents keep their places, one of
+    the resident's own is used up. Returns False when the session does not exist and raises
+    EnrollmentConflict when it is full or the resident is already enrolled. The caller commits.
+    """
+    now = datetime.utcnow()
+    if not lock_training_session(db, training_session_id):
+        return False
+    _check_not_enrolled(db, training_session_id, resident_id)
+    db.execute(delete(SeatHold).where(
+        SeatHold.training_session_id == training_session_id, SeatHold.resident_id == resident_id,
+    ).execution_options(synchronize_session=False))
+    _take_place(db, training_session_id, resident_id, now)
+    return True
+
+
+def confirm_hold(db: Session, hold: SeatHold) -> bool:
+    """
+    Turns a live hold into an enrollment in the caller's transaction. Returns False when the hold
+    expired or was taken by the expiry timer first, raises EnrollmentConflict when the resident is
+    already enrolled or, should the session have been overbooked meanwhile, no place is left.
+    """
+    now = datetime.utcnow()
+    training_session_id, resident_id = hold.training_session_id, hold.resident_id
+    lock_training_session(db, training_session_id)
+    claimed = db.execute(
+        delete(SeatHold)
+        .where(SeatHold.id == hold.id, SeatHold.expires_at > now)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != 1:
+        return False
+    _check_not_enrolled(db, training_session_id, resident_id)
+    _take_place(db, training_session_id, resident_id, now)
+    return True
+
+
+def expire_holds(db: Session, hold_ids=None) -> set[int]:
+    """
+    Deletes the expired holds, of `hold_ids` only if given, and returns the ids of their sessions.
+    A hold renewed or confirmed meanwhile is no longer expired or no longer there, and stays untouched.
+    """
+    condition = SeatHold.expires_at <= datetime.utcnow()
+    if hold_ids is not None:
+        condition &= SeatHold.id.in_(hold_ids)
+    session_ids = set(db.execute(select(SeatHold.training_session_id).where(condition)).scalars())
+    if session_ids:
+        db.execute(delete(SeatHold).where(condition).execution_options(synchronize_session=False))
+    return session_ids
+
+
+
+def publish_after_commit(feed: SeatFeed, db: Session, session_ids) -> None:
+    """
+    Counts the places of the watched sessions among `session_ids` in `db`'s transaction and publishes
+    them once it commits. Works on shard-wide sessions too, each session is published to its own club.
+    """
+    clubs = dict(db.execute(select(TrainingSession.id, TrainingSession.club).where(TrainingSession.id.in_(session_ids))).all())
+    watched = [session_id for session_id, club in clubs.items() if feed.has_subscribers(session_id, club)]
+    if not watched:
+        return
+    counts = fetch_seat_counts(db, watched)
+
+    @event.listens_for(db, "after_commit", once=True)
+    def _publish(session):
+        for seats in counts:
+            session_id = seats["training_session_id"]
+            feed.publish(session_id, seats["remaining_places"], seats["max_capacity"], clubs[session_id])
+
+
+class HoldExpiryTimer:
+    """
+    Releases seat holds when they expire and publishes the freed places. Pending expiries sit in a heap
+    ordered by deadline and one task sleeps until the earliest; scheduling an earlier one wakes it.
+    Holds of a restarted process are left to the periodic seat_holds.sweep job.
+    """
+
+    def __init__(self, session_factory: Callable[[str], Session], seat_feed: SeatFeed | None = None):
+        self.session_factory = session_factory
+        self.seat_feed = seat_feed
+        self._heap: list[tuple[datetime, int, str]] = []
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def schedule(self, hold: SeatHold, club: str) -> None:
+        """
+        Called from request handlers, i.e. worker threads.
+        """
+        with self._lock:
+            heapq.heappush(self._heap, (hold.expires_at, hold.id, club))
+            earliest = self._heap[0][1] == hold.id
+        if earliest and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def pop_due(self, now: datetime) -> list[tuple[datetime, int, str]]:
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+        return due
+
+    def expire(self, due) -> None:
+        by_club = defaultdict(list)
+        for _, hold_id, club in due:
+            by_club[club].append(hold_id)
+        for club, hold_ids in by_club.items():
+            with self.session_factory(club) as db:
+                session_ids = expire_holds(db, hold_ids)
+                db.commit()
+                if self.seat_feed is not None:
+                    for session_id in session_ids:
+                        publish_seat_count(self.seat_feed, db, session_id)
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._loop = self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            due = self.pop_due(datetime.utcnow())
+            if due:
+                try:
+                    await asyncio.to_thread(self.expire, due)
+                except Exception:
+                    # The sweep job gets them later
+                    logger.warning("Could not expire %d seat holds", len(due), exc_info=True)
+            with self._lock:
+                deadline = self._heap[0][0] if self._heap else None
+            timeout = None if deadline is None else max((deadline - datetime.utcnow()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,53 @@
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.api.models.models import User
+
+
+class RevocationList:
+    """
+    In-memory snapshot of users whose access tokens must no longer be accepted, one per club
+    since user ids of clubs on different databases overlap.
+    A snapshot is an immutable set swapped as a whole, so lookups never take a lock;
+    it is reloaded from the database at most once per refresh interval.
+    """
+
+    def __init__(self, refresh_seconds: float, clock=time.monotonic):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._revoked_user_ids: dict[str | None, frozenset] = {}
+        self._loaded_at: dict[str | None, float] = {}
+        self._lock = threading.Lock()
+
+    def _is_stale(self, club: str | None) -> bool:
+        loaded_at = self._loaded_at.get(club)
+        return loaded_at is None or self._clock() - loaded_at >= self.refresh_seconds
+
+    def is_revoked(self, user_id: int, db: Session, club: str | None = None) -> bool:
+        if self._is_stale(club):
+            # A first load is waited for, later ones are done by whoever gets the lock while others read the old snapshot
+            if self._lock.acquire(blocking=club not in self._loaded_at):
+                try:
+                    if self._is_stale(club):
+                        self.refresh(db, club)
+                finally:
+                    self._lock.release()
+        return user_id in self._revoked_user_ids.get(club, frozenset())
+
+    def refresh(self, db: Session, club: str | None = None) -> None:
+        # db works on `club`, so only that club's users come back
+        user_ids = db.execute(select(User.id).where(User.is_active.is_(False))).scalars().all()
+        self._revoked_user_ids[club] = frozenset(user_ids)
+        self._loaded_at[club] = self._clock()
+
+    def revoke_user(self, user_id: int, club: str | None = None) -> None:
+        """
+        Applies a revocation in this process right away; other workers see it on their next refresh.
+        """
+        self._revoked_user_ids[club] = self._revoked_user_ids.get(club, frozenset()) | {user_id}
+
+    def invalidate(self) -> None:
+        self._loaded_at.clear()
@@ -0,0 +1,237 @@
+import itertools
+import json
+import logging
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import Settings
+
+logger = logging.getLogger(__name__)
+
+# Contextvars reach the threadpool running sync dependencies and endpoints, so spans opened there
+# land in the request's trace too
+_current_trace: ContextVar["Trace | None"] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[int | None] = ContextVar("current_span", default=None)
+
+
+class Trace:
+    """
+    Spans of one sampled request, with start offsets and durations in milliseconds.
+    """
+
+    def __init__(self, method: str, path: str):
+        self.trace_id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.route = path
+        self.status_code = None
+        self.started_at = time.time()
+        self.duration_ms = 0.0
+        self.spans = []
+        self._started = time.perf_counter()
+        self._span_ids = itertools.count(1)
+
+    def next_span_id(self) -> int:
+        return next(self._span_ids)
+
+    def offset_ms(self, moment: float) -> float:
+        return (moment - self._started) * 1000
+
+    def add_span(self, name: str, started: float, ended: float, parent_id: int | None, attributes: dict,
+                 span_id: int | None = None) -> None:
+        self.spans.append({
+            "span_id": span_id or self.next_span_id(),
+            "parent_id": parent_id,
+            "name": name,
+            "start_ms": round(self.offset_ms(started), 3),
+            "duration_ms": round((ended - started) * 1000, 3),
+            "attributes": attributes,
+        })
+
+    def finish(self) -> None:
+        self.duration_ms = round(self.offset_ms(time.perf_counter()), 3)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "path": self.path,
+            "route": self.route,
+            "status_code": self.status_code,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "spans": sorted(self.spans, key=lambda span: span["start_ms"]),
+        }
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times the block as a span of the current trace; does nothing outside a sampled request.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    parent_id, span_id = _current_span.get(), trace.next_span_id()
+    token = _current_span.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _current_span.reset(token)
+        trace.add_span(name, started, time.perf_counter(), parent_id, attributes, span_id)
+
+
+class Tracer:
+    """
+    Samples requests, keeps the finished traces in a ring buffer and optionally appends them to a JSONL file.
+    The file is written by a background thread, so a slow disk never holds up a response; when the thread
+    falls `buffer_size` traces behind, further traces are left out of the file.
+    """
+
+    def __init__(self, sample_rate: float, buffer_size: int, jsonl_path: str | None = None):
+        self.sample_rate = sample_rate
+        self.jsonl_path = jsonl_path
+        self._traces = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        # (path, record) pairs waiting for the writer thread, started with the first of them
+        self._pending = queue.Queue(maxsize=buffer_size)
+        self._writer = None
+
+    @classmethod
+    def from_settings(cls, app_settings: Settings) -> "Tracer":
+        return cls(
+            sample_rate=app_settings.TRACE_SAMPLE_RATE,
+            buffer_size=app_settings.TRACE_BUFFER_SIZE,
+            jsonl_path=app_settings.TRACE_JSONL_PATH,
+        )
+
+    def sampled(self) -> bool:
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    def start(self, method: str, path: str) -> tuple[Trace, object]:
+        trace = Trace(method, path)
+        return trace, _current_trace.set(trace)
+
+    def finish(self, trace: Trace, token) -> None:
+        _current_trace.reset(token)
+        trace.finish()
+        record = trace.to_dict()
+        with self._lock:
+            self._traces.append(record)
+            if self.jsonl_path and self._writer is None:
+                self._writer = threading.Thread(target=self._write_pending, name="trace-writer", daemon=True)
+                self._writer.start()
+        if self.jsonl_path:
+            try:
+                self._pending.put_nowait((self.jsonl_path, record))
+            except queue.Full:
+                logger.warning("Trace writer is behind, trace %s is left out of %s", record["trace_id"], self.jsonl_path)
+
+    def _write_pending(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            while True:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for path, records in itertools.groupby(batch, key=lambda item: item[0]):
+                    with open(path, "a", encoding="utf-8") as jsonl:
+                        jsonl.writelines(json.dumps(record) + "\n" for _, record in records)
+            except OSError:
+                logger.exception("Could not write traces")
+            finally:
+                for _ in batch:
+                    self._pending.task_done()
+
+    def flush(self) -> None:
+        """
+        Waits until every finished trace is in the JSONL file.
+        """
+        self._pending.join()
+
+    def slowest(self, route: str | None = None, limit: int = 10) -> dict[str, list[dict]]:
+        """
+        The `limit` slowest buffered traces of every route, or of `route` only.
+        """
+        with self._lock:
+            traces = list(self._traces)
+        by_route = {}
+        for trace in traces:
+            if route is None or trace["route"] == route:
+                by_route.setdefault(trace["route"], []).append(trace)
+        return {
+            route_path: sorted(route_traces, key=lambda trace: trace["duration_ms"], reverse=True)[:limit]
+            for route_path, route_traces in sorted(by_route.items())
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_trace.get() is not None:
+        conn.info.setdefault("trace_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current_trace.get()
+    started = conn.info.get("trace_query_started")
+    if trace is not None and started:
+        trace.add_span("sql", started.pop(), time.perf_counter(), _current_span.get(), {"statement": statement[:500]})
+
+
+class _TracedResponseField:
+    """
+    A route's response field, validating and serializing what the endpoint returned under spans of their own.
+    """
+
+    def __init__(self, field):
+        self._field = field
+
+    def __getattr__(self, name):
+        return getattr(self._field, name)
+
+    def validate(self, *args, **kwargs):
+        with span("response.validate"):
+            return self._field.validate(*args, **kwargs)
+
+    def serialize(self, *args, **kwargs):
+        with span("response.serialize"):
+            return self._field.serialize(*args, **kwargs)
+
+
+class TracedRoute(APIRoute):
+    """
+    Times the response model validation and serialization of the route's responses. Values of routes
+    without a response model only go through jsonable_encoder, which is not timed.
+    """
+
+    def get_route_handler(self):
+        field = self.secure_cloned_response_field
+        if field is not None and not isinstance(field, _TracedResponseField):
+            self.secure_cloned_response_field = _TracedResponseField(field)
+        return super().get_route_handler()
+
+
+def install_instrumentation() -> None:
+    """
+    Hooks SQL statements on every engine; idempotent.
+    """
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,52 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def make_etag(*parts) -> str:
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def _etag_list(header: str, weak: bool = True) -> set[str]:
+    """
+    Weak comparison (If-None-Match) ignores the W/ prefix; strong comparison (If-Match) keeps it,
+    so a weak tag never equals one of ours, which are all strong.
+    """
+    tags = {tag.strip() for tag in header.split(",")}
+    return {tag.removeprefix("W/") for tag in tags} if weak else tags
+
+
+def _http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def validator_headers(etag: str, last_modified: datetime | None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = _http_date(last_modified)
+    return headers
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = _etag_list(if_none_match)
+    return "*" in tags or etag in tags
+
+
+def not_modified_response(etag: str, last_modified: datetime | None) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validator_headers(etag, last_modified))
+
+
+def check_if_match(request: Request, etag: str) -> None:
+    """
+    Optimistic concurrency for PUT: a client that sends If-Match must have seen the current version.
+    """
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return
+    tags = _etag_list(if_match, weak=False)
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Entity has been modified")
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+
+
+def naive_utc(value: datetime) -> datetime:
+    """
+    The naive UTC datetime the database stores, for a query parameter that may carry an offset.
+    """
+    return value if value.tzinfo is None else value.astimezone(timezone.utc).replace(tzinfo=None)
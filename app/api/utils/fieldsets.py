@@ -0,0 +1,51 @@
+from fastapi import HTTPException, Query, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+
+class Fieldset:
+    """
+    Whitelist of the fields a client may pick with `?fields=a,b,c`, mapped to the columns that hold them.
+    Only the picked columns are selected, and joins are only added for the tables they come from.
+    """
+
+    def __init__(self, model, columns: dict, joins: dict | None = None):
+        self.model = model
+        self.columns = columns
+        self.joins = joins or {}
+
+    def query(self, fields: str | None = Query(None, description="Comma-separated subset of fields to return")) -> list[str] | None:
+        """
+        FastAPI dependency parsing the `fields` query parameter. `id` is always returned.
+        """
+        if not fields:
+            return None
+        names = ["id"]
+        for name in (name.strip() for name in fields.split(",")):
+            if name not in self.columns:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown field '{name}', allowed: {', '.join(self.columns)}",
+                )
+            if name not in names:
+                names.append(name)
+        return names
+
+    def select(self, names: list[str]):
+        columns = [self.columns[name].label(name) for name in names]
+        statement = select(*columns).select_from(self.model)
+        needed_tables = {self.columns[name].table for name in names}
+        for joined_model, on_clause in self.joins.items():
+            if joined_model.__table__ in needed_tables:
+                statement = statement.join(joined_model, on_clause)
+        return statement
+
+
+def sparse_response(rows) -> JSONResponse:
+    """
+    Sparse rows skip the full response model, which would reject the missing fields.
+    """
+    if isinstance(rows, list):
+        return JSONResponse(content=jsonable_encoder([dict(row) for row in rows]))
+    return JSONResponse(content=jsonable_encoder(dict(rows)))
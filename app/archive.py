@@ -0,0 +1,37 @@
+"""
+Moves past training sessions and their enrollments into the archive tables.
+
+    python -m app.archive                  # older than ARCHIVE_AFTER_DAYS
+    python -m app.archive --days 90 --batch-size 500
+"""
+import argparse
+
+from app.config import settings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=None, help="archive sessions that started more than this many days ago")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    from app import database
+    from app.api.services.archive import archive_training_sessions, archive_horizon
+
+    days = settings.ARCHIVE_AFTER_DAYS if args.days is None else args.days
+    batch_size = settings.ARCHIVE_BATCH_SIZE if args.batch_size is None else args.batch_size
+    database.init_engine()
+    sessions = enrollments = 0
+    try:
+        for session_factory in database.shard_sessionmakers():
+            with session_factory() as db:
+                shard_sessions, shard_enrollments = archive_training_sessions(db, archive_horizon(days), batch_size)
+            sessions += shard_sessions
+            enrollments += shard_enrollments
+    finally:
+        database.dispose_engine()
+    print(f"Archived {sessions} training sessions and {enrollments} enrollments older than {days} days")
+
+
+if __name__ == "__main__":
+    main()
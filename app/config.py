@@ -1,27 +1,110 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from fastapi.security import OAuth2PasswordBearer
-import os
-
 
 class Settings(BaseSettings):
-    class Config:
-        env_file = ".env"
-        extra = "ignore"
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
-    DATABASE_URL: str = Field(..., env="DATABASE_URL")
-    SECRET_KEY: str = Field(..., env="SECRET_KEY")
+    DATABASE_URL: str = Field(...)
+    DATABASE_REPLICA_URLS: list[str] = []
+    READ_YOUR_WRITES_SECONDS: float = 5
+    SECRET_KEY: str = Field(...)
     ALGORITHM: str = "HS256"
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 120
-    CORS_ORIGINS: list[str] = Field(..., env="CORS_ORIGINS")
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    TOKEN_REVOCATION_REFRESH_SECONDS: float = 5
+    CORS_ORIGINS: list[str] = Field(...)
+
+    DEFAULT_CLUB: str = "main"
+    CLUB_DATABASE_URLS: dict[str, str] = {}
+
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_BACKEND: str | None = None
+    LOGIN_THROTTLE_SHARDS: int = 16
+    LOGIN_USERNAME_BURST: int = 5
+    LOGIN_USERNAME_PER_MINUTE: float = 5
+    LOGIN_IP_BURST: int = 30
+    LOGIN_IP_PER_MINUTE: float = 30
+
+    RESIDENT_INDEX_REFRESH_SECONDS: float = 300
+
+    SEAT_FEED_MAX_SESSIONS: int = 50
+    SEAT_FEED_KEEPALIVE_SECONDS: float = 15
+    SEAT_HOLD_TTL_SECONDS: float = 600
+    SEAT_HOLD_SWEEP_SECONDS: float = 60
+
+    RESPONSE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: int = 16 * 1024 * 1024
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 1024
+    RESPONSE_GZIP_LEVEL: int = 6
+    RESPONSE_ZSTD_LEVEL: int = 3
+    # Cached list payloads follow this process's writes at once, other workers' writes within this long
+    DATASET_VERSION_MAX_AGE_SECONDS: float = 10
+
+    BATCH_MAX_REQUESTS: int = 50
+    BATCH_ITEM_TIMEOUT_SECONDS: float = 10
+
+    ARCHIVE_AFTER_DAYS: int = 180
+    ARCHIVE_BATCH_SIZE: int = 1000
+
+    IDEMPOTENCY_KEY_TTL_HOURS: float = 24
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS: float = 60
+    IDEMPOTENCY_PURGE_INTERVAL_SECONDS: float = 300
+
+    JOB_WORKERS: int = 2
+    JOB_POLL_SECONDS: float = 1
+    JOB_LEASE_SECONDS: float = 300
+    JOB_MAX_ATTEMPTS: int = 5
+    JOB_BACKOFF_SECONDS: float = 5
+    JOB_BACKOFF_MAX_SECONDS: float = 3600
+    JOB_RETENTION_HOURS: float = 72
+    # Archiving takes sessions out of the regular endpoints, so it is opt-in
+    ARCHIVE_EVERY_HOURS: float = 0
+
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_AUTH_CONCURRENCY: int = 4
+    ADMISSION_AUTH_QUEUE: int = 16
+    ADMISSION_WRITE_CONCURRENCY: int = 16
+    ADMISSION_WRITE_QUEUE: int = 64
+    ADMISSION_HEAVY_READ_CONCURRENCY: int = 4
+    ADMISSION_HEAVY_READ_QUEUE: int = 16
+    ADMISSION_READ_CONCURRENCY: int = 32
+    ADMISSION_READ_QUEUE: int = 128
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 2
+    ADMISSION_RETRY_AFTER_SECONDS: int = 1
+
+    # "club:username", or a bare username of the default club
+    ADMIN_USERNAMES: list[str] = []
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_BUFFER_SIZE: int = 1000
+    TRACE_JSONL_PATH: str | None = None
+
+
+_settings: Settings | None = None
+
+
+def get_settings() -> Settings:
+    """
+    Returns the active settings, reading the environment / .env on first use.
+    """
+    global _settings
+    if _settings is None:
+        _settings = Settings()
+    return _settings
+
+
+def configure_settings(new_settings: Settings) -> None:
+    global _settings
+    _settings = new_settings
+
+
+class LazySettings:
+    """
+    Attribute access is forwarded to the active Settings, so importing a module never reads the environment.
+    """
 
+    def __getattr__(self, name):
+        return getattr(get_settings(), name)
 
-settings = Settings()
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
-origins = settings.CORS_ORIGINS
+settings = LazySettings()
@@ -1,14 +1,236 @@
-from sqlalchemy.orm import Session, declarative_base
+import itertools
+import time
 
-from app.config import engine, oauth2_scheme, settings, SessionLocal
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy import Column, String, create_engine, event, select
+from sqlalchemy.orm import ORMExecuteState, Session, declarative_base, sessionmaker, with_loader_criteria
+
+from app.config import settings
 
 Base = declarative_base()
-# Base.metadata.create_all(engine)
 
+# Clubs with their own database (shard), by club key; every other club lives on the primary, see ClubSession
+shard_engines = {}
+# Set from the access token by get_current_user, before that the X-Club header names the club
+CLUB_STATE = "club"
+CLUB_HEADER = "X-Club"
+# Execution option of prebuilt statements that filter on the club themselves, see app/api/repositories/lookups.py
+CLUB_FILTERED = "club_filtered"
+
+
+class ClubScoped:
+    """
+    Mixin for the tables holding one club's rows. Clubs sharing a database are kept apart by this column.
+    Link tables (enrollments, received achievements, seat holds, refresh tokens) have none: their rows
+    are only written for parents found through the club's session, see club_row_exists.
+    """
+    club = Column(String(32), nullable=False, index=True, default=lambda: settings.DEFAULT_CLUB, server_default="main")
+
+
+class ClubSession(Session):
+    """
+    Session working for one club, given by info["club"] (a key or a callable resolved when needed):
+    it talks to the club's shard, reads only the club's ClubScoped rows and stamps new ones with the club.
+    Without a club it is a plain session of its bind, which jobs use for shard-wide work.
+    """
+
+    @property
+    def club(self) -> str | None:
+        club = self.info.get("club")
+        return club() if callable(club) else club
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        shard = shard_engines.get(self.club)
+        if shard is not None:
+            return shard
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+@event.listens_for(ClubSession, "do_orm_execute")
+def _only_club_rows(execute_state: ORMExecuteState):
+    club = execute_state.session.club
+    if club is None or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    # Adding the criteria copies the statement, which would throw away its memoized cache key
+    if execute_state.execution_options.get(CLUB_FILTERED):
+        return
+    # Relationship loads inherit the criteria from the statement that loaded their parents
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(ClubScoped, lambda cls: cls.club == club, include_aliases=True)
+        )
+
+
+@event.listens_for(ClubSession, "before_flush")
+def _stamp_club(session: ClubSession, flush_context, instances):
+    club = session.club
+    if club is not None:
+        for instance in session.new:
+            if isinstance(instance, ClubScoped):
+                instance.club = club
+
+
+# Bound to engines by init_engine() from the application lifespan
+SessionLocal = sessionmaker(class_=ClubSession, autocommit=False, autoflush=False)
+ReplicaSessionLocals: list[sessionmaker] = []
+engine = None
+replica_engines = []
+_replica_cycle = iter(())
+
+# Set by ReadYourWritesMiddleware: after a write the client keeps reading from the primary until this timestamp
+PRIMARY_STICKY_COOKIE = "db_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# ASGI scope state keys a batch request sets for the sub-requests it dispatches
+SHARED_SESSION_STATE = "shared_db_session"
+
+
+def enable_sqlite_foreign_keys(sqlite_engine) -> None:
+    """
+    SQLite ignores foreign keys, ON DELETE CASCADE included, unless every connection turns them on.
+    """
+    if sqlite_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _foreign_keys_on(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def init_engine(database_url: str | None = None, replica_urls: list[str] | None = None,
+                club_urls: dict[str, str] | None = None):
+    global engine, _replica_cycle
+    if engine is None:
+        database_url = database_url or settings.DATABASE_URL
+        engine = create_engine(database_url)
+        enable_sqlite_foreign_keys(engine)
+        SessionLocal.configure(bind=engine)
+
+        for url in settings.DATABASE_REPLICA_URLS if replica_urls is None else replica_urls:
+            replica_engine = create_engine(url)
+            enable_sqlite_foreign_keys(replica_engine)
+            replica_engines.append(replica_engine)
+            ReplicaSessionLocals.append(sessionmaker(class_=ClubSession, autocommit=False, autoflush=False, bind=replica_engine))
+        _replica_cycle = itertools.cycle(ReplicaSessionLocals)
+
+        # Clubs sharing a URL share an engine; clubs on the primary need none
+        engines_by_url = {}
+        for club, url in (settings.CLUB_DATABASE_URLS if club_urls is None else club_urls).items():
+            if url == database_url:
+                continue
+            if url not in engines_by_url:
+                engines_by_url[url] = create_engine(url)
+                enable_sqlite_foreign_keys(engines_by_url[url])
+            shard_engines[club] = engines_by_url[url]
+    return engine
+
+
+def shard_sessionmakers() -> list[sessionmaker]:
+    """
+    One session factory per database, the primary first, for work that covers every club of a shard.
+    """
+    return [SessionLocal] + [
+        sessionmaker(class_=ClubSession, autocommit=False, autoflush=False, bind=shard_engine)
+        for shard_engine in dict.fromkeys(shard_engines.values())
+    ]
+
+
+def dispose_engine() -> None:
+    global engine, _replica_cycle
+    if engine is not None:
+        engine.dispose()
+        engine = None
+        SessionLocal.configure(bind=None)
+    for replica_engine in replica_engines:
+        replica_engine.dispose()
+    replica_engines.clear()
+    for shard_engine in set(shard_engines.values()):
+        shard_engine.dispose()
+    shard_engines.clear()
+    ReplicaSessionLocals.clear()
+    _replica_cycle = iter(())
 
-def get_db():
-    db = SessionLocal()
+
+def shared_session(request: Request) -> Session | None:
+    """
+    Session handed down by a batch request to its sub-requests, see app/api/endpoints/batch.py.
+    """
+    return request.scope.get("state", {}).get(SHARED_SESSION_STATE)
+
+
+def known_clubs() -> set[str]:
+    return {settings.DEFAULT_CLUB, *settings.CLUB_DATABASE_URLS}
+
+
+def request_club(request: Request) -> str:
+    """
+    The authenticated principal's club, else the one named by the X-Club header, else the default club.
+    """
+    return (
+        request.scope.get("state", {}).get(CLUB_STATE)
+        or request.headers.get(CLUB_HEADER)
+        or settings.DEFAULT_CLUB
+    )
+
+
+def session_club(db: Session) -> str:
+    return getattr(db, "club", None) or settings.DEFAULT_CLUB
+
+
+def club_row_exists(db: Session, model, row_id: int) -> bool:
+    """
+    Whether the ClubScoped row exists for the session's club; checked before linking rows by client-given ids.
+    """
+    return db.execute(select(model.id).where(model.id == row_id)).first() is not None
+
+
+def _check_club_header(request: Request) -> None:
+    club = request.headers.get(CLUB_HEADER)
+    if club is not None and club not in known_clubs():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown club")
+
+
+def get_db(request: Request):
+    shared = shared_session(request)
+    if shared is not None:
+        yield shared
+        return
+
+    _check_club_header(request)
+    # Resolved on first use: the club of the token is only known once get_current_user has run
+    db = SessionLocal(info={"club": lambda: request_club(request)})
     try:
         yield db
     finally:
         db.close()
+
+
+def reads_from_primary(request: Request) -> bool:
+    if request.method not in SAFE_METHODS:
+        return True
+    try:
+        return float(request.cookies.get(PRIMARY_STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """
+    Session for read-only endpoints: a replica, taken round-robin, unless none are configured
+    or the client has written within the last READ_YOUR_WRITES_SECONDS.
+    """
+    shared = shared_session(request)
+    if shared is not None:
+        yield shared
+        return
+
+    if not ReplicaSessionLocals or reads_from_primary(request):
+        yield db
+        return
+
+    replica_db = next(_replica_cycle)(info={"club": lambda: request_club(request)})
+    try:
+        yield replica_db
+    finally:
+        replica_db.close()
@@ -0,0 +1,120 @@
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm.exc import StaleDataError
+
+from app.config import Settings, configure_settings, get_settings
+from app.database import SessionLocal, init_engine, dispose_engine, shard_sessionmakers
+from app.middleware import ReadYourWritesMiddleware, TracingMiddleware, AdmissionControlMiddleware
+
+
+# Settings of the first app built in this process
+_process_settings: Settings | None = None
+
+
+def create_app(app_settings: Settings | None = None) -> FastAPI:
+    """
+    Builds the application. The database engine is created by the lifespan,
+    i.e. in the serving process, and routers are only imported here.
+
+    The active settings (app.config.settings) and the engines and session factories of app.database
+    are process-wide, so one process serves one configuration: apps built after the first must get
+    the same settings.
+    """
+    global _process_settings
+    if app_settings is None:
+        app_settings = get_settings()
+    if _process_settings is not None and app_settings != _process_settings:
+        raise RuntimeError("An app with other settings was already created in this process, settings and engines are process-wide")
+    _process_settings = app_settings
+    configure_settings(app_settings)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        init_engine(app_settings.DATABASE_URL, app_settings.DATABASE_REPLICA_URLS, app_settings.CLUB_DATABASE_URLS)
+        # Each shard keeps its own jobs table, so each gets a pool
+        job_pools = []
+        if app_settings.JOB_WORKERS > 0:
+            session_info = {SEAT_FEED_INFO: app.state.seat_feed}
+            job_pools = [JobWorkerPool.from_settings(session_factory, app_settings, session_info)
+                         for session_factory in shard_sessionmakers()]
+            for pool in job_pools:
+                pool.start()
+        app.state.hold_timer.start()
+        yield
+        await app.state.hold_timer.stop()
+        for pool in job_pools:
+            await pool.stop()
+        await run_in_threadpool(app.state.tracer.flush)
+        dispose_engine()
+
+    # Routers pull in the models, schemas and auth stack, keep them out of module import
+    from app.api.endpoints import users, search, seat_feed, seat_holds, dashboard, batch, analytics, history, traces
+    from app.api.endpoints.items import items_get, items_post, items_put, items_delete
+    from app.api.services.login_throttle import LoginThrottle
+    from app.api.services.token_revocation import RevocationList
+    from app.api.services.seat_feed import SEAT_FEED_INFO, SeatFeed
+    from app.api.services.seat_holds import HoldExpiryTimer
+    from app.api.services.resident_index import ResidentSearchIndex
+    from app.api.services.response_cache import CompressedResponseCache
+    from app.api.services.idempotency import IdempotentReplay, replay_response
+    from app.api.services.jobs import JobWorkerPool
+    from app.api.services import maintenance  # noqa: F401  registers the maintenance job handlers
+    from app.api.services.tracing import Tracer, install_instrumentation
+    from app.api.services.admission import AdmissionController
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = app_settings
+    app.state.login_throttle = LoginThrottle.from_settings(app_settings)
+    app.state.revocation_list = RevocationList(refresh_seconds=app_settings.TOKEN_REVOCATION_REFRESH_SECONDS)
+    app.state.seat_feed = SeatFeed()
+    app.state.hold_timer = HoldExpiryTimer(lambda club: SessionLocal(info={"club": club}), app.state.seat_feed)
+    app.state.resident_index = ResidentSearchIndex.from_settings(app_settings, lambda club: SessionLocal(info={"club": club}))
+    app.state.response_cache = CompressedResponseCache.from_settings(app_settings)
+    app.state.tracer = Tracer.from_settings(app_settings)
+    app.state.admission = AdmissionController.from_settings(app_settings)
+
+    app.add_middleware(ReadYourWritesMiddleware)
+    if app_settings.ADMISSION_ENABLED:
+        app.add_middleware(AdmissionControlMiddleware, controller=app.state.admission)
+    app.add_middleware(
+       CORSMiddleware,
+       allow_origins=app_settings.CORS_ORIGINS,
+       allow_credentials=True,  # Important for cookies and sessions
+       allow_methods=["*"],      # Allows all HTTP methods (GET, POST, PUT, DELETE, etc.)
+       allow_headers=["*"],      # Allows all headers in the request
+    )
+    # Outermost, so a trace covers everything else
+    install_instrumentation()
+    app.add_middleware(TracingMiddleware, tracer=app.state.tracer)
+
+    # Include the Router in Main App
+    app.include_router(users.router, prefix="/api/v1")
+    app.include_router(items_get.router, prefix="/api/v1")
+    app.include_router(items_post.router, prefix="/api/v1")
+    app.include_router(items_put.router, prefix="/api/v1")
+    app.include_router(items_delete.router, prefix="/api/v1")
+    app.include_router(search.router, prefix="/api/v1")
+    app.include_router(seat_feed.router, prefix="/api/v1")
+    app.include_router(seat_holds.router, prefix="/api/v1")
+    app.include_router(dashboard.router, prefix="/api/v1")
+    app.include_router(batch.router, prefix="/api/v1")
+    app.include_router(analytics.router, prefix="/api/v1")
+    app.include_router(history.router, prefix="/api/v1")
+    app.include_router(traces.router, prefix="/api/v1")
+
+    @app.exception_handler(StaleDataError)
+    async def concurrent_update_handler(request: Request, exc: StaleDataError):
+        # Row version check failed: someone else updated the entity between our read and write
+        return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"detail": "Entity was modified concurrently"})
+
+    app.add_exception_handler(IdempotentReplay, replay_response)
+
+    @app.get("/health", tags=["service"])
+    def health():
+        return {"status": "ok"}
+
+    return app
@@ -0,0 +1,111 @@
+import json
+import time
+from http.cookies import SimpleCookie
+
+from app import database
+from app.api.services.admission import AdmissionController
+from app.api.services.tracing import Tracer, span
+from app.config import settings
+
+
+class ReadYourWritesMiddleware:
+    """
+    Marks clients that have just written successfully with a short-lived cookie,
+    so their next reads go to the primary instead of a possibly lagging replica.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in database.SAFE_METHODS or not database.ReplicaSessionLocals:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                window = settings.READ_YOUR_WRITES_SECONDS
+                cookie = SimpleCookie()
+                cookie[database.PRIMARY_STICKY_COOKIE] = f"{time.time() + window:.3f}"
+                cookie[database.PRIMARY_STICKY_COOKIE]["max-age"] = int(window) + 1
+                cookie[database.PRIMARY_STICKY_COOKIE]["path"] = "/"
+                cookie[database.PRIMARY_STICKY_COOKIE]["httponly"] = True
+                headers = list(message.get("headers", []))
+                headers.append((b"set-cookie", cookie.output(header="").strip().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+
+class TracingMiddleware:
+    """
+    Records a trace for the sampled share of requests, spans included, and hands it to the tracer
+    once the response is sent. Sampled responses carry an X-Trace-Id header.
+    """
+
+    def __init__(self, app, tracer: Tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.sampled():
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = self.tracer.start(scope["method"], scope["path"])
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                trace.status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-trace-id", trace.trace_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            with span("request"):
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # Set by the router once it matched, so traces group by route template rather than by URL
+            route = scope.get("route")
+            if route is not None:
+                trace.route = route.path
+            self.tracer.finish(trace, token)
+
+
+class AdmissionControlMiddleware:
+    """
+    Runs each request under the admission gate of its route class (auth, writes, heavy reads, reads).
+    A request the gate refuses gets an immediate 503 with Retry-After instead of queueing until it times out,
+    so a saturated class cannot starve the others.
+    """
+
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        gate = self.controller.gate_for(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        # /batch sub-requests run inside the slot their batch already holds
+        if gate is None or database.SHARED_SESSION_STATE in scope.get("state", {}):
+            await self.app(scope, receive, send)
+            return
+
+        if not await gate.acquire():
+            body = json.dumps({"detail": "Server is busy, retry later"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", str(self.controller.retry_after).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
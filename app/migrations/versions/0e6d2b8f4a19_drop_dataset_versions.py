@@ -0,0 +1,33 @@
+"""Drop dataset versions
+
+Revision ID: 0e6d2b8f4a19
+Revises: 7a1c4e9b2d60
+Create Date: 2026-10-20 12:20:51.774036
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0e6d2b8f4a19'
+down_revision: Union[str, Sequence[str], None] = '7a1c4e9b2d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_table('dataset_versions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_table('dataset_versions',
+    sa.Column('club', sa.String(length=32), nullable=False),
+    sa.Column('dataset', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('club', 'dataset')
+    )
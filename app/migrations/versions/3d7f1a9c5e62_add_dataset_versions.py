@@ -0,0 +1,33 @@
+"""Add dataset versions
+
+Revision ID: 3d7f1a9c5e62
+Revises: a9e4c7d20b38
+Create Date: 2026-10-19 23:41:07.528310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7f1a9c5e62'
+down_revision: Union[str, Sequence[str], None] = 'a9e4c7d20b38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('dataset_versions',
+    sa.Column('club', sa.String(length=32), nullable=False),
+    sa.Column('dataset', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('club', 'dataset')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('dataset_versions')
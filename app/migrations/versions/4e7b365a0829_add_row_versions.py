@@ -0,0 +1,38 @@
+"""Add row versions to news, coaches, training types, training sessions and achievements
+
+Revision ID: 4e7b365a0829
+Revises: 15628343170d
+Create Date: 2026-10-19 13:41:08.915342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e7b365a0829'
+down_revision: Union[str, Sequence[str], None] = '15628343170d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+VERSIONED_TABLES = ('news', 'coaches', 'training_types', 'training_sessions', 'achievements')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in VERSIONED_TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table}_version', table, ['id', 'version', 'updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in VERSIONED_TABLES:
+        op.drop_index(f'ix_{table}_version', table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('version')
@@ -0,0 +1,32 @@
+"""Unique enrollments
+
+Revision ID: 5b8e3c1d9f47
+Revises: 3d7f1a9c5e62
+Create Date: 2026-10-20 10:12:44.301958
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e3c1d9f47'
+down_revision: Union[str, Sequence[str], None] = '3d7f1a9c5e62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep the first of any double enrollment, the index would not build otherwise
+    op.execute(
+        "DELETE FROM residents_to_trainings WHERE id NOT IN ("
+        "SELECT min_id FROM (SELECT MIN(id) AS min_id FROM residents_to_trainings GROUP BY resident_id, training_session_id) AS firsts)"
+    )
+    op.create_index('ix_residents_to_trainings_resident_session', 'residents_to_trainings', ['resident_id', 'training_session_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_residents_to_trainings_resident_session', table_name='residents_to_trainings')
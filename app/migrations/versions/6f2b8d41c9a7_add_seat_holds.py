@@ -0,0 +1,45 @@
+"""Add seat holds
+
+Revision ID: 6f2b8d41c9a7
+Revises: b41d7e9c2a53
+Create Date: 2026-10-19 22:15:36.820417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f2b8d41c9a7'
+down_revision: Union[str, Sequence[str], None] = 'b41d7e9c2a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('seat_holds',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('training_session_id', sa.Integer(), nullable=False),
+    sa.Column('resident_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['resident_id'], ['residents.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['training_session_id'], ['training_sessions.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_seat_holds_id'), 'seat_holds', ['id'], unique=False)
+    op.create_index(op.f('ix_seat_holds_resident_id'), 'seat_holds', ['resident_id'], unique=False)
+    op.create_index(op.f('ix_seat_holds_expires_at'), 'seat_holds', ['expires_at'], unique=False)
+    op.create_index('ix_seat_holds_session_resident', 'seat_holds', ['training_session_id', 'resident_id'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_seat_holds_session_resident', table_name='seat_holds')
+    op.drop_index(op.f('ix_seat_holds_expires_at'), table_name='seat_holds')
+    op.drop_index(op.f('ix_seat_holds_resident_id'), table_name='seat_holds')
+    op.drop_index(op.f('ix_seat_holds_id'), table_name='seat_holds')
+    op.drop_table('seat_holds')
@@ -0,0 +1,35 @@
+"""Add catalog club keys
+
+Revision ID: 7a1c4e9b2d60
+Revises: 5b8e3c1d9f47
+Create Date: 2026-10-20 11:03:27.615402
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a1c4e9b2d60'
+down_revision: Union[str, Sequence[str], None] = '5b8e3c1d9f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CLUB_TABLES = ['training_types', 'achievements']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in CLUB_TABLES:
+        op.add_column(table, sa.Column('club', sa.String(length=32), server_default='main', nullable=False))
+        op.create_index(op.f(f'ix_{table}_club'), table, ['club'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(CLUB_TABLES):
+        op.drop_index(op.f(f'ix_{table}_club'), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('club')
@@ -0,0 +1,35 @@
+"""Add club keys
+
+Revision ID: 8c5e2a7f4d16
+Revises: 3d9f0b6a41e5
+Create Date: 2026-10-19 19:26:48.113902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c5e2a7f4d16'
+down_revision: Union[str, Sequence[str], None] = '3d9f0b6a41e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CLUB_TABLES = ['users', 'news', 'residents', 'coaches', 'training_sessions', 'training_sessions_archive']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in CLUB_TABLES:
+        op.add_column(table, sa.Column('club', sa.String(length=32), server_default='main', nullable=False))
+        op.create_index(op.f(f'ix_{table}_club'), table, ['club'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in reversed(CLUB_TABLES):
+        op.drop_index(op.f(f'ix_{table}_club'), table_name=table)
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('club')
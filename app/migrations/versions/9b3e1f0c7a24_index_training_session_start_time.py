@@ -0,0 +1,28 @@
+"""Index training session start time
+
+Revision ID: 9b3e1f0c7a24
+Revises: 4e7b365a0829
+Create Date: 2026-10-19 15:42:08.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b3e1f0c7a24'
+down_revision: Union[str, Sequence[str], None] = '4e7b365a0829'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_training_sessions_start_time'), 'training_sessions', ['start_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_training_sessions_start_time'), table_name='training_sessions')
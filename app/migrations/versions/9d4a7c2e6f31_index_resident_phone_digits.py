@@ -0,0 +1,43 @@
+"""Index resident phone digits
+
+Revision ID: 9d4a7c2e6f31
+Revises: 0e6d2b8f4a19
+Create Date: 2026-10-20 14:08:36.219705
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4a7c2e6f31'
+down_revision: Union[str, Sequence[str], None] = '0e6d2b8f4a19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_residents_search_trgm")
+    op.execute(
+        "CREATE INDEX ix_residents_search_trgm ON residents USING GIN (("
+        "lower(coalesce(surname, '') || ' ' || coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || "
+        "regexp_replace(coalesce(phone, ''), '\\D', '', 'g'))"
+        ") gin_trgm_ops)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_residents_search_trgm")
+    op.execute(
+        "CREATE INDEX ix_residents_search_trgm ON residents USING GIN (("
+        "lower(coalesce(surname, '') || ' ' || coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(phone, ''))"
+        ") gin_trgm_ops)"
+    )
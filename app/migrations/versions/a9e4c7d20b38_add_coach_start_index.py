@@ -0,0 +1,28 @@
+"""Add coach start index
+
+Revision ID: a9e4c7d20b38
+Revises: 6f2b8d41c9a7
+Create Date: 2026-10-19 23:08:52.194667
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e4c7d20b38'
+down_revision: Union[str, Sequence[str], None] = '6f2b8d41c9a7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_training_sessions_coach_start', 'training_sessions', ['club', 'coach_id', 'start_time'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_training_sessions_coach_start', table_name='training_sessions')
@@ -0,0 +1,38 @@
+"""Add resident search indexes
+
+Revision ID: b41d7e9c2a53
+Revises: 8c5e2a7f4d16
+Create Date: 2026-10-19 21:04:17.552930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d7e9c2a53'
+down_revision: Union[str, Sequence[str], None] = '8c5e2a7f4d16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_residents_search_trgm ON residents USING GIN (("
+        "lower(coalesce(surname, '') || ' ' || coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || coalesce(phone, ''))"
+        ") gin_trgm_ops)"
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_residents_surname_prefix ON residents (lower(surname) text_pattern_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    op.execute("DROP INDEX IF EXISTS ix_residents_surname_prefix")
+    op.execute("DROP INDEX IF EXISTS ix_residents_search_trgm")
@@ -0,0 +1,58 @@
+"""Add training session archive
+
+Revision ID: c41d8a6e2f93
+Revises: 9b3e1f0c7a24
+Create Date: 2026-10-19 16:27:51.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d8a6e2f93'
+down_revision: Union[str, Sequence[str], None] = '9b3e1f0c7a24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('training_sessions_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('training_type_id', sa.Integer(), nullable=True),
+    sa.Column('coach_id', sa.Integer(), nullable=True),
+    sa.Column('start_time', sa.DateTime(), nullable=True),
+    sa.Column('duration', sa.Integer(), nullable=True),
+    sa.Column('max_capacity', sa.Integer(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['coach_id'], ['coaches.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['training_type_id'], ['training_types.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_training_sessions_archive_coach_id'), 'training_sessions_archive', ['coach_id'], unique=False)
+    op.create_index(op.f('ix_training_sessions_archive_start_time'), 'training_sessions_archive', ['start_time'], unique=False)
+    op.create_index(op.f('ix_training_sessions_archive_training_type_id'), 'training_sessions_archive', ['training_type_id'], unique=False)
+    op.create_table('residents_to_trainings_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('resident_id', sa.Integer(), nullable=True),
+    sa.Column('training_session_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['resident_id'], ['residents.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['training_session_id'], ['training_sessions_archive.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_residents_to_trainings_archive_resident_id'), 'residents_to_trainings_archive', ['resident_id'], unique=False)
+    op.create_index(op.f('ix_residents_to_trainings_archive_training_session_id'), 'residents_to_trainings_archive', ['training_session_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_residents_to_trainings_archive_training_session_id'), table_name='residents_to_trainings_archive')
+    op.drop_index(op.f('ix_residents_to_trainings_archive_resident_id'), table_name='residents_to_trainings_archive')
+    op.drop_table('residents_to_trainings_archive')
+    op.drop_index(op.f('ix_training_sessions_archive_training_type_id'), table_name='training_sessions_archive')
+    op.drop_index(op.f('ix_training_sessions_archive_start_time'), table_name='training_sessions_archive')
+    op.drop_index(op.f('ix_training_sessions_archive_coach_id'), table_name='training_sessions_archive')
+    op.drop_table('training_sessions_archive')
@@ -0,0 +1,122 @@
+"""Add full-text search over news and coaches
+
+Revision ID: eced98bcdb5f
+Revises: 576f661b06e7
+Create Date: 2026-10-19 10:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eced98bcdb5f'
+down_revision: Union[str, Sequence[str], None] = '576f661b06e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# DDL as of this revision, kept here so later changes to app/api/repositories/search_queries.py do not rewrite it.
+# Postgres keeps a generated tsvector column with a GIN index on each searchable table,
+# SQLite keeps an external-content FTS5 table in sync with triggers.
+SEARCH_DDL = {
+    "postgresql": [
+        """
+        ALTER TABLE news ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(post_title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(post_info, '')), 'B')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_news_search_vector ON news USING GIN (search_vector)",
+        """
+        ALTER TABLE coaches ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('russian', coalesce(speciality, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(qualification, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(extra_info, '')), 'C')
+        ) STORED
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_coaches_search_vector ON coaches USING GIN (search_vector)",
+    ],
+    "sqlite": [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+            post_title, post_info, content='news', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS news_fts_ai AFTER INSERT ON news BEGIN
+            INSERT INTO news_fts(rowid, post_title, post_info) VALUES (new.id, new.post_title, new.post_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS news_fts_ad AFTER DELETE ON news BEGIN
+            INSERT INTO news_fts(news_fts, rowid, post_title, post_info) VALUES ('delete', old.id, old.post_title, old.post_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS news_fts_au AFTER UPDATE ON news BEGIN
+            INSERT INTO news_fts(news_fts, rowid, post_title, post_info) VALUES ('delete', old.id, old.post_title, old.post_info);
+            INSERT INTO news_fts(rowid, post_title, post_info) VALUES (new.id, new.post_title, new.post_info);
+        END
+        """,
+        "INSERT INTO news_fts(news_fts) VALUES ('rebuild')",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS coaches_fts USING fts5(
+            speciality, qualification, extra_info, content='coaches', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS coaches_fts_ai AFTER INSERT ON coaches BEGIN
+            INSERT INTO coaches_fts(rowid, speciality, qualification, extra_info)
+            VALUES (new.id, new.speciality, new.qualification, new.extra_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS coaches_fts_ad AFTER DELETE ON coaches BEGIN
+            INSERT INTO coaches_fts(coaches_fts, rowid, speciality, qualification, extra_info)
+            VALUES ('delete', old.id, old.speciality, old.qualification, old.extra_info);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS coaches_fts_au AFTER UPDATE ON coaches BEGIN
+            INSERT INTO coaches_fts(coaches_fts, rowid, speciality, qualification, extra_info)
+            VALUES ('delete', old.id, old.speciality, old.qualification, old.extra_info);
+            INSERT INTO coaches_fts(rowid, speciality, qualification, extra_info)
+            VALUES (new.id, new.speciality, new.qualification, new.extra_info);
+        END
+        """,
+        "INSERT INTO coaches_fts(coaches_fts) VALUES ('rebuild')",
+    ],
+}
+
+SEARCH_DROP_DDL = {
+    "postgresql": [
+        "DROP INDEX IF EXISTS ix_news_search_vector",
+        "ALTER TABLE news DROP COLUMN IF EXISTS search_vector",
+        "DROP INDEX IF EXISTS ix_coaches_search_vector",
+        "ALTER TABLE coaches DROP COLUMN IF EXISTS search_vector",
+    ],
+    "sqlite": [
+        "DROP TRIGGER IF EXISTS news_fts_ai",
+        "DROP TRIGGER IF EXISTS news_fts_ad",
+        "DROP TRIGGER IF EXISTS news_fts_au",
+        "DROP TABLE IF EXISTS news_fts",
+        "DROP TRIGGER IF EXISTS coaches_fts_ai",
+        "DROP TRIGGER IF EXISTS coaches_fts_ad",
+        "DROP TRIGGER IF EXISTS coaches_fts_au",
+        "DROP TABLE IF EXISTS coaches_fts",
+    ],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for statement in SEARCH_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for statement in SEARCH_DROP_DDL.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
@@ -0,0 +1,16 @@
+import os
+
+from uvicorn_worker import UvicornWorker
+
+
+class AppUvicornWorker(UvicornWorker):
+    """
+    Gunicorn worker running the ASGI app on uvicorn. The event loop and HTTP parser
+    are picked through SERVER_LOOP (auto | asyncio | uvloop) and SERVER_HTTP (auto | h11 | httptools);
+    "auto" uses uvloop/httptools when they are installed.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": os.getenv("SERVER_LOOP", "auto"),
+        "http": os.getenv("SERVER_HTTP", "auto"),
+    }
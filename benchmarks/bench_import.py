@@ -0,0 +1,62 @@
+"""
+Startup cost of a worker / test process: importing the app package and building the app.
+
+Every sample runs in a fresh interpreter. Exits with status 1 when the median of
+importing app.factory plus create_app() goes over the budget.
+
+    python benchmarks/bench_import.py --runs 5 --budget-ms 1500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.config
+config_done = time.perf_counter()
+from app.factory import create_app
+factory_done = time.perf_counter()
+from app.config import Settings
+create_app(Settings(DATABASE_URL="sqlite://", SECRET_KEY="bench", CORS_ORIGINS=[]))
+app_done = time.perf_counter()
+print(json.dumps({
+    "import app.config": config_done - started,
+    "import app.factory": factory_done - config_done,
+    "create_app()": app_done - factory_done,
+    "total": app_done - started,
+    "driver imported": "psycopg2" in sys.modules,
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    args = parser.parse_args()
+
+    env = {key: value for key, value in os.environ.items() if key not in ("DATABASE_URL", "SECRET_KEY", "CORS_ORIGINS")}
+    samples = [
+        json.loads(subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT, env=env, check=True,
+                                  capture_output=True, text=True).stdout)
+        for _ in range(args.runs)
+    ]
+
+    for step in ("import app.config", "import app.factory", "create_app()", "total"):
+        print(f"{step:>20}: {statistics.median(sample[step] for sample in samples) * 1000:8.1f} ms")
+    print(f"{'DB driver imported':>20}: {any(sample['driver imported'] for sample in samples)}")
+
+    total_ms = statistics.median(sample["total"] for sample in samples) * 1000
+    if total_ms > args.budget_ms:
+        print(f"over budget: {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Per-request cost of the hot single-row lookups (user by username, resident by user id).
+
+"select" builds select(...).where(...) on every call like the endpoints used to, "lambda" wraps the same
+in lambda_stmt, "prebuilt" uses the module-level statements of app/api/repositories/lookups.py.
+"build" times statement construction and cache key generation only, "execute" the whole lookup
+against a one-row table through a ClubSession, as requests run it: "select" and "lambda" get the
+club criteria added on every execution, "prebuilt" carries its own. The difference is what each
+request saves.
+
+    python benchmarks/bench_lookups.py --iterations 20000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import create_engine, lambda_stmt, select  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.api.models.models import User, Resident  # noqa: E402
+from app.api.repositories import lookups  # noqa: E402
+from app.database import Base, ClubSession  # noqa: E402
+
+
+def build_select(username: str, user_id: int):
+    for statement in (select(User).where(User.username == username), select(Resident).where(Resident.user_id == user_id)):
+        statement._generate_cache_key()
+
+
+def build_lambda(username: str, user_id: int):
+    for statement in (lambda_stmt(lambda: select(User).where(User.username == username)),
+                      lambda_stmt(lambda: select(Resident).where(Resident.user_id == user_id))):
+        statement._generate_cache_key()
+
+
+def build_prebuilt(username: str, user_id: int):
+    for statement in (lookups.USER_BY_USERNAME, lookups.RESIDENT_BY_USER_ID):
+        statement._generate_cache_key()
+
+
+def execute_select(db: Session, username: str, user_id: int):
+    db.execute(select(User).where(User.username == username)).scalars().first()
+    db.execute(select(Resident).where(Resident.user_id == user_id)).scalars().first()
+
+
+def execute_lambda(db: Session, username: str, user_id: int):
+    db.execute(lambda_stmt(lambda: select(User).where(User.username == username))).scalars().first()
+    db.execute(lambda_stmt(lambda: select(Resident).where(Resident.user_id == user_id))).scalars().first()
+
+
+def execute_prebuilt(db: Session, username: str, user_id: int):
+    lookups.user_by_username(db, username)
+    lookups.resident_by_user_id(db, user_id)
+
+
+def timed(func, iterations: int, repeats: int) -> float:
+    """
+    Median microseconds per call over `repeats` runs of `iterations` calls.
+    """
+    runs = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        runs.append((time.perf_counter() - started) / iterations * 1e6)
+    return statistics.median(runs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="sqlite://")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(args.url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        user = User(club="main", username="bench", hashed_password="-")
+        db.add(user)
+        db.flush()
+        db.add(Resident(club="main", user_id=user.id, surname="Bench", name="-", email="-", phone="-"))
+        db.commit()
+        user_id = user.id
+
+    print(f"{'stage':>8} {'strategy':>8} {'us/request':>11}")
+    for name, build in (("select", build_select), ("lambda", build_lambda), ("prebuilt", build_prebuilt)):
+        print(f"{'build':>8} {name:>8} {timed(lambda: build('bench', user_id), args.iterations, args.repeats):>11.1f}")
+    with ClubSession(engine, info={"club": "main"}) as db:
+        for name, execute in (("select", execute_select), ("lambda", execute_lambda), ("prebuilt", execute_prebuilt)):
+            elapsed = timed(lambda: execute(db, "bench", user_id), args.iterations // 4, args.repeats)
+            print(f"{'execute':>8} {name:>8} {elapsed:>11.1f}")
+
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
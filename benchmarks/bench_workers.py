@@ -0,0 +1,88 @@
+"""
+Throughput of the gunicorn entry point for 1..N worker processes.
+
+Starts `gunicorn app.main:app` with the project gunicorn.conf.py for every worker count,
+hammers GET /health from separate client processes over keep-alive connections
+and prints requests per second in total and per worker.
+
+    python benchmarks/bench_workers.py --max-workers 4 --duration 10
+"""
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def client(port: int, path: str, duration: float, results) -> None:
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    deadline = time.perf_counter() + duration
+    done = 0
+    while time.perf_counter() < deadline:
+        connection.request("GET", path)
+        connection.getresponse().read()
+        done += 1
+    results.put(done)
+
+
+def wait_until_ready(port: int, path: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", path)
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def run(workers: int, args) -> float:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+    env.setdefault("SECRET_KEY", "bench")
+    env.setdefault("CORS_ORIGINS", "[]")
+    env.update(WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}", ACCESS_LOG="", MAX_REQUESTS="0")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "app.main:app"], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(args.port, args.path)
+        results = multiprocessing.Queue()
+        clients = [
+            multiprocessing.Process(target=client, args=(args.port, args.path, args.duration, results))
+            for _ in range(args.clients_per_worker * workers)
+        ]
+        for process in clients:
+            process.start()
+        total = sum(results.get() for _ in clients)
+        for process in clients:
+            process.join()
+        return total / args.duration
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--clients-per-worker", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--path", default="/health")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7} {'req/s':>10} {'req/s per worker':>17}")
+    for workers in range(1, args.max_workers + 1):
+        rps = run(workers, args)
+        print(f"{workers:>7} {rps:>10.0f} {rps / workers:>17.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+# Production server settings, read by `gunicorn app.main:app` from the project root.
+# Every value can be overridden through the environment.
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "app.workers.AppUvicornWorker"
+
+# Import the app once in the master so workers are forked with it already loaded;
+# the database engine is created per worker by the app lifespan
+preload_app = os.getenv("PRELOAD_APP", "true").lower() == "true"
+
+# Recycle a worker after this many requests (plus jitter, so they do not restart together) to bound memory growth
+max_requests = int(os.getenv("MAX_REQUESTS", 10000))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 1000))
+
+# On SIGTERM / recycle workers stop accepting and get this long to finish in-flight requests
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("TIMEOUT", 60))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+
+accesslog = os.getenv("ACCESS_LOG", "-") or None
+errorlog = "-"
+
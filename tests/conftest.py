@@ -2,21 +2,29 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from datetime import datetime, timedelta
 
-# Импортируем все из вашего основного файла приложения
-# Предполагается, что ваш код находится в файле `main.py`
-from main import app, get_db, Base, User, Resident, News, Coach, TrainingType, TrainingSession, ResidentToTraining, hash_password, create_access_token, ALGORITHM, SECRET_KEY
-from main import get_current_user, get_current_active_user # Импортируем зависимости
+from app.config import Settings
+from app.factory import create_app
+from app.database import get_db, Base, ClubSession, enable_sqlite_foreign_keys
+from app.api.models.models import User, Resident, News, Coach, TrainingType, TrainingSession, ResidentToTraining
+from app.api.endpoints.users import hash_password, create_access_token, create_user_access_token
+from app.api.endpoints.users import get_current_user, get_current_active_user # Импортируем зависимости
 
-# Используем in-memory SQLite для тестов
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
-# SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:" # Можно использовать полностью in-memory для еще большей изоляции
+# Используем in-memory SQLite для тестов, реальный DATABASE_URL не нужен
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+# Фоновые задачи в тестах запускаются явно через run_pending
+test_settings = Settings(DATABASE_URL=SQLALCHEMY_DATABASE_URL, SECRET_KEY="test-secret-key", CORS_ORIGINS=[], JOB_WORKERS=0)
+app = create_app(test_settings)
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool
 )
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+enable_sqlite_foreign_keys(engine)
+# The application's session class, without a club it reads and writes every club's rows
+TestingSessionLocal = sessionmaker(class_=ClubSession, autocommit=False, autoflush=False, bind=engine)
 
 
 @pytest.fixture(scope="session")
@@ -48,11 +56,12 @@ def db_session(db_engine):
     transaction.rollback() # Откатываем все изменения после каждого теста
     connection.close()
     app.dependency_overrides.clear() # Очищаем переопределения зависимостей
+    app.state.response_cache.clear()
 
 @pytest.fixture(scope="function")
 def client(db_session):
     """Provides a TestClient for making requests to the FastAPI app."""
-    return TestClient(app)
+    return TestClient(app, base_url="http://testserver/api/v1")
 
 @pytest.fixture(scope="function")
 def test_user_data():
@@ -127,8 +136,7 @@ def another_test_user(db_session, another_test_user_data):
 @pytest.fixture(scope="function")
 def auth_token(test_user):
     """Generates an access token for the test user."""
-    access_token_expires = timedelta(minutes=30)
-    return create_access_token(data={"sub": test_user.username}, expires_delta=access_token_expires)
+    return create_user_access_token(test_user)
 
 @pytest.fixture(scope="function")
 def authenticated_client(client, test_user):
@@ -1,7 +1,30 @@
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import sys
+
+import fastapi.routing
 import pytest
 from datetime import datetime, timedelta
-from main import User, Resident, News, Coach, TrainingType, TrainingSession, ResidentToTraining
-from main import get_current_user, get_current_active_user
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api.models.models import User, Resident, News, Coach, TrainingType, TrainingSession, ResidentToTraining, RefreshToken
+from app.api.endpoints.users import get_current_user, get_current_active_user
+from app.api.services.login_throttle import InMemoryBucketStore, load_bucket_store
+from app.api.services.seat_feed import SeatFeed
+from app.api.schemas.user import CurrentUser
+from tests.conftest import app, test_settings
+from app import database
+from app.config import get_settings
+from app.factory import create_app
+
+login_throttle = app.state.login_throttle
+revocation_list = app.state.revocation_list
 
 def test_register_user_success(client, test_user_data, db_session):
     response = client.post("/register", json=test_user_data)
@@ -317,3 +340,1243 @@ def test_read_training_sessions_with_residents_filtered_by_resident_id(authentic
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 0
+
+# Тесты для поиска
+def test_search_news_and_coaches(authenticated_client, test_news, test_coach):
+    news_id, coach_title = test_news.id, f"{test_coach.surname} {test_coach.name}"
+
+    response = authenticated_client.get("/search", params={"q": "test news"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["results"][0]["kind"] == "news"
+    assert data["results"][0]["id"] == news_id
+
+    response = authenticated_client.get("/search", params={"q": "fitn"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 1
+    assert data["results"][0]["kind"] == "coach"
+    assert data["results"][0]["title"] == coach_title
+
+def test_search_follows_updates_and_paginates(authenticated_client, test_coach, db_session):
+    db_session.add_all([
+        Coach(surname="Smith", name="Anna", speciality="Fitness", qualification="Master", extra_info="Crossfit"),
+        Coach(surname="Brown", name="Kate", speciality="Yoga", qualification="Master", extra_info="Fitness fan"),
+    ])
+    test_coach.speciality = "Boxing"
+    db_session.commit()
+    coach_id = test_coach.id
+
+    response = authenticated_client.get("/search", params={"q": "fitness", "limit": 1})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["total"] == 2
+    assert len(data["results"]) == 1
+    assert data["results"][0]["title"] == "Smith Anna"  # speciality outweighs extra_info
+
+    response = authenticated_client.get("/search", params={"q": "boxing"})
+    assert [r["id"] for r in response.json()["results"]] == [coach_id]
+
+def test_login_throttled_after_burst(client, test_user, test_user_data):
+    login_throttle.store.clear()
+    for _ in range(login_throttle.username_burst):
+        response = client.post("/token", data={"username": test_user_data["username"], "password": "wrongpassword"})
+        assert response.status_code == 401
+
+    response = client.post("/token", data={"username": test_user_data["username"], "password": test_user_data["password"]})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    login_throttle.store.clear()
+
+def test_in_memory_bucket_store_refills_and_expires():
+    now = [0.0]
+    store = InMemoryBucketStore(shards=1, min_sweep_size=2, clock=lambda: now[0])
+    assert store.consume("user:a", 2, 1.0) == 0
+    assert store.consume("user:a", 2, 1.0) == 0
+    assert store.consume("user:a", 2, 1.0) == pytest.approx(1.0)
+
+    now[0] = 1.0
+    assert store.consume("user:a", 2, 1.0) == 0
+
+    now[0] = 10.0
+    store.consume("user:b", 2, 1.0)
+    assert len(store) == 1  # the refilled bucket for "user:a" was swept
+
+    with pytest.raises(TypeError):
+        load_bucket_store("app.api.services.login_throttle:BucketStore", shards=1)
+    with pytest.raises(TypeError):
+        load_bucket_store("app.api.services.login_throttle:LoginThrottle", shards=1)
+
+def test_access_token_authenticates_without_user_lookup_until_revoked(client, test_user, auth_token, db_session):
+    revocation_list.invalidate()
+    user_id = test_user.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["id"] == user_id
+
+    db_session.query(User).filter(User.id == user_id).update({"is_active": False})
+    db_session.commit()
+    revocation_list.invalidate()  # what the periodic refresh would do a few seconds later
+    response = client.get("/users/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    revocation_list.invalidate()
+
+def test_refresh_token_rotation_and_reuse(client, test_user, test_user_data):
+    login_throttle.store.clear()
+    response = client.post("/token", data={"username": test_user_data["username"], "password": test_user_data["password"]})
+    first_refresh = response.json()["refresh_token"]
+
+    response = client.post("/token/refresh", json={"refresh_token": first_refresh})
+    assert response.status_code == 200
+    second_refresh = response.json()["refresh_token"]
+    assert second_refresh != first_refresh
+    assert client.get("/users/me", headers={"Authorization": f"Bearer {response.json()['access_token']}"}).status_code == 200
+
+    # Replaying a used-up token revokes the whole family
+    assert client.post("/token/refresh", json={"refresh_token": first_refresh}).status_code == 401
+    assert client.post("/token/refresh", json={"refresh_token": second_refresh}).status_code == 401
+
+def test_concurrent_refreshes_with_one_token_let_only_one_through(client, db_session, test_user, test_user_data):
+    user_id = test_user.id
+    login_throttle.store.clear()
+    response = client.post("/token", data={"username": test_user_data["username"], "password": test_user_data["password"]})
+    refresh = response.json()["refresh_token"]
+
+    # Another refresh with the same token uses it up between this one reading and claiming it
+    raced = []
+
+    def use_up_first(execute_state):
+        if not raced and execute_state.is_update and execute_state.statement.table.name == "refresh_tokens":
+            raced.append(True)
+            execute_state.session.connection().execute(update(RefreshToken).values(revoked=True))
+
+    event.listen(db_session, "do_orm_execute", use_up_first)
+    assert client.post("/token/refresh", json={"refresh_token": refresh}).status_code == 401
+    event.remove(db_session, "do_orm_execute", use_up_first)
+    assert raced
+    tokens = db_session.query(RefreshToken).filter(RefreshToken.user_id == user_id).all()
+    assert tokens and all(token.revoked for token in tokens)
+
+def test_logout_revokes_refresh_token(client, test_user, test_user_data):
+    login_throttle.store.clear()
+    response = client.post("/token", data={"username": test_user_data["username"], "password": test_user_data["password"]})
+    refresh_token = response.json()["refresh_token"]
+
+    assert client.post("/logout", json={"refresh_token": refresh_token}).status_code == 204
+    assert client.post("/token/refresh", json={"refresh_token": refresh_token}).status_code == 401
+
+
+# Тесты для фабрики приложения
+def test_import_needs_no_configuration():
+    env = {key: value for key, value in os.environ.items() if key not in ("DATABASE_URL", "SECRET_KEY", "CORS_ORIGINS")}
+    code = (
+        "import sys, app.config, app.database, app.factory; "
+        "assert 'app.api.endpoints.users' not in sys.modules; "
+        "assert 'psycopg2' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], env=env, check=True, cwd=os.path.dirname(os.path.dirname(__file__)))
+
+def test_engine_lives_in_lifespan():
+    assert database.engine is None
+    with TestClient(create_app(test_settings)) as client:
+        assert str(database.engine.url) == test_settings.DATABASE_URL
+        assert client.get("/health").json() == {"status": "ok"}
+    assert database.engine is None
+
+def test_one_configuration_per_process():
+    # Settings and engines are process-wide, so another app must not silently reconfigure the first
+    create_app()
+    with pytest.raises(RuntimeError):
+        create_app(test_settings.model_copy(update={"DATABASE_URL": "sqlite:////tmp/other.db"}))
+    assert get_settings() is test_settings
+
+# Тесты для маршрутизации чтения на реплики
+@pytest.fixture(scope="function")
+def replica_session_factory(monkeypatch):
+    replica_engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    replica_sessions = sessionmaker(bind=replica_engine)
+    monkeypatch.setattr(database, "ReplicaSessionLocals", [replica_sessions])
+    monkeypatch.setattr(database, "_replica_cycle", itertools.cycle([replica_sessions]))
+    yield replica_sessions
+    replica_engine.dispose()
+
+def test_reads_go_to_replica_until_client_writes(authenticated_client, replica_session_factory, test_coach, db_session):
+    coach_id = test_coach.id
+    # The replica is empty, so a replica read cannot find the coach that exists on the primary
+    with pytest.raises(OperationalError):
+        authenticated_client.get(f"/coaches/{coach_id}")
+
+    response = authenticated_client.put(f"/coaches/{coach_id}", json={"extra_info": "Updated"})
+    assert response.status_code == 200
+    assert database.PRIMARY_STICKY_COOKIE in response.cookies
+
+    response = authenticated_client.get(f"/coaches/{coach_id}")
+    assert response.status_code == 200
+    assert response.json()["extra_info"] == "Updated"
+
+def test_writes_without_replicas_set_no_sticky_cookie(authenticated_client, test_coach):
+    response = authenticated_client.put(f"/coaches/{test_coach.id}", json={"extra_info": "Updated"})
+    assert response.status_code == 200
+    assert database.PRIMARY_STICKY_COOKIE not in response.cookies
+
+# Тесты для ленты свободных мест
+def test_seat_feed_coalesces_updates_for_slow_subscriber():
+    async def scenario():
+        feed = SeatFeed()
+        subscriber = feed.subscribe([1, 2])
+        loop = asyncio.get_running_loop()
+        # Handlers publish from the threadpool
+        await loop.run_in_executor(None, lambda: [feed.publish(1, places, 10) for places in (9, 8, 7)])
+        await loop.run_in_executor(None, feed.publish, 2, 4, 5)
+        await loop.run_in_executor(None, feed.publish, 3, 0, 5)  # nobody watches session 3
+        batch = await subscriber.next_batch(timeout=1)
+        feed.unsubscribe(subscriber)
+        return batch, feed.has_subscribers(1)
+
+    batch, still_subscribed = asyncio.run(scenario())
+    assert batch == {
+        1: {"training_session_id": 1, "remaining_places": 7, "max_capacity": 10},
+        2: {"training_session_id": 2, "remaining_places": 4, "max_capacity": 5},
+    }
+    assert not still_subscribed
+
+def test_enroll_and_unenroll_publish_seat_counts(authenticated_client, test_user, test_training_session, db_session, monkeypatch):
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).first()
+    resident_id, session_id = resident.id, test_training_session.id
+    feed = app.state.seat_feed
+    published = []
+    monkeypatch.setattr(feed, "has_subscribers", lambda training_session_id, club=None: True)
+    monkeypatch.setattr(feed, "publish", lambda *args: published.append(args))
+
+    response = authenticated_client.post("/resident_to_training/", json={"resident_id": resident_id, "training_session_id": session_id})
+    assert response.status_code == 201
+    response = authenticated_client.delete(f"/resident_to_training/{resident_id}/{session_id}")
+    assert response.status_code == 204
+    assert published == [(session_id, 9, 10, "main"), (session_id, 10, 10, "main")]
+
+def test_seat_feed_limits_sessions_per_client(authenticated_client):
+    response = authenticated_client.get("/training_sessions/seats/stream", params={"ids": list(range(100))})
+    assert response.status_code == 400
+
+def test_seat_feed_releases_the_connection_before_streaming(test_user, test_training_session, db_session, monkeypatch):
+    import threading
+    from starlette.requests import Request
+    from app.api.endpoints import seat_feed
+    from app.api.endpoints.seat_feed import stream_seat_counts
+
+    session_id = test_training_session.id
+    threads = []
+    fetch = seat_feed.fetch_seat_counts
+    monkeypatch.setattr(seat_feed, "fetch_seat_counts", lambda *args: threads.append(threading.get_ident()) or fetch(*args))
+    request = Request({"type": "http", "app": app, "headers": [], "state": {}})
+    response = asyncio.run(stream_seat_counts(request, [session_id], db_session, test_user))
+    assert not db_session.in_transaction()
+    # The snapshot is read off the event loop's thread
+    assert threads and threads[0] != threading.get_ident()
+
+    async def first_event():
+        events = response.body_iterator
+        event = await events.__anext__()
+        await events.aclose()
+        return event
+
+    assert asyncio.run(first_event()).startswith(f'event: seats\ndata: {{"training_session_id": {session_id}')
+    assert not app.state.seat_feed.has_subscribers(session_id, "main")
+
+# Тесты для условных запросов
+def test_conditional_get_and_if_match_for_coach(authenticated_client, test_coach):
+    coach_id = test_coach.id
+    response = authenticated_client.get(f"/coaches/{coach_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert "Last-Modified" in response.headers
+
+    response = authenticated_client.get(f"/coaches/{coach_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    # If-Match compares strongly: the weak form of the current tag does not match
+    response = authenticated_client.put(f"/coaches/{coach_id}", json={"extra_info": "Updated"}, headers={"If-Match": "W/" + etag})
+    assert response.status_code == 412
+
+    response = authenticated_client.put(f"/coaches/{coach_id}", json={"extra_info": "Updated"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    new_etag = response.headers["ETag"]
+    assert new_etag != etag
+
+    # A client holding the old version must not overwrite the new one
+    response = authenticated_client.put(f"/coaches/{coach_id}", json={"extra_info": "Lost update"}, headers={"If-Match": etag})
+    assert response.status_code == 412
+
+    response = authenticated_client.get(f"/coaches/{coach_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["extra_info"] == "Updated"
+
+def test_training_session_etag_follows_enrollments(authenticated_client, test_user, test_training_session, db_session):
+    session_id = test_training_session.id
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).first()
+    etag = authenticated_client.get(f"/training_sessions/{session_id}").headers["ETag"]
+    assert authenticated_client.get(f"/training_sessions/{session_id}", headers={"If-None-Match": etag}).status_code == 304
+
+    db_session.add(ResidentToTraining(resident_id=resident.id, training_session_id=session_id))
+    db_session.commit()
+
+    response = authenticated_client.get(f"/training_sessions/{session_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["remaining_places"] == 9
+
+
+# Тесты для выборочных полей
+def test_sparse_fieldsets_for_lists_and_details(authenticated_client, test_news, test_coach):
+    coach_id = test_coach.id
+    news_id = test_news.id
+
+    response = authenticated_client.get("/coaches/all", params={"fields": "surname,speciality"})
+    assert response.status_code == 200
+    assert response.json() == [{"id": coach_id, "surname": "Coach", "speciality": "Fitness"}]
+    assert "etag" not in response.headers
+
+    response = authenticated_client.get(f"/news/{news_id}", params={"fields": "username,post_title"})
+    assert response.status_code == 200
+    assert response.json() == {"id": news_id, "username": "testuser", "post_title": "Test News Title"}
+
+    response = authenticated_client.get("/coaches/999999", params={"fields": "surname"})
+    assert response.status_code == 404
+
+    response = authenticated_client.get(f"/coaches/{coach_id}")
+    assert set(response.json()) > {"id", "surname", "extra_info"}
+
+
+def test_sparse_fieldsets_reject_unknown_fields(authenticated_client, test_user):
+    response = authenticated_client.get("/residents/all", params={"fields": "surname,hashed_password"})
+    assert response.status_code == 400
+    assert "hashed_password" in response.json()["detail"]
+
+
+# Тесты для кэша сжатых ответов
+def test_list_responses_are_compressed_cached_and_invalidated(authenticated_client, test_user, test_training_session, db_session, monkeypatch):
+    session_id = test_training_session.id
+    resident_id = db_session.query(Resident).filter(Resident.user_id == test_user.id).one().id
+    cache = app.state.response_cache
+    monkeypatch.setattr(cache, "min_size", 0)
+
+    response = authenticated_client.get("/training_sessions/all", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    remaining = response.json()[0]["remaining_places"]
+
+    from app.api.endpoints.items import items_get
+    builds = []
+    fetch = items_get.fetch_training_session_data
+    monkeypatch.setattr(items_get, "fetch_training_session_data", lambda sessions: builds.append(1) or fetch(sessions))
+
+    response = authenticated_client.get("/training_sessions/all", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.json()[0]["remaining_places"] == remaining
+    assert builds == []
+
+    response = authenticated_client.post("/resident_to_training/", json={"resident_id": resident_id, "training_session_id": session_id})
+    assert response.status_code == 201
+    response = authenticated_client.get("/training_sessions/all", headers={"Accept-Encoding": "gzip"})
+    assert response.json()[0]["remaining_places"] == remaining - 1
+    assert builds == [1]
+
+
+def test_dataset_versions_follow_committed_writes(test_user, test_training_session, db_session, monkeypatch):
+    import time
+    from types import SimpleNamespace
+    from sqlalchemy import delete
+    from sqlalchemy.orm import Session
+    from app.api.models.models import SeatHold
+    from app.api.repositories import dataset_versions
+    from app.api.repositories.dataset_versions import news_dataset_version, training_sessions_dataset_version
+
+    sessions, news = training_sessions_dataset_version(db_session), news_dataset_version(db_session)
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).one()
+    db_session.add(SeatHold(training_session_id=test_training_session.id, resident_id=resident.id, expires_at=datetime.utcnow()))
+    db_session.commit()
+    assert training_sessions_dataset_version(db_session) != sessions
+    assert news_dataset_version(db_session) == news
+
+    # Statements that bypass the flush count too
+    sessions = training_sessions_dataset_version(db_session)
+    db_session.execute(delete(SeatHold))
+    db_session.commit()
+    assert training_sessions_dataset_version(db_session) != sessions
+
+    # Residents are not shown, but deleting one drops their enrollments in the database
+    sessions = training_sessions_dataset_version(db_session)
+    resident.phone = "0"
+    db_session.commit()
+    assert training_sessions_dataset_version(db_session) == sessions
+    db_session.delete(resident)
+    db_session.commit()
+    assert training_sessions_dataset_version(db_session) != sessions
+    assert news_dataset_version(db_session) != news
+
+    # Only the application's sessions are watched, writes of other workers show up after the max age
+    sessions = training_sessions_dataset_version(db_session)
+    other_session = Session(bind=db_session.connection())
+    other_session.add(Coach(surname="Brown", name="Kate", speciality="Yoga", qualification="Master", extra_info="-"))
+    other_session.commit()
+    assert training_sessions_dataset_version(db_session) == sessions
+    now = time.time()
+    monkeypatch.setattr(dataset_versions, "time", SimpleNamespace(time=lambda: now + test_settings.DATASET_VERSION_MAX_AGE_SECONDS))
+    assert training_sessions_dataset_version(db_session) != sessions
+
+def test_compressed_response_cache_limits_memory_and_drops_old_versions():
+    from app.api.services.response_cache import CompressedResponseCache
+
+    cache = CompressedResponseCache(max_bytes=100, max_entry_bytes=60, min_size=10)
+    assert cache.negotiate("br;q=1.0, gzip;q=0.5") == "gzip"
+    assert cache.negotiate("gzip;q=0") == "identity"
+
+    cache.put(("news", "1", "identity"), b"x" * 40)
+    cache.put(("news", "1", "gzip"), b"x" * 10)
+    cache.put(("news", "2", "identity"), b"x" * 40)
+    assert cache.get(("news", "1", "identity")) is None and cache.size == 40
+
+    cache.put(("coaches", "1", "identity"), b"x" * 70)
+    assert cache.get(("coaches", "1", "identity")) is None
+
+    cache.put(("sessions", "1", "identity"), b"x" * 50)
+    cache.put(("sessions", "1", "gzip"), b"x" * 30)
+    assert cache.get(("news", "2", "identity")) is None
+    assert cache.size == 80
+
+
+# Тесты для сводки резидента
+def test_resident_dashboard_uses_fixed_number_of_queries(authenticated_client, test_user, another_test_user, test_training_session, db_session, db_engine):
+    from sqlalchemy import event
+    from app.api.models.models import Achievement, ResidentToAchievement
+
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).first()
+    other = db_session.query(Resident).filter(Resident.user_id == another_test_user.id).first()
+    past = TrainingSession(training_type_id=test_training_session.training_type_id, coach_id=test_training_session.coach_id,
+                           start_time=datetime.utcnow() - timedelta(days=1), duration=60, max_capacity=5)
+    first, second = Achievement(achievement_name="First", description="d", criteria="c"), Achievement(achievement_name="Second", description="d", criteria="c")
+    db_session.add_all([past, first, second])
+    db_session.flush()
+    db_session.add_all([
+        ResidentToTraining(resident_id=resident.id, training_session_id=test_training_session.id),
+        ResidentToTraining(resident_id=resident.id, training_session_id=past.id),
+        ResidentToTraining(resident_id=other.id, training_session_id=test_training_session.id),
+        ResidentToAchievement(resident_id=resident.id, achievement_id=first.id),
+    ])
+    db_session.commit()
+    session_id, resident_id = test_training_session.id, resident.id
+
+    authenticated_client.get("/users/me")  # warms the revocation snapshot
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_engine, "before_cursor_execute", listener)
+    try:
+        response = authenticated_client.get("/residents/me/dashboard")
+    finally:
+        event.remove(db_engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert len(statements) == 3
+    data = response.json()
+    assert data["user"]["username"] == "testuser"
+    assert data["resident"]["id"] == resident_id
+    assert [s["id"] for s in data["upcoming_sessions"]] == [session_id]
+    assert data["upcoming_sessions"][0]["remaining_places"] == 8
+    assert [a["achievement_name"] for a in data["received_achievements"]] == ["First"]
+    assert data["achievement_counts"] == {"received": 1, "not_received": 1, "total": 2}
+
+
+def test_resident_dashboard_without_resident(authenticated_client, test_user, db_session):
+    db_session.query(Resident).filter(Resident.user_id == test_user.id).delete()
+    db_session.commit()
+    response = authenticated_client.get("/residents/me/dashboard")
+    assert response.status_code == 404
+
+
+# Тесты для пакетных запросов
+def test_batch_dispatches_sub_requests_with_one_authentication(client, auth_token, test_coach, test_training_type, monkeypatch):
+    from app.api.endpoints import users
+
+    coach_id, type_id = test_coach.id, test_training_type.id
+    decode = users.jwt.decode
+    decoded = []
+    monkeypatch.setattr(users.jwt, "decode", lambda *args, **kwargs: decoded.append(1) or decode(*args, **kwargs))
+
+    response = client.post("/batch", headers={"Authorization": f"Bearer {auth_token}"}, json={"requests": [
+        {"path": f"/coaches/{coach_id}"},
+        {"path": f"/training_types/{type_id}?fields=training_name"},
+        {"path": "/coaches/999999"},
+        {"path": "/residents/all", "headers": {"Accept": "application/json"}},
+        {"method": "DELETE", "path": f"/coaches/{coach_id}"},
+        {"path": "/batch"},
+    ]})
+    assert response.status_code == 200
+    assert len(decoded) == 1
+    items = response.json()["responses"]
+    assert [item["status"] for item in items] == [200, 200, 404, 200, 405, 400]
+    assert items[0]["body"]["surname"] == "Coach"
+    assert items[0]["headers"]["etag"]
+    assert items[1]["body"] == {"id": type_id, "training_name": "Yoga"}
+    assert items[2]["body"] == {"detail": "Coach not found"}
+    assert items[3]["body"][0]["surname"] == "Test"
+
+
+def test_batch_requires_authentication_and_limits_size(client, auth_token, monkeypatch):
+    response = client.post("/batch", json={"requests": [{"path": "/coaches/all"}]})
+    assert response.status_code == 401
+
+    monkeypatch.setattr(test_settings, "BATCH_MAX_REQUESTS", 2)
+    response = client.post("/batch", headers={"Authorization": f"Bearer {auth_token}"}, json={"requests": [{"path": "/coaches/all"}] * 3})
+    assert response.status_code == 400
+
+
+def test_batch_stops_after_a_timed_out_sub_request(client, auth_token, test_coach, monkeypatch):
+    import time
+    from app.api.endpoints.items import items_get
+
+    coach_id = test_coach.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    etag = items_get.entity_etag
+    monkeypatch.setattr(items_get, "entity_etag", lambda *args: time.sleep(0.3) or etag(*args))
+    monkeypatch.setattr(test_settings, "BATCH_ITEM_TIMEOUT_SECONDS", 0.05)
+
+    response = client.post("/batch", headers=headers, json={"requests": [
+        {"path": "/coaches/all"},
+        {"path": f"/coaches/{coach_id}"},
+        {"path": "/coaches/all"},
+    ]})
+    assert [item["status"] for item in response.json()["responses"]] == [200, 504, 504]
+    assert response.json()["responses"][2]["body"] == {"detail": "Skipped after a sub-request timed out"}
+    time.sleep(0.3)
+    assert client.get(f"/coaches/{coach_id}", headers=headers).status_code == 200
+
+
+# Тесты для каскадного удаления
+def test_delete_coach_cascades_in_database(authenticated_client, test_user, test_training_session, db_session, db_engine):
+    from sqlalchemy import event
+
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).first()
+    db_session.add(ResidentToTraining(resident_id=resident.id, training_session_id=test_training_session.id))
+    db_session.commit()
+    coach_id = test_training_session.coach_id
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_engine, "before_cursor_execute", listener)
+    try:
+        response = authenticated_client.delete(f"/coaches/{coach_id}")
+    finally:
+        event.remove(db_engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 204
+    assert [statement.split()[0] for statement in statements] == ["DELETE"]
+    db_session.expire_all()
+    assert db_session.query(TrainingSession).count() == 0
+    assert db_session.query(ResidentToTraining).count() == 0
+
+    assert authenticated_client.delete(f"/coaches/{coach_id}").status_code == 404
+
+
+# Тесты для аналитики заполняемости
+def test_occupancy_report_by_coach_type_and_hour_of_week(authenticated_client, test_user, another_test_user, test_coach, test_training_type, db_session, monkeypatch):
+    monday = datetime(2030, 1, 7, 9)
+    sessions = [
+        TrainingSession(training_type_id=test_training_type.id, coach_id=test_coach.id, start_time=monday, duration=60, max_capacity=4),
+        TrainingSession(training_type_id=test_training_type.id, coach_id=test_coach.id, start_time=monday + timedelta(days=7), duration=60, max_capacity=4),
+        TrainingSession(training_type_id=test_training_type.id, coach_id=test_coach.id, start_time=monday + timedelta(days=2, hours=9), duration=60, max_capacity=2),
+        TrainingSession(training_type_id=test_training_type.id, coach_id=test_coach.id, start_time=monday + timedelta(days=60), duration=60, max_capacity=2),
+    ]
+    db_session.add_all(sessions)
+    db_session.flush()
+    residents = db_session.query(Resident).all()
+    db_session.add_all([
+        ResidentToTraining(resident_id=residents[0].id, training_session_id=sessions[0].id),
+        ResidentToTraining(resident_id=residents[1].id, training_session_id=sessions[0].id),
+        ResidentToTraining(resident_id=residents[0].id, training_session_id=sessions[2].id),
+        ResidentToTraining(resident_id=residents[0].id, training_session_id=sessions[3].id),
+    ])
+    db_session.commit()
+    coach_id = test_coach.id
+
+    params = {"start": "2030-01-01T00:00:00", "end": "2030-02-01T00:00:00"}
+    response = authenticated_client.get("/analytics/occupancy", params=params)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["overall"] == {"sessions": 3, "enrolled": 3, "capacity": 10, "occupancy": 0.3}
+    assert [(c["coach_id"], c["sessions"]) for c in data["by_coach"]] == [(coach_id, 3)]
+    assert data["by_training_type"][0]["training_type"] == "Yoga"
+    assert [(h["day_of_week"], h["hour"], h["enrolled"], h["capacity"]) for h in data["heatmap"]] == [(0, 9, 2, 8), (2, 18, 1, 2)]
+
+    # Offsets are converted to the naive UTC the sessions are stored in, and share the cached report
+    from app.api.endpoints import analytics
+    builds = []
+    monkeypatch.setattr(analytics, "occupancy_report", lambda *args: builds.append(1))
+    aware = authenticated_client.get("/analytics/occupancy", params={"start": "2030-01-01T03:00:00+03:00", "end": "2030-02-01T00:00:00Z"})
+    assert aware.status_code == 200
+    assert aware.json() == data
+    assert builds == []
+
+    response = authenticated_client.get("/analytics/occupancy", params={"start": "2030-02-01T00:00:00", "end": "2030-01-01T00:00:00"})
+    assert response.status_code == 400
+
+
+# Тесты для архива тренировок
+def test_archive_moves_past_sessions_out_of_hot_tables(authenticated_client, test_user, test_training_session, db_session):
+    from app.api.models.models import TrainingSessionArchive, ResidentToTrainingArchive
+    from app.api.services.archive import archive_training_sessions, archive_horizon
+
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).first()
+    past = TrainingSession(training_type_id=test_training_session.training_type_id, coach_id=test_training_session.coach_id,
+                           start_time=datetime.utcnow() - timedelta(days=400), duration=60, max_capacity=5)
+    db_session.add(past)
+    db_session.flush()
+    db_session.add_all([
+        ResidentToTraining(resident_id=resident.id, training_session_id=past.id),
+        ResidentToTraining(resident_id=resident.id, training_session_id=test_training_session.id),
+    ])
+    db_session.commit()
+    past_id, current_id, start_time = past.id, test_training_session.id, past.start_time
+    current_user = CurrentUser(id=test_user.id, username=test_user.username, is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: current_user
+
+    assert archive_training_sessions(db_session, archive_horizon(180), batch_size=1) == (1, 1)
+    assert archive_training_sessions(db_session, archive_horizon(180)) == (0, 0)
+    assert db_session.query(TrainingSessionArchive).one().id == past_id
+    assert db_session.query(ResidentToTrainingArchive).count() == 1
+
+    response = authenticated_client.get("/training_sessions/all")
+    assert [s["id"] for s in response.json()] == [current_id]
+    response = authenticated_client.get("/training_sessions/enrolled")
+    assert [s["id"] for s in response.json()] == [current_id]
+
+    response = authenticated_client.get("/history/training_sessions")
+    assert response.status_code == 200
+    assert [(s["id"], s["enrolled"], s["training_type"]) for s in response.json()] == [(past_id, 1, "Yoga")]
+    response = authenticated_client.get("/history/training_sessions/enrolled")
+    assert [s["id"] for s in response.json()] == [past_id]
+
+    day = start_time.replace(hour=0)
+    response = authenticated_client.get("/analytics/occupancy", params={"start": day.isoformat(), "end": (day + timedelta(days=1)).isoformat()})
+    assert response.json()["overall"]["enrolled"] == 1
+
+
+# Тесты для ключей идемпотентности
+def test_idempotency_key_replays_stored_response(authenticated_client, test_user, db_session):
+    current_user = CurrentUser(id=test_user.id, username=test_user.username, is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: current_user
+    coach = {"surname": "Retry", "name": "Coach", "speciality": "Fitness", "qualification": "Certified", "extra_info": "-"}
+    headers = {"Idempotency-Key": "c0ffee-1"}
+
+    first = authenticated_client.post("/coaches/", json=coach, headers=headers)
+    second = authenticated_client.post("/coaches/", json=coach, headers=headers)
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+    assert second.headers["idempotent-replayed"] == "true"
+    assert db_session.query(Coach).filter(Coach.surname == "Retry").count() == 1
+
+    response = authenticated_client.post("/coaches/", json={**coach, "surname": "Other"}, headers=headers)
+    assert response.status_code == 422
+
+    authenticated_client.post("/coaches/", json=coach)
+    assert db_session.query(Coach).filter(Coach.surname == "Retry").count() == 2
+
+
+def test_idempotency_key_on_registration_and_failed_requests(client, authenticated_client, test_user, db_session):
+    from app.api.models.models import IdempotencyKey
+
+    current_user = CurrentUser(id=test_user.id, username=test_user.username, is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: current_user
+    user = {"username": "retryuser", "password": "password123", "surname": "R", "name": "U",
+            "birthdate": "1990-01-01T00:00:00", "email": "r@example.com", "phone": "1"}
+    first = client.post("/register", json=user, headers={"Idempotency-Key": "signup-1"})
+    second = client.post("/register", json=user, headers={"Idempotency-Key": "signup-1"})
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json()
+
+    # A raised client error is the outcome too, and is replayed like a returned one. Storing it rolls back
+    # what the endpoint left uncommitted, so requests run in savepoints to keep this test's rows
+    def savepoint_db():
+        db = sessionmaker(class_=database.ClubSession, bind=db_session.connection(), join_transaction_mode="create_savepoint")()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = savepoint_db
+    refused = client.post("/register", json=user, headers={"Idempotency-Key": "signup-2"})
+    replayed = client.post("/register", json=user, headers={"Idempotency-Key": "signup-2"})
+    assert refused.status_code == replayed.status_code == 400
+    assert replayed.json() == refused.json() == {"detail": "Username already exists"}
+    assert replayed.headers["idempotent-replayed"] == "true"
+
+    # Anonymous keys belong to the client address and the body, so they neither replay nor block other requests
+    other_client = TestClient(app, base_url="http://testserver/api/v1", client=("203.0.113.7", 50000))
+    response = other_client.post("/register", json=user, headers={"Idempotency-Key": "signup-1"})
+    assert response.status_code == 400
+    assert "idempotent-replayed" not in response.headers
+    response = client.post("/register", json={**user, "username": "retryuser2"}, headers={"Idempotency-Key": "signup-1"})
+    assert response.status_code == 201
+    assert response.json()["username"] == "retryuser2"
+
+    # An invalid body releases the key instead of pinning the failure
+    response = authenticated_client.post("/coaches/", json={"surname": "Incomplete"}, headers={"Idempotency-Key": "coach-1"})
+    assert response.status_code == 422
+    assert db_session.query(IdempotencyKey).count() == 4
+
+
+# Тесты для очереди фоновых задач
+def test_job_queue_runs_jobs_once_per_key(db_session):
+    from app.api.models.models import Job
+    from app.api.services.jobs import JOB_HANDLERS, enqueue, run_pending
+
+    def session_factory():
+        return sessionmaker(bind=db_session.connection(), join_transaction_mode="create_savepoint")()
+
+    calls = []
+    JOB_HANDLERS["test.record"] = lambda db, payload: calls.append(payload["n"])
+    try:
+        enqueue(db_session, "test.record", {"n": 1}, key="record:1")
+        enqueue(db_session, "test.record", {"n": 2}, key="record:1")
+        enqueue(db_session, "test.record", {"n": 3})
+        enqueue(db_session, "test.record", {"n": 4}, delay_seconds=3600)
+        db_session.commit()
+
+        assert run_pending(session_factory) == 2
+        assert sorted(calls) == [1, 3]
+        assert db_session.query(Job).filter(Job.status == "done").count() == 2
+        assert db_session.query(Job).filter(Job.status == "queued").count() == 1
+    finally:
+        del JOB_HANDLERS["test.record"]
+
+
+def test_failing_job_retries_with_backoff_then_fails(db_session):
+    from app.api.models.models import Job
+    from app.api.services.jobs import JOB_HANDLERS, enqueue, run_pending
+
+    def session_factory():
+        return sessionmaker(bind=db_session.connection(), join_transaction_mode="create_savepoint")()
+
+    def broken(db, payload):
+        raise RuntimeError("boom")
+
+    JOB_HANDLERS["test.broken"] = broken
+    try:
+        enqueue(db_session, "test.broken", max_attempts=2)
+        db_session.commit()
+
+        assert run_pending(session_factory) == 1
+        job = db_session.query(Job).one()
+        assert (job.status, job.attempts) == ("queued", 1)
+        assert job.run_at > datetime.utcnow()
+        assert job.last_error == "RuntimeError: boom"
+
+        job.run_at = datetime.utcnow() - timedelta(seconds=1)
+        db_session.commit()
+        assert run_pending(session_factory) == 1
+        db_session.refresh(job)
+        assert (job.status, job.attempts) == ("failed", 2)
+        assert run_pending(session_factory) == 0
+    finally:
+        del JOB_HANDLERS["test.broken"]
+
+
+def test_long_job_renews_its_lease_until_taken_over(db_session):
+    import time
+    from sqlalchemy import update
+    from app.api.models.models import Job
+    from app.api.services.jobs import JOB_HANDLERS, enqueue, renew_lease, run_pending
+
+    def session_factory():
+        return sessionmaker(bind=db_session.connection(), join_transaction_mode="create_savepoint")()
+
+    leases = []
+
+    def long(db, payload):
+        leases.append(db.query(Job.locked_until).scalar())
+        time.sleep(0.01)
+        renew_lease(db)
+        leases.append(db.query(Job.locked_until).scalar())
+        # Another worker claims the job again after the lease ran out
+        db.execute(update(Job).values(attempts=Job.attempts + 1))
+        renew_lease(db)
+
+    JOB_HANDLERS["test.long"] = long
+    try:
+        enqueue(db_session, "test.long")
+        db_session.commit()
+
+        assert run_pending(session_factory, lease_seconds=60) == 1
+        assert leases[1] > leases[0]
+        job = db_session.query(Job).one()
+        # Left to the worker that holds it now
+        assert (job.status, job.attempts, job.last_error) == ("running", 1, None)
+    finally:
+        del JOB_HANDLERS["test.long"]
+
+
+# Тесты для зависимости текущего резидента
+def test_current_resident_loads_collections_up_front(client, auth_token, test_user, test_training_session, another_test_user, db_session, db_engine):
+    from sqlalchemy import event
+
+    resident = db_session.query(Resident).filter(Resident.user_id == test_user.id).first()
+    other = db_session.query(Resident).filter(Resident.user_id == another_test_user.id).first()
+    db_session.add_all([
+        ResidentToTraining(resident_id=resident.id, training_session_id=test_training_session.id),
+        ResidentToTraining(resident_id=other.id, training_session_id=test_training_session.id),
+    ])
+    db_session.commit()
+    session_id = test_training_session.id
+    headers = {"Authorization": f"Bearer {auth_token}"}
+
+    client.get("/users/me", headers=headers)  # warms the revocation snapshot
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db_engine, "before_cursor_execute", listener)
+    try:
+        response = client.get("/training_sessions/enrolled", headers=headers)
+        enrolled_statements = len(statements)
+        statements.clear()
+        batch = client.post("/batch", headers=headers, json={"requests": [
+            {"path": "/training_sessions/not_enrolled"},
+            {"path": "/training_sessions/not_enrolled/0/0"},
+        ]})
+    finally:
+        event.remove(db_engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    assert [(s["id"], s["remaining_places"]) for s in response.json()] == [(session_id, 8)]
+    # resident with user, enrollments with their sessions, the sessions' enrollments
+    assert enrolled_statements == 3
+    assert [item["status"] for item in batch.json()["responses"]] == [200, 200]
+    # Both sub-requests share one resident lookup
+    assert sum(" JOIN users " in statement for statement in statements) == 1
+
+
+# Тесты для разделения данных по клубам
+def test_club_sessions_see_and_write_only_their_club(db_session, test_coach, monkeypatch):
+    from sqlalchemy import delete
+    from app.database import ClubSession
+
+    main_coach_id = test_coach.id
+    north = ClubSession(bind=db_session.connection(), info={"club": "north"})
+    main = ClubSession(bind=db_session.connection(), info={"club": "main"})
+
+    north.add(Coach(surname="North", name="Coach", speciality="-", qualification="-", extra_info="-"))
+    north.flush()
+    assert [(c.surname, c.club) for c in north.query(Coach).all()] == [("North", "north")]
+    assert [c.id for c in main.query(Coach).all()] == [main_coach_id]
+
+    main.execute(delete(Coach))
+    assert north.query(Coach).count() == 1
+
+    shard = create_engine("sqlite://")
+    monkeypatch.setitem(database.shard_engines, "east", shard)
+    assert ClubSession(info={"club": "east"}).get_bind() is shard
+    assert main.get_bind() is db_session.connection()
+
+
+
+def test_prebuilt_lookups_filter_the_club_without_copying_the_statement(db_session, test_user):
+    from sqlalchemy import event
+    from app.api.repositories import lookups
+    from app.database import ClubSession
+
+    user_id = test_user.id
+    north = ClubSession(bind=db_session.connection(), info={"club": "north"})
+    main = ClubSession(bind=db_session.connection(), info={"club": "main"})
+    executed = []
+    listener = lambda execute_state: executed.append(execute_state.statement)
+    event.listen(ClubSession, "do_orm_execute", listener)
+    try:
+        assert lookups.user_by_username(main, "testuser").id == user_id
+        assert lookups.user_by_username(north, "testuser") is None
+        assert lookups.resident_id_by_user_id(north, user_id) is None
+    finally:
+        event.remove(ClubSession, "do_orm_execute", listener)
+    # The statement keeps its memoized cache key
+    assert executed == [lookups.USER_BY_USERNAME, lookups.USER_BY_USERNAME, lookups.RESIDENT_ID_BY_USER_ID]
+
+def test_club_comes_from_header_then_token(client, db_session, test_coach, monkeypatch):
+    from fastapi import Request
+    from app.database import ClubSession, request_club, get_db
+
+    monkeypatch.setattr(test_settings, "CLUB_DATABASE_URLS", {"north": "sqlite:///:memory:"})
+
+    def club_session(request: Request):
+        yield ClubSession(bind=db_session.connection(), join_transaction_mode="create_savepoint",
+                          info={"club": lambda: request_club(request)})
+
+    app.dependency_overrides[get_db] = club_session
+    user = {"username": "northuser", "password": "password123", "surname": "N", "name": "U",
+            "birthdate": "1990-01-01T00:00:00", "email": "n@example.com", "phone": "1"}
+    assert client.post("/register", json=user, headers={"X-Club": "north"}).status_code == 201
+    token = client.post("/token", data={"username": "northuser", "password": "password123"}, headers={"X-Club": "north"})
+    assert token.status_code == 200
+    # Without the header the user is looked up in the default club
+    assert client.post("/token", data={"username": "northuser", "password": "password123"}).status_code == 401
+
+    headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    assert client.get("/coaches/all", headers=headers).json() == []
+    # The token decides, the header is only for requests without one
+    assert client.get("/coaches/all", headers={**headers, "X-Club": "main"}).json() == []
+    assert client.get("/users/me", headers=headers).json()["username"] == "northuser"
+    assert db_session.query(User).filter(User.username == "northuser").one().club == "north"
+
+
+
+def test_clubs_sharing_a_database_cannot_link_each_others_rows(authenticated_client, test_user, test_training_session, db_session):
+    from app.database import ClubSession, get_db, get_read_db
+
+    resident_id = db_session.query(Resident).filter(Resident.user_id == test_user.id).one().id
+    session_id, coach_id, type_id = test_training_session.id, test_training_session.coach_id, test_training_session.training_type_id
+    db_session.add(ResidentToTraining(resident_id=resident_id, training_session_id=session_id))
+    db_session.commit()
+
+    def north_session():
+        yield ClubSession(bind=db_session.connection(), join_transaction_mode="create_savepoint", info={"club": "north"})
+
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = north_session
+    enrollment = {"resident_id": resident_id, "training_session_id": session_id}
+    assert authenticated_client.post("/resident_to_training/", json=enrollment).json()["detail"] == "Resident not found"
+    assert authenticated_client.delete(f"/resident_to_training/{resident_id}/{session_id}").status_code == 404
+    response = authenticated_client.post("/training_sessions/", json={
+        "training_type_id": type_id, "coach_id": coach_id, "start_time": "2030-01-07T10:00:00", "duration": 60, "max_capacity": 5,
+    })
+    assert response.status_code == 404
+    # Training types and achievements are each club's own catalog
+    assert authenticated_client.get("/training_types/all").json() == []
+    assert authenticated_client.delete(f"/training_types/{type_id}").status_code == 404
+    assert db_session.query(ResidentToTraining).filter_by(training_session_id=session_id).count() == 1
+    assert db_session.query(TrainingType).filter_by(id=type_id).one().club == "main"
+
+# Тесты для трассировки запросов
+def test_sampled_requests_are_traced_and_slowest_listed_for_admins(client, auth_token, test_coach, monkeypatch, tmp_path):
+    tracer = app.state.tracer
+    jsonl = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    monkeypatch.setattr(tracer, "jsonl_path", str(jsonl))
+    tracer.clear()
+    headers = {"Authorization": f"Bearer {auth_token}"}
+    coach_id = test_coach.id
+
+    response = client.get(f"/coaches/{coach_id}", headers=headers)
+    assert response.status_code == 200
+    trace_id = response.headers["x-trace-id"]
+    monkeypatch.setattr(tracer, "sample_rate", 0.0)
+    assert client.get("/admin/traces/slowest", headers=headers).status_code == 403
+
+    # The same username in another club is not the admin
+    monkeypatch.setattr(test_settings, "ADMIN_USERNAMES", ["north:testuser"])
+    assert client.get("/admin/traces/slowest", headers=headers).status_code == 403
+
+    monkeypatch.setattr(test_settings, "ADMIN_USERNAMES", ["testuser"])
+    response = client.get("/admin/traces/slowest", params={"route": "/api/v1/coaches/{coach_id}"}, headers=headers)
+    assert response.status_code == 200
+    [trace] = response.json()["/api/v1/coaches/{coach_id}"]
+    assert trace["trace_id"] == trace_id
+    assert trace["status_code"] == 200
+    names = [span["name"] for span in trace["spans"]]
+    assert names[0] == "request"
+    assert {"auth.jwt_decode", "auth.revocation_check", "sql", "response.validate", "response.serialize"} <= set(names)
+    request_span = trace["spans"][0]["span_id"]
+    assert all(span["parent_id"] == request_span for span in trace["spans"] if span["name"].startswith("auth."))
+
+    # Written by the tracer's thread; FastAPI's own serialization is left as it is
+    tracer.flush()
+    assert [json.loads(line)["trace_id"] for line in jsonl.read_text().splitlines()] == [trace_id]
+    assert fastapi.routing.serialize_response.__module__ == "fastapi.routing"
+    tracer.clear()
+
+
+# Тесты для контроля допуска запросов
+def test_admission_gate_queues_hands_over_and_sheds():
+    from app.api.services.admission import AdmissionGate
+
+    async def scenario():
+        gate = AdmissionGate("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+        assert await gate.acquire()
+        queued = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+        assert gate.waiting == 1
+        assert not await gate.acquire()  # queue full: refused without waiting
+        gate.release()
+        assert await queued and gate.active == 1
+        assert not await gate.acquire()  # waited queue_timeout in vain
+        assert gate.waiting == 0
+        gate.release()
+        assert gate.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_saturated_route_class_is_shed_while_others_pass(authenticated_client, test_user, monkeypatch):
+    gates = app.state.admission.gates
+    monkeypatch.setattr(gates["heavy_reads"], "max_concurrent", 0)
+    monkeypatch.setattr(gates["heavy_reads"], "max_queue", 0)
+
+    response = authenticated_client.get("/training_sessions/all")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert authenticated_client.get("/coaches/all").status_code == 200
+    assert app.state.admission.route_class("POST", "/api/v1/token") == "auth"
+    assert app.state.admission.route_class("DELETE", "/api/v1/coaches/1") == "writes"
+    assert app.state.admission.route_class("POST", "/api/v1/batch") == "heavy_reads"
+    assert app.state.admission.route_class("GET", "/api/v1/residents/search") == "heavy_reads"
+    assert app.state.admission.route_class("GET", "/api/v1/coaches/free_slots") == "heavy_reads"
+    assert app.state.admission.route_class("GET", "/api/v1/coaches/1") == "reads"
+    assert app.state.admission.route_class("GET", "/health") is None
+
+
+# Тесты для поиска резидентов
+def test_search_residents_by_prefix_typo_and_phone(authenticated_client, test_user, db_session):
+    app.state.resident_index.clear()
+    db_session.add_all([
+        Resident(surname="Ivanova", name="Anna", birthdate=datetime(1991, 1, 1), email="anna@example.com", phone="+7 (999) 111-22-33"),
+        Resident(surname="Ivanov", name="Petr", birthdate=datetime(1992, 1, 1), email="petr@example.com", phone="+7 (999) 444-55-66"),
+        Resident(surname="Petrov", name="Ivan", birthdate=datetime(1993, 1, 1), email="ivan.p@example.com", phone="+7 (999) 777-88-99"),
+    ])
+    db_session.commit()
+
+    def surnames(q, **params):
+        response = authenticated_client.get("/residents/search", params={"q": q, **params})
+        assert response.status_code == 200
+        return [resident["surname"] for resident in response.json()]
+
+    # Surname prefix matches first, then residents matching elsewhere
+    assert surnames("ivan") == ["Ivanov", "Ivanova", "Petrov"]
+    assert surnames("ivan", limit=1) == ["Ivanov"]
+    assert surnames("ivanov anna") == ["Ivanova"]
+    assert surnames("Ivanvo")[0] == "Ivanov"
+    assert surnames("7999444") == ["Ivanov"]
+    assert surnames("+7 999 777") == ["Petrov"]
+    assert surnames("anna@exa") == ["Ivanova"]
+    assert surnames("nobody") == []
+
+
+def test_postgres_resident_search_matches_phone_digits():
+    import importlib.util
+    from pathlib import Path
+    from types import SimpleNamespace
+    from app.api.repositories import search_queries
+
+    # The index the latest migration builds is on the expression the query filters by
+    path = Path(__file__).parents[1] / "app/migrations/versions/9d4a7c2e6f31_index_resident_phone_digits.py"
+    spec = importlib.util.spec_from_file_location("index_resident_phone_digits", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    statements = []
+    bind = SimpleNamespace(dialect=SimpleNamespace(name="postgresql"))
+    migration.op = SimpleNamespace(get_bind=lambda: bind, execute=statements.append)
+    migration.upgrade()
+    assert f"(({search_queries.RESIDENT_SEARCH_DOCUMENT}) gin_trgm_ops)" in statements[-1]
+    assert "regexp_replace(coalesce(phone, ''), '\\D', '', 'g')" in search_queries.RESIDENT_SEARCH_DOCUMENT
+
+    # Phone-like queries are reduced to digits, as in the in-memory index
+    executed = []
+    rows = SimpleNamespace(mappings=lambda: SimpleNamespace(all=lambda: []))
+    db = SimpleNamespace(club="main", execute=lambda statement, params: executed.append(params) or rows)
+    search_queries.search_residents_postgres(db, "+7 (999) 444-55", 10)
+    search_queries.search_residents_postgres(db, "  Ivanov   Petr ", 10)
+    assert [params["q"] for params in executed] == ["799944455", "ivanov petr"]
+
+def test_resident_index_follows_committed_writes(authenticated_client, test_user, db_session):
+    app.state.resident_index.clear()
+    assert authenticated_client.get("/residents/search", params={"q": "sidorov"}).json() == []
+    db_session.add(Resident(surname="Sidorov", name="Oleg", birthdate=datetime(1990, 1, 1), email="oleg@example.com", phone="1"))
+    db_session.commit()
+    assert [r["name"] for r in authenticated_client.get("/residents/search", params={"q": "sidorov"}).json()] == ["Oleg"]
+
+    resident = db_session.query(Resident).filter(Resident.surname == "Sidorov").one()
+    resident.surname = "Smirnov"
+    db_session.commit()
+    assert authenticated_client.get("/residents/search", params={"q": "sidorov"}).json() == []
+    assert [r["surname"] for r in authenticated_client.get("/residents/search", params={"q": "smirnov ol"}).json()] == ["Smirnov"]
+
+
+
+def test_stale_resident_index_is_rebuilt_in_the_background(db_session, monkeypatch):
+    import threading
+    import time
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+    from app.api.services import resident_index
+    from app.api.services.resident_index import PrefixIndex, ResidentSearchIndex
+
+    now = [0.0]
+    index = ResidentSearchIndex(refresh_seconds=10, session_factory=lambda club: Session(bind=db_session.connection()),
+                                clock=lambda: now[0])
+    db_session.add(Resident(surname="Sidorov", name="Oleg", birthdate=datetime(1990, 1, 1), email="oleg@example.com", phone="1"))
+    db_session.commit()
+    assert [r.surname for r in index.search(db_session, "sidorov", 5)] == ["Sidorov"]
+
+    # A resident added by another worker is not seen until the index is rebuilt
+    db_session.execute(insert(Resident).values(surname="Kuznetsov", name="Ivan", birthdate=datetime(1990, 1, 1),
+                                               email="ivan@example.com", phone="2"))
+    db_session.commit()
+    started, release = threading.Event(), threading.Event()
+
+    def slow_index(rows):
+        rows = list(rows)
+        started.set()
+        release.wait(5)
+        return PrefixIndex(rows)
+
+    monkeypatch.setattr(resident_index, "PrefixIndex", slow_index)
+    now[0] = 11
+    # The old index keeps answering while the new one is built
+    assert index.search(db_session, "kuznetsov", 5) == []
+    assert started.wait(5)
+    assert index.search(db_session, "kuznetsov", 5) == []
+    index.apply([("main", 10**6, ("Popov", "Petr", "petr@example.com", "3"))])
+    release.set()
+    for _ in range(500):
+        if index.search(db_session, "kuznetsov", 5):
+            break
+        time.sleep(0.01)
+    assert [r.surname for r in index.search(db_session, "kuznetsov", 5)] == ["Kuznetsov"]
+    # A write committed during the rebuild is carried over to the new index
+    assert index.index_for(db_session).search("popov", 5) == [10**6]
+
+# Тесты для временного удержания мест
+def test_seat_hold_takes_a_place_until_confirmed(authenticated_client, test_user, another_test_user, test_training_session, db_session):
+    from app.api.models.models import SeatHold
+
+    test_training_session.max_capacity = 1
+    db_session.commit()
+    session_id = test_training_session.id
+    resident_id = db_session.query(Resident).filter(Resident.user_id == test_user.id).one().id
+    me = CurrentUser(id=test_user.id, username=test_user.username, is_active=True)
+    other = CurrentUser(id=another_test_user.id, username=another_test_user.username, is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: me
+
+    hold = authenticated_client.post(f"/training_sessions/{session_id}/holds")
+    assert hold.status_code == 201
+    assert authenticated_client.get(f"/training_sessions/{session_id}").json()["remaining_places"] == 0
+    # Holding again only renews the hold
+    renewed = authenticated_client.post(f"/training_sessions/{session_id}/holds")
+    assert renewed.status_code == 201
+    assert db_session.query(SeatHold).count() == 1
+    hold_id = renewed.json()["id"]
+
+    app.dependency_overrides[get_current_active_user] = lambda: other
+    assert authenticated_client.post(f"/training_sessions/{session_id}/holds").json()["detail"] == "No places left"
+    assert authenticated_client.post(f"/seat_holds/{hold_id}/confirm").status_code == 404
+
+    app.dependency_overrides[get_current_active_user] = lambda: me
+    assert authenticated_client.post(f"/seat_holds/{hold_id}/confirm").status_code == 201
+    assert db_session.query(SeatHold).count() == 0
+    assert db_session.query(ResidentToTraining).filter_by(training_session_id=session_id).one().resident_id == resident_id
+    assert authenticated_client.get(f"/training_sessions/{session_id}").json()["remaining_places"] == 0
+    assert authenticated_client.post(f"/training_sessions/{session_id}/holds").status_code == 409
+
+
+def test_direct_enrollment_respects_seat_holds(authenticated_client, test_user, another_test_user, test_training_session, db_session):
+    from sqlalchemy.exc import IntegrityError
+    from app.api.models.models import SeatHold
+
+    test_training_session.max_capacity = 1
+    db_session.commit()
+    session_id = test_training_session.id
+    mine = db_session.query(Resident).filter(Resident.user_id == test_user.id).one().id
+    other = db_session.query(Resident).filter(Resident.user_id == another_test_user.id).one().id
+    me = CurrentUser(id=test_user.id, username=test_user.username, is_active=True)
+    app.dependency_overrides[get_current_active_user] = lambda: me
+    hold_id = authenticated_client.post(f"/training_sessions/{session_id}/holds").json()["id"]
+
+    # The held place is not up for grabs
+    response = authenticated_client.post("/resident_to_training/", json={"resident_id": other, "training_session_id": session_id})
+    assert response.status_code == 409 and response.json()["detail"] == "No places left"
+    # The holder enrolling directly uses up the hold, so it cannot be confirmed into a second enrollment
+    assert authenticated_client.post("/resident_to_training/", json={"resident_id": mine, "training_session_id": session_id}).status_code == 201
+    assert db_session.query(SeatHold).count() == 0
+    assert authenticated_client.post(f"/seat_holds/{hold_id}/confirm").status_code == 404
+    response = authenticated_client.post("/resident_to_training/", json={"resident_id": mine, "training_session_id": session_id})
+    assert response.status_code == 409 and response.json()["detail"] == "Resident already enrolled in this training session"
+    assert authenticated_client.post("/resident_to_training/", json={"resident_id": mine, "training_session_id": session_id + 100}).status_code == 404
+    with pytest.raises(IntegrityError), db_session.begin_nested():
+        db_session.add(ResidentToTraining(resident_id=mine, training_session_id=session_id))
+    assert db_session.query(ResidentToTraining).filter_by(training_session_id=session_id).count() == 1
+
+def test_expired_seat_holds_are_released(authenticated_client, test_user, another_test_user, test_training_session, db_session, monkeypatch):
+    from app.api.models.models import SeatHold
+    from app.api.services.maintenance import sweep_seat_holds
+    from app.api.services.seat_feed import SEAT_FEED_INFO
+    from app.api.services.seat_holds import HoldExpiryTimer
+    from app.database import ClubSession
+
+    session_id = test_training_session.id
+    app.dependency_overrides[get_current_active_user] = lambda: CurrentUser(id=test_user.id, username=test_user.username, is_active=True)
+    past = datetime.utcnow() - timedelta(seconds=1)
+    residents = db_session.query(Resident).order_by(Resident.id).all()
+    holds = [SeatHold(training_session_id=session_id, resident_id=r.id, expires_at=past) for r in residents]
+    db_session.add_all(holds)
+    db_session.commit()
+    mine, other = [hold.id for hold in holds]
+    # Lapsed holds stop counting before they are deleted
+    assert authenticated_client.get(f"/training_sessions/{session_id}").json()["remaining_places"] == 10
+    assert authenticated_client.post(f"/seat_holds/{mine}/confirm").json()["detail"] == "Seat hold expired"
+
+    timer = HoldExpiryTimer(lambda club: ClubSession(bind=db_session.connection(), join_transaction_mode="create_savepoint",
+                                                     info={"club": club}))
+    timer.schedule(SeatHold(id=other, expires_at=past), "main")
+    timer.schedule(SeatHold(id=mine, expires_at=past - timedelta(seconds=1)), "main")
+    timer.schedule(SeatHold(id=0, expires_at=datetime.utcnow() + timedelta(hours=1)), "main")
+    due = timer.pop_due(datetime.utcnow())
+    assert [hold_id for _, hold_id, _ in due] == [mine, other] and len(timer) == 1
+    timer.expire(due[:1])
+    assert [hold.id for hold in db_session.query(SeatHold).all()] == [other]
+
+    feed = SeatFeed()
+    published = []
+    monkeypatch.setattr(feed, "has_subscribers", lambda training_session_id, club=None: True)
+    monkeypatch.setattr(feed, "publish", lambda *args: published.append(args))
+    db_session.info[SEAT_FEED_INFO] = feed
+    sweep_seat_holds(db_session, {})
+    assert published == []
+    db_session.commit()
+    assert published == [(session_id, 10, 10, "main")]
+    assert db_session.query(SeatHold).count() == 0
+    assert authenticated_client.get(f"/training_sessions/{session_id}").json()["remaining_places"] == 10
+
+
+# Тесты для поиска свободного времени тренеров
+def test_coach_free_slots_per_coach_and_common(authenticated_client, test_coach, test_training_type, db_session):
+    other_coach = Coach(surname="Brown", name="Kate", speciality="Yoga", qualification="Master", extra_info="Fitness fan")
+    db_session.add(other_coach)
+    db_session.flush()
+    day = datetime(2030, 1, 7)
+    db_session.add_all([
+        TrainingSession(training_type_id=test_training_type.id, coach_id=test_coach.id, start_time=day.replace(hour=10), duration=60, max_capacity=4),
+        TrainingSession(training_type_id=test_training_type.id, coach_id=test_coach.id, start_time=day.replace(hour=14), duration=90, max_capacity=4),
+        TrainingSession(training_type_id=test_training_type.id, coach_id=other_coach.id, start_time=day.replace(hour=10, minute=30), duration=60, max_capacity=4),
+        # Starts the evening before and runs into the range
+        TrainingSession(training_type_id=test_training_type.id, coach_id=other_coach.id, start_time=day - timedelta(hours=1), duration=600, max_capacity=4),
+    ])
+    db_session.commit()
+    coach_ids = [test_coach.id, other_coach.id]
+
+    params = {"coach_id": coach_ids, "start": "2030-01-07T00:00:00", "end": "2030-01-08T00:00:00",
+              "day_start": "08:00:00", "day_end": "18:00:00", "min_minutes": 30}
+    response = authenticated_client.get("/coaches/free_slots", params=params)
+    assert response.status_code == 200
+    data = response.json()
+    slots = {c["coach_id"]: [(i["start"][11:16], i["end"][11:16]) for i in c["free"]] for c in data["coaches"]}
+    assert slots == {
+        test_coach.id: [("08:00", "10:00"), ("11:00", "14:00"), ("15:30", "18:00")],
+        other_coach.id: [("09:00", "10:30"), ("11:30", "18:00")],
+    }
+    assert [(i["start"][11:16], i["end"][11:16]) for i in data["common"]] == [("09:00", "10:00"), ("11:30", "14:00"), ("15:30", "18:00")]
+    # Offsets are converted to the naive UTC the sessions are stored in
+    aware = authenticated_client.get("/coaches/free_slots", params={**params, "start": "2030-01-07T03:00:00+03:00", "end": "2030-01-08T00:00:00Z"})
+    assert aware.status_code == 200
+    assert aware.json() == data
+
+    params["end"] = "2030-01-06T00:00:00"
+    assert authenticated_client.get("/coaches/free_slots", params=params).status_code == 400
+    params.update(end="2030-01-08T00:00:00", coach_id=[other_coach.id + 100])
+    assert authenticated_client.get("/coaches/free_slots", params=params).status_code == 404